@@ -3,6 +3,13 @@
 
 # LLM Providers
 from agents.huggingface_provider import HuggingFaceProvider
+from agents.llama_cpp_provider import LlamaCppProvider
+from agents.llm_provider import GenerationConfig, GenerationRequest, ProviderError, ProviderBusyError
+from agents.response_cache import ResponseCache, CachingProvider
+from agents.single_flight import SingleFlight
+from agents.provider_pool import ProviderPool
+from agents.rate_limiter import RateLimiter, RateLimitedProvider
+from agents.context_builder import ContextBuilder
 
 # Specialized Agents
 from agents.general_agent import GeneralAgent
@@ -16,6 +23,18 @@ from agents.specialized_agent import SpecializedAgent
 
 __all__ = [
     'HuggingFaceProvider',
+    'LlamaCppProvider',
+    'GenerationConfig',
+    'GenerationRequest',
+    'ProviderError',
+    'ProviderBusyError',
+    'ResponseCache',
+    'CachingProvider',
+    'SingleFlight',
+    'ProviderPool',
+    'RateLimiter',
+    'RateLimitedProvider',
+    'ContextBuilder',
     'GeneralAgent',
     'WeatherAgent', 
     'HotelAgent', 
@@ -1,5 +1,5 @@
 from agents.specialized_agent import SpecializedAgent
-from agents.llm_provider import LLMProvider
+from agents.llm_provider import LLMProvider, GenerationConfig
 
 class AttractionAgent(SpecializedAgent):
     """An agent that specializes in finding the best tourist attractions in a location."""
@@ -7,6 +7,8 @@ class AttractionAgent(SpecializedAgent):
     def __init__(self, name: str = "AttractionExpert", llm_provider: LLMProvider = None):
         super().__init__(name, llm_provider)
         self.system_prompt = f"You are {name}, a tourist attraction specialist AI assistant."
+        # Attractions rarely change, so cached answers expire accordingly
+        self.generation_config = GenerationConfig(max_new_tokens=450, cache_ttl=7 * 86400)
         
     def initialize(self) -> None:
         """Initialize the Attraction agent."""
@@ -0,0 +1,68 @@
+import math
+from typing import Callable, Dict, List, Optional, Tuple
+from core.base import Message
+
+def estimate_tokens(text: str) -> int:
+    """Cheaply estimate the token count of a text (about four characters per token for English)."""
+    return math.ceil(len(text) / 4)
+
+class ContextBuilder:
+    """Packs conversation history into a token budget for an LLM request.
+    
+    The current message is always sent. Earlier turns are added newest first
+    while they fit in `max_prompt_tokens` (which also covers the system prompt);
+    older turns longer than `max_message_tokens` are shortened first, and the
+    oldest turns are dropped once the budget is used up.
+    """
+    
+    TRUNCATION_MARKER = " [...]"
+    
+    def __init__(self, max_prompt_tokens: int = 3000, max_messages: int = 5, max_message_tokens: int = 600,
+                 count_tokens: Optional[Callable[[str], int]] = None):
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_messages = max_messages
+        self.max_message_tokens = max_message_tokens
+        # Any callable works here, e.g. a local tokenizer's `lambda text: len(tok.encode(text).ids)`
+        self.count_tokens = count_tokens or estimate_tokens
+    
+    def build(self, history: List[Message], message: Message, system_prompt: str,
+              agent_name: str) -> Tuple[List[Dict[str, str]], int]:
+        """Build the message list for a request and return it with its estimated prompt token count.
+        
+        `history` holds the earlier turns, oldest first, without the current message.
+        Messages sent by `agent_name` become assistant turns; everything else is a user turn.
+        """
+        used = self.count_tokens(system_prompt) if system_prompt else 0
+        
+        # The current message always goes in, shortened only if it alone exceeds the budget
+        current = self._fit(message.content, self.max_prompt_tokens - used)
+        used += self.count_tokens(current)
+        packed = [{"role": "user", "content": current}]
+        
+        # Add earlier turns newest first until the budget or the message limit is reached
+        for msg in reversed(history[-(self.max_messages - 1):] if self.max_messages > 1 else []):
+            content = self._fit(msg.content, self.max_message_tokens)
+            tokens = self.count_tokens(content)
+            if used + tokens > self.max_prompt_tokens:
+                break
+            role = "assistant" if msg.sender == agent_name else "user"
+            packed.append({"role": role, "content": content})
+            used += tokens
+        
+        packed.reverse()
+        return packed, used
+    
+    def _fit(self, text: str, max_tokens: int) -> str:
+        """Shorten a text to at most `max_tokens`, keeping its beginning."""
+        if max_tokens <= 0:
+            return ""
+        if self.count_tokens(text) <= max_tokens:
+            return text
+        
+        # Scale the cut by the measured ratio, then trim until the estimate fits
+        keep = int(len(text) * max_tokens / self.count_tokens(text))
+        shortened = text[:keep].rstrip() + self.TRUNCATION_MARKER
+        while keep > 0 and self.count_tokens(shortened) > max_tokens:
+            keep = int(keep * 0.9)
+            shortened = text[:keep].rstrip() + self.TRUNCATION_MARKER
+        return shortened
\ No newline at end of file
@@ -1,5 +1,5 @@
 from agents.specialized_agent import SpecializedAgent
-from agents.llm_provider import LLMProvider
+from agents.llm_provider import LLMProvider, GenerationConfig
 
 class GeneralAgent(SpecializedAgent):
     """A general-purpose assistant agent that can coordinate with specialized agents."""
@@ -7,6 +7,8 @@ class GeneralAgent(SpecializedAgent):
     def __init__(self, name: str = "Assistant", llm_provider: LLMProvider = None):
         super().__init__(name, llm_provider)
         self.system_prompt = f"You are {name}, a helpful AI assistant."
+        # Compiling a travel guide repeats all four specialist sections, so allow a longer answer
+        self.generation_config = GenerationConfig(max_new_tokens=1024, cache_ttl=3600)
         
     def initialize(self) -> None:
         """Initialize the General agent."""
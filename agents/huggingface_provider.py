@@ -1,132 +1,544 @@
 import os
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
-from typing import Dict, Any, List, Union
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
 from dotenv import load_dotenv
-from agents.llm_provider import LLMProvider
+from agents.llm_provider import (
+    LLMProvider, GenerationConfig, GenerationRequest, PromptPrefix, ProviderError, ProviderBusyError, run_concurrently,
+    strip_stop_sequences
+)
+from agents.prompt_templates import chat_messages, get_template, template_for_model
+from core.metrics import REGISTRY, span
+
+try:
+    import httpx
+except ImportError:  # httpx is optional; without it the async path runs the sync call in a thread
+    httpx = None
 
 load_dotenv()
 
+DEFAULT_API_BASE = "https://api-inference.huggingface.co/models"
+
+# Request formats: a text prompt rendered with the model's chat template, or chat-completion messages
+API_FORMATS = ("text", "messages")
+
+logger = logging.getLogger('travel_agent')
+
+# Time to the response headers (connecting, sending and the model's work) and to read the body
+REQUEST_SECONDS = REGISTRY.histogram(
+    "travel_agent_provider_request_duration_seconds",
+    "Inference API request time by phase (wait: until the response headers, download: reading the body)",
+    ("model", "phase")
+)
+REQUESTS = REGISTRY.counter(
+    "travel_agent_provider_requests",
+    "Inference API requests by HTTP status code (\"error\" when no response arrived)",
+    ("model", "status")
+)
+
 class HuggingFaceProvider(LLMProvider):
-    """Provider that uses HuggingFace's API to generate responses."""
+    """Provider that uses HuggingFace's API to generate responses.
+    
+    With the "text" API format, conversations are rendered as a text prompt
+    with the model's chat template (picked from the model id unless `template`
+    names one); with "messages", they are sent as role/content messages to the
+    model's OpenAI-compatible chat completions route, which applies the
+    template on the server.
+    """
     
-    def __init__(self, model_id: str = "HuggingFaceH4/zephyr-7b-beta"):
+    def __init__(self, model_id: str = "HuggingFaceH4/zephyr-7b-beta", pool_size: int = 10,
+                 max_retries: int = 2, connect_timeout: float = 10.0, read_timeout: float = 120.0,
+                 max_connections: int = 100, warm_up: bool = True, cold_start_timeout: float = 60.0,
+                 warm_up_timeout: float = 600.0, max_backoff: float = 20.0, batching: bool = True,
+                 api_base: Optional[str] = None, template: Optional[str] = None, api_format: Optional[str] = None):
         super().__init__(model_id)  # model_id is the model in HuggingFace's case
         self.model_id = model_id
         self.api_key = os.getenv("HUGGINGFACE_API_KEY")
-        self.api_url = f"https://api-inference.huggingface.co/models/{model_id}"
+        # The API base can point at a compatible server instead, e.g. benchmarks/mock_server.py
+        self.api_base = (api_base or os.getenv("HUGGINGFACE_API_URL") or DEFAULT_API_BASE).rstrip("/")
+        self.api_url = f"{self.api_base}/{model_id}"
+        self.api_format = api_format or os.getenv("HUGGINGFACE_API_FORMAT", "text")
+        if self.api_format not in API_FORMATS:
+            raise ValueError(f"Unknown API format '{self.api_format}' (expected one of {', '.join(API_FORMATS)})")
+        self.endpoint_url = self.api_url if self.api_format == "text" else f"{self.api_url}/v1/chat/completions"
+        self.template = get_template(template) if template else template_for_model(model_id)
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout  # Long read timeout since free tier can take time
+        self.max_connections = max_connections
+        # Cold starts: warm the model up from initialize(), and let requests wait this long for it to load
+        self.warm_up_on_initialize = warm_up
+        self.cold_start_timeout = cold_start_timeout
+        self.warm_up_timeout = warm_up_timeout
+        self.max_backoff = max_backoff
+        # Send several prompts as one list input until the model shows it does not support that
+        self.batching = batching
+        self.headers = self._build_headers()
+        # Keep-alive session shared by every agent using this provider; created on first use
+        self._session = None
+        self._session_lock = threading.Lock()
+        # One async client per event loop: httpx clients cannot be shared across loops
+        self._async_clients = weakref.WeakKeyDictionary()
+        # Readiness: "cold" until the model has answered, "loading" while the API reports it loading
+        self._status = "cold"
+        self._ready_at = 0.0
+        self._warm_up_started = False
+        self._status_lock = threading.Lock()
     
     def initialize(self) -> None:
-        """Initialize the HuggingFace provider."""
+        """Initialize the HuggingFace provider and start warming up the model in the background."""
         # Check if API key is set (optional for HuggingFace)
         if not self.api_key:
-            print(f"Note: No HUGGINGFACE_API_KEY provided. Using free tier with rate limits.")
+            logger.info("No HUGGINGFACE_API_KEY provided; using the free tier with rate limits")
+        
+        # Every agent sharing this provider calls initialize(); only the first one starts the warm-up
+        with self._status_lock:
+            start_warm_up = self.warm_up_on_initialize and not self._warm_up_started
+            self._warm_up_started = True
+        if start_warm_up:
+            threading.Thread(target=self.warm_up, name=f"warm-up-{self.model_id}", daemon=True).start()
+    
+    def warm_up(self) -> bool:
+        """Ping the model with a one-token request until it is loaded; returns whether it is ready."""
+        generation_config = GenerationConfig(max_new_tokens=1, stop=[])
+        payload = self._build_payload([{"role": "user", "content": "Hello"}], "", generation_config)
+        try:
+            self._post(payload, generation_config, self.warm_up_timeout).close()
+            logger.info("Model %s is warm", self.model_id)
+            return True
+        except Exception as e:
+            logger.warning("Warm-up of %s did not finish: %s", self.model_id, e)
+            return False
+    
+    def readiness(self) -> Dict[str, Any]:
+        """Report whether the model is loaded, and how long loading should still take if it is not."""
+        with self._status_lock:
+            status = self._status
+            remaining = self._ready_at - time.monotonic()
+        
+        # A loading estimate that has run out means we no longer know; report cold until the next reply
+        if status == "loading" and remaining <= 0:
+            status = "cold"
+        
+        readiness = {"model": self.model, "ready": status == "ready", "status": status}
+        if status == "loading":
+            readiness["estimated_time"] = remaining
+        return readiness
     
-    def generate_response(self, messages: List[Dict[str, str]], system_prompt: str) -> str:
+    def prepare_prefix(self, system_prompt: str) -> PromptPrefix:
+        """Render the system prompt with the model's chat template once."""
+        return self.template.prefix(system_prompt)
+    
+    def generate_response(self, messages: List[Dict[str, str]], system_prompt: str,
+                          generation_config: Optional[GenerationConfig] = None) -> str:
         """Generate a response using HuggingFace's API."""
+        generation_config = generation_config or GenerationConfig()
         try:
-            # Format the conversation as a text prompt
-            prompt = ""
-            
-            # Add system prompt if provided
-            if system_prompt:
-                prompt += f"System: {system_prompt}\n\n"
+            payload = self._build_payload(messages, system_prompt, generation_config)
+        except Exception as e:
+            raise self._error_response(e) from e
+        
+        return self._generate_from_payload(payload, generation_config)
+    
+    def generate_responses(self, requests: List[GenerationRequest]) -> List[Union[str, ProviderError]]:
+        """Generate responses for several prompts, sending prompts with the same parameters as one list input."""
+        if not self._batches(requests):
+            return super().generate_responses(requests)
+        
+        group_indices, payloads, configs = self._batch_groups(requests)
+        
+        # Send the groups at the same time and put the responses back in request order
+        group_results = run_concurrently([
+            lambda indices=indices: self._generate_batch([payloads[i] for i in indices], [configs[i] for i in indices])
+            for indices in group_indices
+        ])
+        results: List[Union[str, ProviderError]] = [None] * len(requests)
+        for indices, outcome in zip(group_indices, group_results):
+            for index, result in zip(indices, outcome if isinstance(outcome, list) else [outcome] * len(indices)):
+                results[index] = result
+        return results
+    
+    def api_calls(self, requests: List[GenerationRequest]) -> List[List[int]]:
+        """One call per parameter set while the model takes list inputs, otherwise one per request."""
+        if not self._batches(requests):
+            return super().api_calls(requests)
+        return self._batch_groups(requests)[0]
+    
+    async def agenerate_response(self, messages: List[Dict[str, str]], system_prompt: str,
+                                 generation_config: Optional[GenerationConfig] = None) -> str:
+        """Generate a response using HuggingFace's API without blocking the event loop."""
+        if httpx is None:
+            return await super().agenerate_response(messages, system_prompt, generation_config)
+        
+        generation_config = generation_config or GenerationConfig()
+        try:
+            payload = self._build_payload(messages, system_prompt, generation_config)
             
-            # Add messages in a conversational format
-            for msg in messages:
-                role = msg.get("role", "user")
-                content = msg.get("content", "")
-                
-                if role == "user":
-                    prompt += f"User: {content}\n"
-                elif role == "assistant":
-                    prompt += f"Assistant: {content}\n"
+            # Make the API request on the loop's pooled client, waiting out a cold start
+            deadline = time.monotonic() + self.cold_start_timeout
+            attempt = 0
+            while True:
+                started = time.perf_counter()
+                try:
+                    response = await self._get_async_client().post(
+                        self.endpoint_url,
+                        json=payload
+                    )
+                except httpx.HTTPError:
+                    REQUESTS.inc(model=self.model_id, status="error")
+                    raise
+                # httpx has read the body by now, so the wait phase includes the download here
+                REQUEST_SECONDS.observe(time.perf_counter() - started, model=self.model_id, phase="wait")
+                REQUESTS.inc(model=self.model_id, status=response.status_code)
+                if response.status_code == 200:
+                    self._set_status("ready")
+                try:
+                    return self._parse_response(response.status_code, response.text, generation_config)
+                except ProviderError as e:
+                    delay = self._cold_start_delay(e, attempt, deadline)
+                    if delay is None:
+                        raise
+                await asyncio.sleep(delay)
+                attempt += 1
+        
+        except ProviderError:
+            raise
+        except Exception as e:
+            raise self._error_response(e) from e
+    
+    def stream_response(self, messages: List[Dict[str, str]], system_prompt: str,
+                        generation_config: Optional[GenerationConfig] = None) -> Iterator[str]:
+        """Stream a response token by token using the API's server-sent events."""
+        generation_config = generation_config or GenerationConfig()
+        try:
+            payload = self._build_payload(messages, system_prompt, generation_config)
+            payload["stream"] = True
             
-            # Add final prompt for the assistant to continue
-            prompt += "Assistant: "
+            # Make the API request, waiting out a cold start, then read the body incrementally
+            response = self._post(payload, generation_config, self.cold_start_timeout, stream=True)
             
-            # Debug: print the formatted prompt
-            print(f"Debug - Formatted prompt sent to HuggingFace:\n{prompt[:200]}...")
+            with response, REQUEST_SECONDS.time(model=self.model_id, phase="download"):
+                for line in response.iter_lines(decode_unicode=True):
+                    # Events look like: data:{"token": {"text": "...", "special": false}, ...}, or with
+                    # the messages format data: {"choices": [{"delta": {"content": "..."}}]} up to data: [DONE]
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    event = json.loads(data)
+                    if "error" in event:
+                        raise ProviderError(f"Sorry, I couldn't finish the response: {event['error']}")
+                    if "choices" in event:
+                        choices = event["choices"]
+                        content = (choices[0].get("delta") or {}).get("content") if choices else None
+                        if content:
+                            yield content
+                        continue
+                    token = event.get("token") or {}
+                    if token.get("text") and not token.get("special"):
+                        yield token["text"]
+        
+        except ProviderError:
+            raise
+        except Exception as e:
+            raise self._error_response(e) from e
+    
+    def close(self) -> None:
+        """Close the pooled HTTP session and its open connections."""
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+    
+    async def aclose(self) -> None:
+        """Close the async HTTP client bound to the running event loop, if any."""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+    
+    def _get_session(self) -> requests.Session:
+        """Get the pooled HTTP session, creating it on first use."""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    # Retry transient gateway errors and dropped connections; 503 "model loading"
+                    # replies are returned to the caller so they can be reported
+                    retry = Retry(
+                        total=self.max_retries,
+                        backoff_factor=0.5,
+                        status_forcelist=(502, 504),
+                        allowed_methods=frozenset({"POST"}),
+                        raise_on_status=False
+                    )
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+                    session = requests.Session()
+                    session.headers.update(self.headers)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+    
+    def _get_async_client(self) -> "httpx.AsyncClient":
+        """Get the async HTTP client for the running event loop, creating it on first use."""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=self.max_connections)
+            )
+            self._async_clients[loop] = client
+        return client
+    
+    def _post(self, payload: Dict[str, Any], generation_config: GenerationConfig, max_wait: float,
+              stream: bool = False) -> requests.Response:
+        """POST a payload on the pooled session, retrying while the model loads; returns a 200 response.
+        
+        Raises ProviderError for any other status, or once the model is not
+        expected to be ready within `max_wait` seconds. With `stream`, the body
+        is left for the caller to read.
+        """
+        deadline = time.monotonic() + max_wait
+        attempt = 0
+        while True:
+            # Always ask for the body lazily, so waiting for the reply and downloading it are timed apart
+            started = time.perf_counter()
+            try:
+                response = self._get_session().post(
+                    self.endpoint_url,
+                    json=payload,
+                    timeout=(self.connect_timeout, self.read_timeout),
+                    stream=True
+                )
+            except requests.RequestException:
+                REQUESTS.inc(model=self.model_id, status="error")
+                raise
+            REQUEST_SECONDS.observe(time.perf_counter() - started, model=self.model_id, phase="wait")
+            REQUESTS.inc(model=self.model_id, status=response.status_code)
             
-            # Set headers
-            headers = {
-                "Content-Type": "application/json"
-            }
+            if response.status_code == 200:
+                self._set_status("ready")
+                if not stream:
+                    with REQUEST_SECONDS.time(model=self.model_id, phase="download"):
+                        response.content
+                return response
             
-            # Add Authorization header if API key is provided
-            if self.api_key:
-                headers["Authorization"] = f"Bearer {self.api_key}"
+            with response:
+                body = response.text
+            try:
+                # Reuse the regular error handling, which raises ProviderError
+                self._parse_response(response.status_code, body, generation_config)
+            except ProviderError as e:
+                delay = self._cold_start_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+    
+    def _generate_from_payload(self, payload: Dict[str, Any], generation_config: GenerationConfig) -> str:
+        """Send one prompt's payload and return the generated text."""
+        try:
+            # Make the API request on the pooled keep-alive session, waiting out a cold start
+            response = self._post(payload, generation_config, self.cold_start_timeout)
             
-            # Create the API request payload - use only text string
+            return self._parse_response(response.status_code, response.text, generation_config)
+        
+        except ProviderError:
+            raise
+        except Exception as e:
+            raise self._error_response(e) from e
+    
+    def _generate_batch(self, payloads: List[Dict[str, Any]],
+                        configs: List[GenerationConfig]) -> List[Union[str, ProviderError]]:
+        """Send prompts that share their parameters as one list input, falling back to one request per prompt."""
+        if len(payloads) > 1 and self.batching:
+            payload = {"inputs": [p["inputs"] for p in payloads], "parameters": payloads[0]["parameters"]}
+            try:
+                response = self._post(payload, configs[0], self.cold_start_timeout)
+                outputs = json.loads(response.text)
+                if isinstance(outputs, list) and len(outputs) == len(payloads):
+                    with span("cleanup"):
+                        return [self._extract_text(output, config) for output, config in zip(outputs, configs)]
+                logger.info("Model %s answered a list input with %s; sending prompts one by one",
+                            self.model_id, type(outputs).__name__)
+            except ProviderError as e:
+                # Anything but a rejected input shape would fail the single requests too
+                if e.status_code not in (400, 422):
+                    return [e] * len(payloads)
+                logger.info("Model %s does not accept list inputs (%s); sending prompts one by one",
+                            self.model_id, e.status_code)
+            except Exception as e:
+                return [self._error_response(e)] * len(payloads)
+            # From now on `api_calls` reports one call per request, so rate limiters admit each on its own
+            self.batching = False
+        
+        return run_concurrently([
+            lambda payload=payload, config=config: self._generate_from_payload(payload, config)
+            for payload, config in zip(payloads, configs)
+        ])
+    
+    def _batches(self, requests: List[GenerationRequest]) -> bool:
+        """Whether several requests would go out as list inputs."""
+        return self.batching and self.api_format == "text" and len(requests) > 1
+    
+    def _batch_groups(self, requests: List[GenerationRequest]) -> Tuple[List[List[int]], List[Dict[str, Any]],
+                                                                       List[GenerationConfig]]:
+        """Build the requests' payloads and group their positions by generation parameters."""
+        # The API applies one set of parameters to a whole list input, so batch per parameter set
+        groups: Dict[str, List[int]] = {}
+        payloads, configs = [], []
+        for index, request in enumerate(requests):
+            generation_config = request.generation_config or GenerationConfig()
+            payload = self._build_payload(request.messages, request.system_prompt, generation_config)
+            payloads.append(payload)
+            configs.append(generation_config)
+            groups.setdefault(json.dumps(payload["parameters"], sort_keys=True), []).append(index)
+        return list(groups.values()), payloads, configs
+    
+    def _cold_start_delay(self, error: ProviderError, attempt: int, deadline: float) -> Optional[float]:
+        """How long to wait before retrying a "model loading" error, or None to give up.
+        
+        Waits for the API's estimated loading time (or an exponential backoff when
+        it gives none), capped at `max_backoff` so the model is polled regularly,
+        with jitter so concurrent requests do not retry in lockstep.
+        """
+        if error.status_code != 503:
+            return None
+        
+        if error.retry_after:
+            self._set_status("loading", error.retry_after)
+        delay = min(error.retry_after or 2.0 ** attempt, self.max_backoff) * random.uniform(0.8, 1.2)
+        if time.monotonic() + delay > deadline:
+            return None
+        logger.info("Model %s is loading, retrying in %.1fs", self.model_id, delay)
+        return delay
+    
+    def _set_status(self, status: str, estimated_time: float = 0.0) -> None:
+        """Record the model's readiness after an API reply."""
+        with self._status_lock:
+            self._status = status
+            self._ready_at = time.monotonic() + estimated_time
+    
+    def _build_headers(self) -> Dict[str, str]:
+        """Build the HTTP headers for an API request."""
+        # Set headers
+        headers = {
+            "Content-Type": "application/json"
+        }
+        
+        # Add Authorization header if API key is provided
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        
+        return headers
+    
+    def _build_payload(self, messages: List[Dict[str, str]], system_prompt: str,
+                       generation_config: GenerationConfig) -> Dict[str, Any]:
+        """Wrap the conversation in an API payload with the agent's generation parameters."""
+        if self.api_format == "messages":
+            # The server renders the messages with the model's own chat template
             payload = {
-                "inputs": prompt
+                "model": self.model_id,
+                "messages": chat_messages(messages, system_prompt),
+                "max_tokens": generation_config.max_new_tokens,
+                "temperature": generation_config.temperature,
+                "top_p": generation_config.top_p,
+                "stop": self.stop_sequences(generation_config)
             }
+            logger.debug("Sending %d messages to %s", len(payload["messages"]), self.model_id)
+            return payload
+        
+        prompt = self.template.render(messages, system_prompt, generation_config.prompt_prefix)
+        logger.debug("Sending a %s prompt to %s:\n%.200s", self.template.name, self.model_id, prompt)
+        return {
+            "inputs": prompt,
+            "parameters": {
+                "max_new_tokens": generation_config.max_new_tokens,
+                "temperature": generation_config.temperature,
+                "top_p": generation_config.top_p,
+                "stop": self.stop_sequences(generation_config),
+                "return_full_text": generation_config.return_full_text
+            }
+        }
+    
+    def stop_sequences(self, generation_config: GenerationConfig) -> List[str]:
+        """The agent's stop sequences followed by the chat template's end-of-turn markers."""
+        return list(dict.fromkeys([*generation_config.stop, *self.template.stop]))
+    
+    def _parse_response(self, status_code: int, body: str, generation_config: GenerationConfig) -> str:
+        """Extract the generated text from an API response, or describe the API error."""
+        logger.debug("Response status from %s: %s", self.model_id, status_code)
+        
+        if status_code == 200:
+            with span("cleanup"):
+                return self._extract_text(json.loads(body), generation_config)
+        else:
+            # Handle API error with more details
+            error_detail = "Unknown error"
+            error_message = f"Sorry, I couldn't process your request. API error: {status_code}"
+            retry_after = None
             
-            # Debug info
-            print(f"Sending request to HuggingFace API for model {self.model_id}...")
-            print(f"Payload format: inputs is a {type(payload['inputs']).__name__}")
-            
-            # Make the API request
-            response = requests.post(
-                self.api_url,
-                headers=headers,
-                json=payload,
-                timeout=120  # Longer timeout since free tier can take time
-            )
-            
-            # Debug info
-            print(f"Response status: {response.status_code}")
-            
-            if response.status_code == 200:
-                response_json = response.json()
-                
-                # Debug the response structure
-                print(f"Response type: {type(response_json).__name__}")
-                if isinstance(response_json, list):
-                    print(f"Response is a list with {len(response_json)} items")
-                
-                # Extract the generated text from the response
-                if isinstance(response_json, list) and len(response_json) > 0:
-                    if "generated_text" in response_json[0]:
-                        return response_json[0]["generated_text"]
-                elif isinstance(response_json, dict):
-                    if "generated_text" in response_json:
-                        return response_json["generated_text"]
-                
-                # Try to extract the response as a simple string
-                if isinstance(response_json, str):
-                    return response_json
-                elif isinstance(response_json, list) and len(response_json) > 0:
-                    if isinstance(response_json[0], str):
-                        return response_json[0]
-                
-                # Last resort: convert the entire response to a string
-                return str(response_json)
-                
-            else:
-                # Handle API error with more details
-                error_detail = "Unknown error"
-                error_message = f"Sorry, I couldn't process your request. API error: {response.status_code}"
+            try:
+                error_json = json.loads(body)
+                error_detail = json.dumps(error_json, indent=2)
                 
-                try:
-                    error_json = response.json()
-                    error_detail = json.dumps(error_json, indent=2)
-                    
-                    # Check for model loading message
-                    if "estimated_time" in response.text:
-                        error_data = response.json()
-                        wait_time = error_data.get("estimated_time", "unknown")
-                        error_message = f"I'm still warming up. The model is being loaded and will be ready in approximately {wait_time} seconds. Please try again shortly."
-                except:
-                    error_detail = response.text
-                
-                print(f"API Error Details: {error_detail}")
-                return error_message
-                
-        except Exception as e:
-            # If something goes wrong, provide a fallback response
-            import traceback
-            traceback_str = traceback.format_exc()
-            print(f"Exception: {str(e)}\n{traceback_str}")
+                # Check for model loading message
+                if "estimated_time" in body:
+                    wait_time = error_json.get("estimated_time", "unknown")
+                    if isinstance(wait_time, (int, float)):
+                        retry_after = float(wait_time)
+                    error_message = f"I'm still warming up. The model is being loaded and will be ready in approximately {wait_time} seconds. Please try again shortly."
+            except:
+                error_detail = body
             
-            return f"I apologize, but I encountered an error when trying to process your query: {str(e)}" 
\ No newline at end of file
+            logger.warning("API error %s from %s: %s", status_code, self.model_id, error_detail)
+            if status_code == 429:
+                # Over the API's rate limit: tell the user we are busy rather than quoting the status code
+                raise ProviderBusyError(status_code=status_code, retry_after=retry_after)
+            raise ProviderError(error_message, status_code, retry_after)
+    
+    def _extract_text(self, response_json: Any, generation_config: GenerationConfig) -> str:
+        """Pull the generated text out of a successful API response."""
+        # Extract the generated text from the response
+        if isinstance(response_json, list) and len(response_json) > 0:
+            if "generated_text" in response_json[0]:
+                return self._strip_stop_sequences(response_json[0]["generated_text"], generation_config)
+        elif isinstance(response_json, dict):
+            if "generated_text" in response_json:
+                return self._strip_stop_sequences(response_json["generated_text"], generation_config)
+            # Chat completions: {"choices": [{"message": {"role": "assistant", "content": "..."}}]}
+            if response_json.get("choices"):
+                message = response_json["choices"][0].get("message") or {}
+                return self._strip_stop_sequences(message.get("content") or "", generation_config)
+        
+        # Try to extract the response as a simple string
+        if isinstance(response_json, str):
+            return response_json
+        elif isinstance(response_json, list) and len(response_json) > 0:
+            if isinstance(response_json[0], str):
+                return response_json[0]
+        
+        # Last resort: convert the entire response to a string
+        return str(response_json)
+    
+    def _strip_stop_sequences(self, text: str, generation_config: GenerationConfig) -> str:
+        """Drop a trailing stop sequence, which the API includes when generation stops on it."""
+        return strip_stop_sequences(text, self.stop_sequences(generation_config))
+    
+    def _error_response(self, e: Exception) -> ProviderError:
+        """Log an unexpected exception and turn it into a provider error with a fallback message."""
+        # If something goes wrong, provide a fallback response
+        logger.error("Request to %s failed: %s", self.model_id, e, exc_info=e)
+        
+        return ProviderError(f"I apologize, but I encountered an error when trying to process your query: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,231 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from agents.llm_provider import LLMProvider, GenerationConfig, PromptPrefix, ProviderError
+from agents.prompt_templates import get_template, template_for_model
+
+try:
+    from llama_cpp import Llama, LlamaRAMCache
+except ImportError:  # llama-cpp-python is optional; without it the provider reports itself unavailable
+    Llama = None
+    LlamaRAMCache = None
+
+logger = logging.getLogger('travel_agent')
+
+class LlamaCppProvider(LLMProvider):
+    """Provider that runs a quantized GGUF model in-process on the CPU with llama.cpp.
+    
+    The model is loaded on first use (or in the background from `initialize`
+    with `preload`), with its weights memory-mapped so loading is quick and
+    the pages are shared between processes. Evaluated prompt prefixes are kept
+    in a KV cache of up to `kv_cache_bytes`, so a conversation's next turn, or
+    another request with the same system prompt, only evaluates the new tokens.
+    Agents' prepared system prompt prefixes are evaluated once when the model
+    loads and their KV state is kept outside that cache, so it is never evicted.
+    
+    Prompts are rendered with the chat template named by `template`, or the
+    one the model file's name points to.
+    
+    llama.cpp runs one generation at a time per model; concurrent calls wait
+    their turn and use `n_threads` cores while generating.
+    """
+    
+    def __init__(self, model_path: str, n_ctx: int = 4096, n_threads: Optional[int] = None, n_batch: int = 512,
+                 use_mmap: bool = True, use_mlock: bool = False, kv_cache_bytes: int = 2 << 30,
+                 preload: bool = False, template: Optional[str] = None):
+        super().__init__(os.path.basename(model_path))
+        self.model_path = model_path
+        self.n_ctx = n_ctx
+        # Generation is memory-bound; about one thread per physical core works best
+        self.n_threads = n_threads or max(1, (os.cpu_count() or 2) // 2)
+        self.n_batch = n_batch
+        self.use_mmap = use_mmap
+        self.use_mlock = use_mlock
+        self.kv_cache_bytes = kv_cache_bytes
+        self.preload = preload
+        self.template = get_template(template) if template else template_for_model(self.model)
+        self._llm = None
+        self._load_lock = threading.Lock()
+        self._generate_lock = threading.Lock()
+        self._loading_since: Optional[float] = None
+        # Prepared prefixes by key, and the saved model state (a LlamaState) of those evaluated so far
+        self._prefixes: Dict[str, PromptPrefix] = {}
+        self._prefix_states: Dict[str, Any] = {}
+    
+    def initialize(self) -> None:
+        """Check the model can be loaded, and start loading it in the background with `preload`."""
+        if Llama is None:
+            logger.warning("llama-cpp-python is not installed; the local model is unavailable "
+                           "(pip install llama-cpp-python)")
+            return
+        if not os.path.exists(self.model_path):
+            logger.warning("Local model %s not found; the local model is unavailable", self.model_path)
+            return
+        
+        if self.preload and self._llm is None:
+            threading.Thread(target=self._load, name=f"load-{self.model}", daemon=True).start()
+    
+    def readiness(self) -> Dict[str, Any]:
+        """Report whether the model is loaded ("ready"), loading or not loaded yet ("cold")."""
+        if self._llm is not None:
+            return {"model": self.model, "ready": True, "status": "ready"}
+        loading_since = self._loading_since
+        if loading_since is None:
+            return {"model": self.model, "ready": False, "status": "cold"}
+        return {"model": self.model, "ready": False, "status": "loading",
+                "estimated_time": max(1.0, self._load_estimate() - (time.monotonic() - loading_since))}
+    
+    def prepare_prefix(self, system_prompt: str) -> PromptPrefix:
+        """Prepare the prefix and keep its KV state, evaluated now or as soon as the model is loaded."""
+        prefix = self.template.prefix(system_prompt)
+        self._prefixes[prefix.key] = prefix
+        if self._llm is not None:
+            self._evaluate_prefix(self._llm, prefix)
+        return prefix
+    
+    def generate_response(self, messages: List[Dict[str, str]], system_prompt: str,
+                          generation_config: Optional[GenerationConfig] = None) -> str:
+        """Generate a response with the local model."""
+        generation_config = generation_config or GenerationConfig()
+        llm = self._load()
+        prompt = self.template.render(messages, system_prompt, generation_config.prompt_prefix)
+        try:
+            with self._generate_lock:
+                self._restore_prefix(llm, generation_config.prompt_prefix, system_prompt, prompt)
+                completion = llm.create_completion(prompt, **self._completion_arguments(generation_config))
+        except Exception as e:
+            raise self._error_response(e) from e
+        return completion["choices"][0]["text"].strip()
+    
+    def stream_response(self, messages: List[Dict[str, str]], system_prompt: str,
+                        generation_config: Optional[GenerationConfig] = None) -> Iterator[str]:
+        """Stream a response token by token from the local model."""
+        generation_config = generation_config or GenerationConfig()
+        llm = self._load()
+        prompt = self.template.render(messages, system_prompt, generation_config.prompt_prefix)
+        with self._generate_lock:
+            try:
+                self._restore_prefix(llm, generation_config.prompt_prefix, system_prompt, prompt)
+                for chunk in llm.create_completion(prompt, stream=True, **self._completion_arguments(generation_config)):
+                    text = chunk["choices"][0]["text"]
+                    if text:
+                        yield text
+            except Exception as e:
+                raise self._error_response(e) from e
+    
+    def close(self) -> None:
+        """Release the model and its KV cache."""
+        with self._load_lock, self._generate_lock:
+            if self._llm is not None:
+                if hasattr(self._llm, "close"):
+                    self._llm.close()
+                self._llm = None
+    
+    def _load(self):
+        """Load the model on first use; later calls return it right away."""
+        if self._llm is not None:
+            return self._llm
+        if Llama is None:
+            raise ProviderError("Sorry, the local model is not available (llama-cpp-python is not installed).")
+        
+        with self._load_lock:
+            if self._llm is None:
+                self._loading_since = time.monotonic()
+                try:
+                    llm = Llama(
+                        model_path=self.model_path,
+                        n_ctx=self.n_ctx,
+                        n_threads=self.n_threads,
+                        n_batch=self.n_batch,
+                        use_mmap=self.use_mmap,
+                        use_mlock=self.use_mlock,
+                        verbose=False
+                    )
+                    if self.kv_cache_bytes:
+                        # Saves evaluated prompt states and restores the longest matching prefix
+                        llm.set_cache(LlamaRAMCache(capacity_bytes=self.kv_cache_bytes))
+                except Exception as e:
+                    logger.error("Loading local model %s failed: %s", self.model_path, e, exc_info=e)
+                    raise ProviderError("Sorry, the local model could not be loaded.") from e
+                finally:
+                    self._loading_since = None
+                logger.info("Local model %s loaded (%s threads, %s token context)",
+                            self.model, self.n_threads, self.n_ctx)
+                for prefix in list(self._prefixes.values()):
+                    self._evaluate_prefix(llm, prefix)
+                self._llm = llm
+        return self._llm
+    
+    def _evaluate_prefix(self, llm, prefix: PromptPrefix) -> None:
+        """Run the prefix through the model once and keep the resulting KV state."""
+        if prefix.key in self._prefix_states or not prefix.text:
+            return
+        try:
+            with self._generate_lock:
+                # Tokenized like llama.cpp tokenizes completion prompts
+                tokens = llm.tokenize(prefix.text.encode("utf-8"), special=True)
+                llm.reset()
+                llm.eval(tokens)
+                self._prefix_states[prefix.key] = llm.save_state()
+        except Exception as e:
+            # Not fatal: requests then evaluate the prefix themselves
+            logger.warning("Precomputing a prompt prefix on %s failed: %s", self.model, e)
+    
+    def _restore_prefix(self, llm, prefix: Optional[PromptPrefix], system_prompt: str, prompt: str) -> None:
+        """Load the prefix's saved state when it covers more of the prompt than the model's current context.
+        
+        Both are compared with the whole prompt tokenized the way llama.cpp
+        tokenizes it, since tokens can merge across the end of the prefix; a
+        saved state that does not match the prompt's tokens is not used.
+        llama.cpp then only evaluates the prompt after the longest prefix it has
+        in its context (or in the RAM cache, if that holds a longer one). Called
+        with the generation lock held.
+        """
+        if prefix is None or prefix.system_prompt != system_prompt:
+            return
+        state = self._prefix_states.get(prefix.key)
+        if state is None:
+            return
+        prompt_tokens = llm.tokenize(prompt.encode("utf-8"), special=True)
+        saved = state.input_ids[:state.n_tokens]
+        if _common_prefix_length(saved, prompt_tokens) < len(saved):
+            return
+        if _common_prefix_length(llm.input_ids[:llm.n_tokens], prompt_tokens) < len(saved):
+            llm.load_state(state)
+    
+    def stop_sequences(self, generation_config: GenerationConfig) -> List[str]:
+        """The agent's stop sequences followed by the chat template's end-of-turn markers."""
+        return list(dict.fromkeys([*generation_config.stop, *self.template.stop]))
+    
+    def _completion_arguments(self, generation_config: GenerationConfig) -> Dict[str, Any]:
+        """Translate the agent's generation parameters to llama.cpp's."""
+        return {
+            "max_tokens": generation_config.max_new_tokens,
+            "temperature": generation_config.temperature,
+            "top_p": generation_config.top_p,
+            "stop": self.stop_sequences(generation_config) or None,
+            "echo": generation_config.return_full_text
+        }
+    
+    def _load_estimate(self) -> float:
+        """Rough seconds to load the model: memory-mapped weights are read at about 500 MB/s on first touch."""
+        try:
+            return os.path.getsize(self.model_path) / 500e6
+        except OSError:
+            return 10.0
+    
+    def _error_response(self, e: Exception) -> ProviderError:
+        """Log an unexpected exception and turn it into a provider error with a fallback message."""
+        logger.error("Local model %s failed: %s", self.model, e, exc_info=e)
+        return ProviderError("Sorry, I couldn't generate a response with the local model.")
+
+def _common_prefix_length(a: Sequence[int], b: Sequence[int]) -> int:
+    """How many leading tokens two token sequences share."""
+    length = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        length += 1
+    return length
\ No newline at end of file
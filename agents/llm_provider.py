@@ -1,19 +1,179 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Any, Iterator, List, Optional, Union
 from core.base import Message
+from agents.prompt_templates import PLAIN, PromptPrefix
+
+class ProviderError(Exception):
+    """Raised by an LLM provider when it could not produce a response.
+    
+    The message is safe to show to the user; `status_code` carries the HTTP status
+    when the failure came from the backend API, and `retry_after` how many seconds
+    the backend expects to need before it can answer (e.g. while a model loads).
+    """
+    
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class ProviderBusyError(ProviderError):
+    """Raised when a request is turned away because the API, or our own rate limiter, is at capacity."""
+    
+    def __init__(self, message: str = "Sorry, I'm handling too many requests right now. Please try again in a moment.",
+                 status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message, status_code, retry_after)
+
+@dataclass
+class GenerationConfig:
+    """Generation parameters an agent sends along with each request to its LLM provider."""
+    max_new_tokens: int = 512
+    temperature: float = 0.7
+    top_p: float = 0.95
+    # Stop before the model starts writing the next turn of the conversation itself
+    stop: List[str] = field(default_factory=lambda: ["\nUser:", "\nSystem:"])
+    # Only return the completion, not the prompt echoed back in front of it
+    return_full_text: bool = False
+    # How long responses may be served from a response cache (None uses the cache's default)
+    cache_ttl: Optional[float] = None
+    # The agent's system prompt as prepared by its provider; used when the request's system prompt matches it
+    prompt_prefix: Optional[PromptPrefix] = field(default=None, repr=False)
+
+@dataclass
+class GenerationRequest:
+    """One prompt in a batch sent to `LLMProvider.generate_responses`."""
+    messages: List[Dict[str, str]]
+    system_prompt: str
+    generation_config: Optional[GenerationConfig] = None
+
+# Worker threads shared by every batch, so each call does not start threads of its own
+_MAX_WORKERS = 32
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def _shared_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_MAX_WORKERS, thread_name_prefix="provider-batch")
+        return _executor
+
+def run_concurrently(calls: List[Callable[[], Any]]) -> List[Union[Any, ProviderError]]:
+    """Run provider calls on worker threads, returning each result or the ProviderError it raised.
+    
+    Each call runs in a copy of the caller's context, so settings such as the
+    request priority carry over to the worker threads. The calling thread
+    runs the first call itself, and any call no worker has picked up by the
+    time it gets to it, so batches nested in batches cannot exhaust the pool.
+    """
+    def run(call: Callable[[], Any]) -> Union[Any, ProviderError]:
+        try:
+            return call()
+        except ProviderError as e:
+            return e
+    
+    if len(calls) == 1:
+        return [run(calls[0])]
+    executor = _shared_executor()
+    futures = [executor.submit(contextvars.copy_context().run, run, call) for call in calls[1:]]
+    results = [run(calls[0])]
+    for call, future in zip(calls[1:], futures):
+        results.append(run(call) if future.cancel() else future.result())
+    return results
+
+def strip_stop_sequences(text: str, stop: List[str]) -> str:
+    """Drop a trailing stop sequence, which backends include when generation stops on it, and surrounding whitespace."""
+    text = text.rstrip()
+    for sequence in stop:
+        sequence = sequence.rstrip()
+        if sequence and text.endswith(sequence):
+            text = text[:-len(sequence)]
+            break
+    return text.strip()
 
 class LLMProvider(ABC):
     """Base class for LLM providers that handle the actual API calls to different language models."""
     
     def __init__(self, model: str):
         self.model = model
-        
+    
     @abstractmethod
     def initialize(self) -> None:
         """Initialize the LLM provider with any necessary setup."""
         pass
     
+    def readiness(self) -> Dict[str, Any]:
+        """Report whether the provider can answer right away.
+        
+        Returns a dict with the model, a `ready` flag and a `status` ("ready",
+        "cold" or "loading"); a loading backend also reports `estimated_time`,
+        the seconds it expects to need. Providers whose backend has to warm up
+        should override this.
+        """
+        return {"model": self.model, "ready": True, "status": "ready"}
+    
+    def prepare_prefix(self, system_prompt: str) -> PromptPrefix:
+        """Prepare an agent's static system prompt once, for it to pass along with every request.
+        
+        Providers whose backend can keep precomputed state for a prompt prefix
+        should override this to set that state up.
+        """
+        return PLAIN.prefix(system_prompt)
+    
     @abstractmethod
-    def generate_response(self, messages: List[Dict[str, str]], system_prompt: str) -> str:
-        """Generate a response from the LLM given a list of messages and a system prompt."""
-        pass 
\ No newline at end of file
+    def generate_response(self, messages: List[Dict[str, str]], system_prompt: str,
+                          generation_config: Optional[GenerationConfig] = None) -> str:
+        """Generate a response from the LLM given a list of messages and a system prompt.
+        
+        Raises ProviderError when no response could be generated.
+        """
+        pass
+    
+    def generate_responses(self, requests: List[GenerationRequest]) -> List[Union[str, ProviderError]]:
+        """Generate responses for several independent prompts at once.
+        
+        Returns one entry per request, in order: the response text, or the
+        ProviderError for a request that failed, so one failure does not sink
+        the rest. The default implementation makes the single calls
+        concurrently; providers whose backend accepts batched inputs should
+        override it to save round trips.
+        """
+        return run_concurrently([
+            lambda request=request: self.generate_response(request.messages, request.system_prompt,
+                                                           request.generation_config)
+            for request in requests
+        ])
+    
+    def stop_sequences(self, generation_config: GenerationConfig) -> List[str]:
+        """The stop sequences generation ends on, for callers that clean up streamed text themselves."""
+        return list(generation_config.stop)
+    
+    def api_calls(self, requests: List[GenerationRequest]) -> List[List[int]]:
+        """How `generate_responses` would split a batch into API calls: the request positions of each call.
+        
+        Rate limiters use this to admit every call on its own. The default is
+        one call per request; providers that batch should override it.
+        """
+        return [[index] for index in range(len(requests))]
+    
+    async def agenerate_response(self, messages: List[Dict[str, str]], system_prompt: str,
+                                 generation_config: Optional[GenerationConfig] = None) -> str:
+        """Asynchronously generate a response from the LLM.
+        
+        The default implementation runs `generate_response` in a worker thread; providers
+        with a non-blocking client should override it.
+        """
+        return await asyncio.to_thread(self.generate_response, messages, system_prompt, generation_config)
+    
+    def stream_response(self, messages: List[Dict[str, str]], system_prompt: str,
+                        generation_config: Optional[GenerationConfig] = None) -> Iterator[str]:
+        """Generate a response as a stream of text chunks.
+        
+        The default implementation yields the whole response as one chunk; providers
+        whose backend can stream tokens should override it.
+        """
+        yield self.generate_response(messages, system_prompt, generation_config)
\ No newline at end of file
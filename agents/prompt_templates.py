@@ -0,0 +1,157 @@
+import hashlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+@dataclass(frozen=True)
+class PromptPrefix:
+    """A system prompt prepared once by a provider, for reuse on every request.
+    
+    `text` is the start of the prompt the provider renders for it with its
+    chat template and `key` a hash identifying that text, under which backends
+    that can keep state for the prefix (such as a local model's KV cache) store it.
+    """
+    system_prompt: str
+    text: str
+    key: str
+    template: str = "plain"
+
+class ChatTemplate:
+    """A model's chat format: how system, user and assistant turns are marked up in a text prompt.
+    
+    The per-role markers are worked out once when the template is created;
+    rendering a conversation then collects the pieces and joins them once.
+    Models that have no system role (like Mistral's instruct models) put
+    the system prompt at the start of the first user turn instead, which
+    `first_user_start` covers.
+    """
+    
+    def __init__(self, name: str, system: Tuple[str, str], user: Tuple[str, str], assistant: Tuple[str, str],
+                 generation_start: str, bos: str = "", first_user_start: Optional[str] = None,
+                 stop: Tuple[str, ...] = ()):
+        self.name = name
+        self.bos = bos
+        self.generation_start = generation_start
+        self.first_user_start = first_user_start
+        # Stop sequences that mark the start of a turn the model should not write itself
+        self.stop = stop
+        self._roles: Dict[str, Tuple[str, str]] = {"system": system, "user": user, "assistant": assistant}
+    
+    def render(self, messages: List[Dict[str, str]], system_prompt: str, prefix: Optional[PromptPrefix] = None) -> str:
+        """Render a conversation as a prompt ending where the assistant's reply starts.
+        
+        A prefix this template prepared for the same system prompt is used as is.
+        """
+        if prefix is not None and prefix.template == self.name and prefix.system_prompt == system_prompt:
+            parts = [prefix.text]
+        else:
+            parts = [self.render_system(system_prompt)]
+        
+        for index, msg in enumerate(messages):
+            role = msg.get("role", "user")
+            start_end = self._roles.get(role)
+            if start_end is None or role == "system":
+                continue
+            start, end = start_end
+            if index == 0 and role == "user" and system_prompt and self.first_user_start is not None:
+                start = self.first_user_start
+            parts += (start, msg.get("content", ""), end)
+        
+        parts.append(self.generation_start)
+        return "".join(parts)
+    
+    def render_system(self, system_prompt: str) -> str:
+        """Render the start of a prompt up to and including the system prompt."""
+        if not system_prompt:
+            return self.bos
+        start, end = self._roles["system"]
+        return f"{self.bos}{start}{system_prompt}{end}"
+    
+    def prefix(self, system_prompt: str) -> PromptPrefix:
+        """Prepare a system prompt for reuse with this template."""
+        text = self.render_system(system_prompt)
+        return PromptPrefix(system_prompt, text, hashlib.sha256(text.encode("utf-8")).hexdigest(), self.name)
+
+# The plain-text format the agents have always used
+PLAIN = ChatTemplate(
+    "plain",
+    system=("System: ", "\n\n"),
+    user=("User: ", "\n"),
+    assistant=("Assistant: ", "\n"),
+    generation_start="Assistant: ",
+    stop=("\nUser:", "\nSystem:")
+)
+
+TEMPLATES: Dict[str, ChatTemplate] = {
+    "plain": PLAIN,
+    "zephyr": ChatTemplate(
+        "zephyr",
+        system=("<|system|>\n", "</s>\n"),
+        user=("<|user|>\n", "</s>\n"),
+        assistant=("<|assistant|>\n", "</s>\n"),
+        generation_start="<|assistant|>\n",
+        stop=("</s>", "<|user|>", "<|system|>")
+    ),
+    "chatml": ChatTemplate(
+        "chatml",
+        system=("<|im_start|>system\n", "<|im_end|>\n"),
+        user=("<|im_start|>user\n", "<|im_end|>\n"),
+        assistant=("<|im_start|>assistant\n", "<|im_end|>\n"),
+        generation_start="<|im_start|>assistant\n",
+        stop=("<|im_end|>", "<|im_start|>")
+    ),
+    "llama3": ChatTemplate(
+        "llama3",
+        system=("<|start_header_id|>system<|end_header_id|>\n\n", "<|eot_id|>"),
+        user=("<|start_header_id|>user<|end_header_id|>\n\n", "<|eot_id|>"),
+        assistant=("<|start_header_id|>assistant<|end_header_id|>\n\n", "<|eot_id|>"),
+        generation_start="<|start_header_id|>assistant<|end_header_id|>\n\n",
+        bos="<|begin_of_text|>",
+        stop=("<|eot_id|>",)
+    ),
+    "mistral": ChatTemplate(
+        "mistral",
+        system=("[INST] ", "\n\n"),
+        user=("[INST] ", " [/INST]"),
+        assistant=("", "</s>"),
+        generation_start="",
+        bos="<s>",
+        first_user_start="",
+        stop=("</s>", "[INST]")
+    ),
+}
+
+# Substrings of model ids (lower case) and the template their models were trained with
+_MODEL_TEMPLATES = [
+    ("zephyr", "zephyr"),
+    ("qwen", "chatml"),
+    ("chatml", "chatml"),
+    ("hermes", "chatml"),
+    ("llama-3", "llama3"),
+    ("llama3", "llama3"),
+    ("mistral", "mistral"),
+    ("mixtral", "mistral"),
+]
+
+def get_template(name: str) -> ChatTemplate:
+    """Get a chat template by name; raises ValueError for an unknown one."""
+    try:
+        return TEMPLATES[name]
+    except KeyError:
+        raise ValueError(f"Unknown chat template '{name}' (known: {', '.join(TEMPLATES)})") from None
+
+def template_for_model(model_id: str) -> ChatTemplate:
+    """Pick the chat template a model was trained with from its id, falling back to the plain format."""
+    model = model_id.lower()
+    for pattern, name in _MODEL_TEMPLATES:
+        if pattern in model:
+            return TEMPLATES[name]
+    return PLAIN
+
+def chat_messages(messages: List[Dict[str, str]], system_prompt: str) -> List[Dict[str, str]]:
+    """Build the role/content message list of chat-completion style APIs, system prompt first."""
+    chat = [{"role": "system", "content": system_prompt}] if system_prompt else []
+    chat += [
+        {"role": msg.get("role", "user"), "content": msg.get("content", "")}
+        for msg in messages if msg.get("role", "user") in ("user", "assistant")
+    ]
+    return chat
\ No newline at end of file
@@ -0,0 +1,269 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Union
+from agents.llm_provider import LLMProvider, GenerationConfig, GenerationRequest, PromptPrefix, ProviderError
+from core.metrics import REGISTRY, MetricsRegistry
+
+logger = logging.getLogger('travel_agent')
+
+@dataclass
+class _Backend:
+    """Load and health bookkeeping for one provider in a pool."""
+    provider: LLMProvider
+    outstanding: int = 0
+    latency: Optional[float] = None  # EWMA of successful request latency, in seconds
+    failures: int = 0  # consecutive failures
+    open_until: float = 0.0  # circuit breaker is open until this monotonic time
+    requests: int = 0
+    errors: int = 0
+
+class ProviderPool(LLMProvider):
+    """Provider that spreads requests over several backends and fails over between them.
+    
+    Each request goes to the healthy backend with the lowest expected wait,
+    estimated as its latency average times its requests in flight (plus this
+    one), so slow backends get less traffic and idle ones are tried first.
+    Backends whose model is still cold or loading are only tried after the
+    ready ones.
+    
+    A backend's circuit breaker opens after `failure_threshold` consecutive
+    failures, or at once when it answers that its model is loading; it gets no
+    traffic for `cooldown` seconds (or the model's estimated loading time) and
+    is then tried again. A failed request moves on to the next backend, so
+    callers only see an error when every backend failed.
+    """
+    
+    def __init__(self, providers: List[LLMProvider], failure_threshold: int = 3, cooldown: float = 30.0,
+                 latency_smoothing: float = 0.3):
+        if not providers:
+            raise ValueError("ProviderPool needs at least one provider")
+        models = list(dict.fromkeys(provider.model for provider in providers))
+        super().__init__(",".join(models))
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.latency_smoothing = latency_smoothing
+        self._backends = [_Backend(provider) for provider in providers]
+        self._lock = threading.Lock()
+    
+    @property
+    def providers(self) -> List[LLMProvider]:
+        """The pooled providers, in the order they were given."""
+        return [backend.provider for backend in self._backends]
+    
+    @property
+    def read_timeout(self) -> Optional[float]:
+        """The longest read timeout of the pooled providers that have one."""
+        timeouts = [getattr(backend.provider, "read_timeout", None) for backend in self._backends]
+        return max((timeout for timeout in timeouts if timeout), default=None)
+    
+    def initialize(self) -> None:
+        """Initialize every pooled provider."""
+        for backend in self._backends:
+            backend.provider.initialize()
+    
+    def readiness(self) -> Dict[str, Any]:
+        """Report the pool ready when any backend is, otherwise the backend closest to ready."""
+        backends = [backend.provider.readiness() for backend in self._backends]
+        ready = [readiness for readiness in backends if readiness["ready"]]
+        loading = [readiness for readiness in backends if readiness["status"] == "loading"]
+        
+        if ready:
+            readiness = {"model": self.model, "ready": True, "status": "ready"}
+        elif loading and len(loading) == len(backends):
+            readiness = {"model": self.model, "ready": False, "status": "loading",
+                         "estimated_time": min(backend["estimated_time"] for backend in loading)}
+        else:
+            readiness = {"model": self.model, "ready": False, "status": "cold"}
+        readiness["backends"] = backends
+        return readiness
+    
+    def prepare_prefix(self, system_prompt: str) -> PromptPrefix:
+        """Prepare the prefix on every backend, since any of them may serve the agent."""
+        prefixes = [backend.provider.prepare_prefix(system_prompt) for backend in self._backends]
+        return prefixes[0]
+    
+    def generate_response(self, messages: List[Dict[str, str]], system_prompt: str,
+                          generation_config: Optional[GenerationConfig] = None) -> str:
+        """Generate a response on the best available backend, failing over on errors."""
+        last_error = None
+        for backend in self._candidates():
+            started = self._start(backend)
+            try:
+                response_text = backend.provider.generate_response(messages, system_prompt, generation_config)
+            except ProviderError as e:
+                self._fail(backend, e)
+                last_error = e
+                continue
+            except BaseException:
+                self._release(backend)
+                raise
+            self._succeed(backend, started)
+            return response_text
+        raise last_error
+    
+    def generate_responses(self, requests: List[GenerationRequest]) -> List[Union[str, ProviderError]]:
+        """Send a batch to the best available backend, failing over when every request in it failed."""
+        results = []
+        for backend in self._candidates():
+            started = self._start(backend)
+            try:
+                results = backend.provider.generate_responses(requests)
+            except BaseException:
+                self._release(backend)
+                raise
+            errors = [result for result in results if isinstance(result, ProviderError)]
+            if errors and len(errors) == len(results):
+                self._fail(backend, errors[0])
+                continue
+            self._succeed(backend, started)
+            return results
+        return results
+    
+    def stop_sequences(self, generation_config: GenerationConfig) -> List[str]:
+        """Every backend's stop sequences, since any of them may have streamed the text."""
+        return list(dict.fromkeys(
+            stop for backend in self._backends for stop in backend.provider.stop_sequences(generation_config)
+        ))
+    
+    def api_calls(self, requests: List[GenerationRequest]) -> List[List[int]]:
+        """Split the batch the way the backend it would go to first does."""
+        return self._candidates()[0].provider.api_calls(requests)
+    
+    async def agenerate_response(self, messages: List[Dict[str, str]], system_prompt: str,
+                                 generation_config: Optional[GenerationConfig] = None) -> str:
+        """Async counterpart of `generate_response`."""
+        last_error = None
+        for backend in self._candidates():
+            started = self._start(backend)
+            try:
+                response_text = await backend.provider.agenerate_response(messages, system_prompt, generation_config)
+            except ProviderError as e:
+                self._fail(backend, e)
+                last_error = e
+                continue
+            except BaseException:
+                # Includes the request being cancelled
+                self._release(backend)
+                raise
+            self._succeed(backend, started)
+            return response_text
+        raise last_error
+    
+    def stream_response(self, messages: List[Dict[str, str]], system_prompt: str,
+                        generation_config: Optional[GenerationConfig] = None) -> Iterator[str]:
+        """Stream a response from the best available backend.
+        
+        Fails over only until the first chunk arrives; after that an error is
+        passed on, since the caller has already shown part of the response.
+        """
+        last_error = None
+        for backend in self._candidates():
+            started = self._start(backend)
+            streamed = False
+            try:
+                for chunk in backend.provider.stream_response(messages, system_prompt, generation_config):
+                    streamed = True
+                    yield chunk
+            except ProviderError as e:
+                self._fail(backend, e)
+                if streamed:
+                    raise
+                last_error = e
+                continue
+            except BaseException:
+                # Consumer stopped early (or the generator was closed): just release the slot
+                self._release(backend)
+                raise
+            self._succeed(backend, started)
+            return
+        raise last_error
+    
+    def stats(self) -> List[Dict[str, Any]]:
+        """Get the load, latency and health of every backend."""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "model": backend.provider.model,
+                    "outstanding": backend.outstanding,
+                    "latency": backend.latency,
+                    "requests": backend.requests,
+                    "errors": backend.errors,
+                    "circuit": "open" if backend.open_until > now else "closed"
+                }
+                for backend in self._backends
+            ]
+    
+    def register_metrics(self, registry: MetricsRegistry = REGISTRY) -> None:
+        """Expose every backend's load, latency and circuit state, read when metrics are scraped."""
+        registry.collector('travel_agent_backend_outstanding', 'Requests in flight per model backend',
+                           lambda: [({'model': backend['model']}, backend['outstanding']) for backend in self.stats()])
+        registry.collector('travel_agent_backend_latency_seconds', 'Smoothed response time per model backend',
+                           lambda: [({'model': backend['model']}, backend['latency']) for backend in self.stats()])
+        registry.collector('travel_agent_backend_circuit_open', 'Whether a model backend is taken out of rotation (1) or not (0)',
+                           lambda: [({'model': backend['model']}, 1 if backend['circuit'] == 'open' else 0)
+                                    for backend in self.stats()])
+    
+    def close(self) -> None:
+        """Close every pooled provider that holds connections."""
+        for backend in self._backends:
+            close = getattr(backend.provider, "close", None)
+            if close is not None:
+                close()
+    
+    def _candidates(self) -> List[_Backend]:
+        """Order the backends to try: healthy ones by expected wait, then tripped ones soonest-to-recover first."""
+        now = time.monotonic()
+        with self._lock:
+            healthy = [backend for backend in self._backends if backend.open_until <= now]
+            tripped = [backend for backend in self._backends if backend.open_until > now]
+            
+            # Backends whose model is loaded come first. Among those, backends without a latency
+            # sample yet count as fastest, so each gets measured; ties go to the fewest in flight
+            healthy.sort(key=lambda backend: (not backend.provider.readiness()["ready"],
+                                              (backend.outstanding + 1) * (backend.latency or 0.0),
+                                              backend.outstanding))
+            tripped.sort(key=lambda backend: backend.open_until)
+            return healthy + tripped
+    
+    def _start(self, backend: _Backend) -> float:
+        """Count a request as in flight on a backend."""
+        with self._lock:
+            backend.outstanding += 1
+            backend.requests += 1
+        return time.monotonic()
+    
+    def _release(self, backend: _Backend) -> None:
+        """Count a request as finished without judging the backend."""
+        with self._lock:
+            backend.outstanding -= 1
+    
+    def _succeed(self, backend: _Backend, started: float) -> None:
+        """Record a successful request: update the latency average and close the circuit."""
+        elapsed = time.monotonic() - started
+        with self._lock:
+            backend.outstanding -= 1
+            backend.failures = 0
+            backend.open_until = 0.0
+            if backend.latency is None:
+                backend.latency = elapsed
+            else:
+                backend.latency += self.latency_smoothing * (elapsed - backend.latency)
+    
+    def _fail(self, backend: _Backend, error: ProviderError) -> None:
+        """Record a failed request and open the backend's circuit when it looks unhealthy."""
+        with self._lock:
+            backend.outstanding -= 1
+            backend.errors += 1
+            backend.failures += 1
+            
+            # A loading model will not answer until it is ready, so trip at once
+            loading = error.status_code == 503
+            if loading or backend.failures >= self.failure_threshold:
+                cooldown = error.retry_after if loading and error.retry_after else self.cooldown
+                backend.open_until = time.monotonic() + cooldown
+                logger.warning(f"Taking {backend.provider.model} out of rotation for {cooldown:.0f}s: {error}")
+            else:
+                logger.warning(f"Request to {backend.provider.model} failed, trying another backend: {error}")
\ No newline at end of file
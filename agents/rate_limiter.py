@@ -0,0 +1,343 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from agents.llm_provider import (
+    LLMProvider, GenerationConfig, GenerationRequest, PromptPrefix, ProviderError, ProviderBusyError, run_concurrently
+)
+from core.metrics import REGISTRY, MetricsRegistry
+
+# How long a request may queue when neither the limiter nor the provider says otherwise
+DEFAULT_QUEUE_TIMEOUT = 30.0
+
+# Request priorities: lower values are served first
+INTERACTIVE = 0
+BACKGROUND = 10
+
+_priority: contextvars.ContextVar = contextvars.ContextVar("request_priority", default=INTERACTIVE)
+
+@contextmanager
+def request_priority(priority: int) -> Iterator[None]:
+    """Run the enclosed provider calls at the given priority."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def current_priority() -> int:
+    """Get the priority of provider calls made from the current context."""
+    return _priority.get()
+
+class TokenBucket:
+    """Token bucket allowing `rate` requests per second on average, in bursts of up to `burst`."""
+    
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+    
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+    
+    def take(self, now: float) -> None:
+        """Use one token; callers check `wait_time` first."""
+        self._refill(now)
+        self.tokens -= 1
+    
+    def drain(self, now: float, pause: float) -> None:
+        """Empty the bucket and hold off refilling for `pause` seconds, e.g. after the API said 429."""
+        self.tokens = 0.0
+        self.updated = max(self.updated, now + pause)
+    
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+class RateLimiter:
+    """Admission control for an inference API: a rate limit, a concurrency cap and a bounded priority queue.
+    
+    Callers wait in priority order (then arrival order) until both a
+    concurrency slot and a rate-limit token are free. When the queue is full
+    the lowest-priority waiter is shed, and a waiter that has queued for
+    `queue_timeout` seconds gives up; both get a ProviderBusyError. Without a
+    `queue_timeout`, a RateLimitedProvider sets it to its provider's read
+    timeout, since a waiter may have to wait for a request in flight to end.
+    
+    Async callers wait on an event of their loop rather than in a thread, so
+    a long queue of them does not tie up worker threads.
+    """
+    
+    def __init__(self, rate: float = 1.0, burst: int = 5, max_concurrency: int = 4, max_queue: int = 32,
+                 queue_timeout: Optional[float] = None):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._queue: List[list] = []  # heap of [priority, sequence, state]
+        self._sequence = itertools.count()
+        self._queued = 0
+        self._active = 0
+        self._condition = threading.Condition()
+        self._async_waiters: Dict[int, Callable[[], None]] = {}
+        self.admitted = 0
+        self.shed = 0
+        self.timed_out = 0
+    
+    @contextmanager
+    def slot(self, priority: Optional[int] = None) -> Iterator[None]:
+        """Hold a concurrency slot for the enclosed request, waiting for one first."""
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+    
+    def acquire(self, priority: Optional[int] = None) -> None:
+        """Wait until the request may be sent; raises ProviderBusyError when it is shed or times out."""
+        with self._condition:
+            entry, deadline = self._enqueue(priority)
+            while True:
+                timeout = self._admit(entry, deadline)
+                if timeout is None:
+                    return
+                self._condition.wait(timeout)
+    
+    async def aacquire(self, priority: Optional[int] = None) -> None:
+        """Async counterpart of `acquire`; waits on an event that state changes set from any thread."""
+        loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+        with self._condition:
+            entry, deadline = self._enqueue(priority)
+            self._async_waiters[id(entry)] = lambda: loop.call_soon_threadsafe(wake.set)
+        try:
+            while True:
+                # Clear before checking, so a change made after the check still wakes us
+                wake.clear()
+                with self._condition:
+                    timeout = self._admit(entry, deadline)
+                if timeout is None:
+                    return
+                try:
+                    await asyncio.wait_for(wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            # Admission only happens inside `_admit`, so a cancelled waiter holds no slot; just leave the queue
+            with self._condition:
+                if entry[2] == "waiting":
+                    entry[2] = "cancelled"
+                    self._queued -= 1
+                    self._notify()
+            raise
+        finally:
+            with self._condition:
+                del self._async_waiters[id(entry)]
+    
+    def release(self) -> None:
+        """Give back the concurrency slot of a finished request."""
+        with self._condition:
+            self._active -= 1
+            self._notify()
+    
+    def backoff(self, pause: float) -> None:
+        """Stop admitting requests for `pause` seconds, after the API reported its rate limit as exceeded."""
+        with self._condition:
+            self.bucket.drain(time.monotonic(), pause)
+            self._notify()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get the queue depth, requests in flight and admission counters."""
+        with self._condition:
+            return {
+                "queued": self._queued,
+                "active": self._active,
+                "max_queue": self.max_queue,
+                "max_concurrency": self.max_concurrency,
+                "admitted": self.admitted,
+                "shed": self.shed,
+                "timed_out": self.timed_out
+            }
+    
+    def register_metrics(self, registry: MetricsRegistry = REGISTRY) -> None:
+        """Expose the queue depth, requests in flight and rejections, read when metrics are scraped."""
+        registry.collector('travel_agent_rate_limiter_requests', 'Requests waiting for or holding an inference API slot',
+                           lambda: [({'state': 'queued'}, self.stats()['queued']),
+                                    ({'state': 'active'}, self.stats()['active'])])
+        registry.collector('travel_agent_rate_limiter_rejected', 'Requests turned away by the rate limiter, by reason',
+                           lambda: [({'reason': 'shed'}, self.stats()['shed']),
+                                    ({'reason': 'timed_out'}, self.stats()['timed_out'])], type='counter')
+    
+    def _enqueue(self, priority: Optional[int]) -> Tuple[list, float]:
+        """Add a waiter to the queue, shedding the lowest-priority one beyond `max_queue`; called with the lock held."""
+        priority = current_priority() if priority is None else priority
+        queue_timeout = DEFAULT_QUEUE_TIMEOUT if self.queue_timeout is None else self.queue_timeout
+        entry = [priority, next(self._sequence), "waiting"]
+        heapq.heappush(self._queue, entry)
+        self._queued += 1
+        if self._queued > self.max_queue:
+            self._shed_lowest()
+        return entry, time.monotonic() + queue_timeout
+    
+    def _admit(self, entry: list, deadline: float) -> Optional[float]:
+        """Admit a waiter whose turn it is; called with the lock held.
+        
+        Returns None once admitted, otherwise the seconds to wait before
+        checking again; raises ProviderBusyError when it was shed or timed out.
+        """
+        if entry[2] == "shed":
+            raise ProviderBusyError()
+        
+        now = time.monotonic()
+        wait = deadline - now
+        next_check = None
+        if self._head() is entry and self._active < self.max_concurrency:
+            token_wait = self.bucket.wait_time(now)
+            if token_wait <= 0:
+                heapq.heappop(self._queue)
+                self._queued -= 1
+                self._active += 1
+                self.bucket.take(now)
+                self.admitted += 1
+                # The next waiter may be able to go too
+                self._notify()
+                return None
+            next_check = token_wait
+        
+        if wait <= 0:
+            entry[2] = "cancelled"
+            self._queued -= 1
+            self.timed_out += 1
+            self._notify()
+            raise ProviderBusyError()
+        return wait if next_check is None else min(wait, next_check)
+    
+    def _notify(self) -> None:
+        """Wake every waiter, threads and async ones, to recheck the queue; called with the lock held."""
+        self._condition.notify_all()
+        for wake in self._async_waiters.values():
+            try:
+                wake()
+            except RuntimeError:
+                # The waiter's event loop has closed
+                pass
+    
+    def _head(self) -> Optional[list]:
+        """The next waiter to admit, dropping entries that have left the queue."""
+        while self._queue and self._queue[0][2] != "waiting":
+            heapq.heappop(self._queue)
+        return self._queue[0] if self._queue else None
+    
+    def _shed_lowest(self) -> None:
+        """Shed the waiter with the lowest priority (the most recent one among equals)."""
+        lowest = max((entry for entry in self._queue if entry[2] == "waiting"), key=lambda entry: (entry[0], entry[1]))
+        lowest[2] = "shed"
+        self._queued -= 1
+        self.shed += 1
+        self._notify()
+
+class RateLimitedProvider(LLMProvider):
+    """Provider wrapper that sends requests through a RateLimiter.
+    
+    The priority of a request comes from `request_priority`, so interactive
+    queries overtake background work such as a guide's specialist calls. A
+    429 reply from the API pauses admissions for a while instead of letting
+    every queued request hit the limit too.
+    """
+    
+    def __init__(self, provider: LLMProvider, limiter: Optional[RateLimiter] = None, rate_limit_pause: float = 10.0):
+        super().__init__(provider.model)
+        self.provider = provider
+        self.limiter = limiter or RateLimiter()
+        self.rate_limit_pause = rate_limit_pause
+        if self.limiter.queue_timeout is None:
+            # Let requests queue about as long as one in flight may take
+            self.limiter.queue_timeout = getattr(provider, "read_timeout", None) or DEFAULT_QUEUE_TIMEOUT
+    
+    def initialize(self) -> None:
+        """Initialize the wrapped provider."""
+        self.provider.initialize()
+    
+    def readiness(self) -> Dict[str, Any]:
+        """Report the wrapped provider's readiness."""
+        return self.provider.readiness()
+    
+    def prepare_prefix(self, system_prompt: str) -> PromptPrefix:
+        """Let the wrapped provider prepare the prefix."""
+        return self.provider.prepare_prefix(system_prompt)
+    
+    def stop_sequences(self, generation_config: GenerationConfig) -> List[str]:
+        """The wrapped provider's stop sequences."""
+        return self.provider.stop_sequences(generation_config)
+    
+    def api_calls(self, requests: List[GenerationRequest]) -> List[List[int]]:
+        """Split the batch the way the wrapped provider does."""
+        return self.provider.api_calls(requests)
+    
+    def generate_response(self, messages: List[Dict[str, str]], system_prompt: str,
+                          generation_config: Optional[GenerationConfig] = None) -> str:
+        """Wait for an admission slot, then ask the wrapped provider."""
+        with self.limiter.slot():
+            try:
+                return self.provider.generate_response(messages, system_prompt, generation_config)
+            except ProviderError as e:
+                self._on_error(e)
+                raise
+    
+    def generate_responses(self, requests: List[GenerationRequest]) -> List[Union[str, ProviderError]]:
+        """Send a batch with one admission slot for each API call the wrapped provider makes for it."""
+        def send(indices: List[int]) -> List[Union[str, ProviderError]]:
+            try:
+                with self.limiter.slot():
+                    return self.provider.generate_responses([requests[index] for index in indices])
+            except ProviderError as e:
+                # Shed or timed out in the queue: every request of the call gets the error
+                return [e] * len(indices)
+        
+        calls = self.provider.api_calls(requests)
+        outcomes = run_concurrently([lambda indices=indices: send(indices) for indices in calls])
+        results: List[Union[str, ProviderError]] = [None] * len(requests)
+        for indices, outcome in zip(calls, outcomes):
+            for index, result in zip(indices, outcome):
+                results[index] = result
+        
+        for result in results:
+            if isinstance(result, ProviderError):
+                self._on_error(result)
+                break
+        return results
+    
+    async def agenerate_response(self, messages: List[Dict[str, str]], system_prompt: str,
+                                 generation_config: Optional[GenerationConfig] = None) -> str:
+        """Async counterpart of `generate_response`."""
+        await self.limiter.aacquire()
+        try:
+            return await self.provider.agenerate_response(messages, system_prompt, generation_config)
+        except ProviderError as e:
+            self._on_error(e)
+            raise
+        finally:
+            self.limiter.release()
+    
+    def stream_response(self, messages: List[Dict[str, str]], system_prompt: str,
+                        generation_config: Optional[GenerationConfig] = None) -> Iterator[str]:
+        """Wait for an admission slot, then stream from the wrapped provider, holding the slot until the end."""
+        with self.limiter.slot():
+            try:
+                yield from self.provider.stream_response(messages, system_prompt, generation_config)
+            except ProviderError as e:
+                self._on_error(e)
+                raise
+    
+    def _on_error(self, error: ProviderError) -> None:
+        """Pause admissions when the API says we are over its rate limit."""
+        if error.status_code == 429:
+            self.limiter.backoff(error.retry_after or self.rate_limit_pause)
\ No newline at end of file
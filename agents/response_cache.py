@@ -0,0 +1,232 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
+from agents.llm_provider import (
+    LLMProvider, GenerationConfig, GenerationRequest, PromptPrefix, ProviderError, strip_stop_sequences
+)
+from agents.single_flight import SingleFlight
+from core.metrics import REGISTRY, MetricsRegistry
+
+class ResponseCache:
+    """Thread-safe LRU cache of LLM responses whose entries expire after a TTL."""
+    
+    def __init__(self, max_size: int = 256, default_ttl: float = 3600):
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def make_key(model: str, system_prompt: str, messages: List[Dict[str, str]],
+                 prefix: Optional[PromptPrefix] = None) -> str:
+        """Build a cache key from the model id, system prompt and normalized message list.
+        
+        The key covers the whole conversation sent to the model, since earlier
+        turns change the answer: in practice only a conversation's first question
+        (and the stateless specialist calls of a travel guide) can hit, while a
+        follow-up is only served from the cache when its entire history repeats.
+        Near-duplicate standalone questions are the semantic cache's job.
+        
+        A prepared prefix for the system prompt stands in for it by its key, so
+        a long static system prompt is not normalized and hashed on every request.
+        """
+        normalized = [
+            [msg.get("role", "user"), _normalize(msg.get("content", ""))]
+            for msg in messages
+        ]
+        if prefix is not None and prefix.system_prompt == system_prompt:
+            system = ["prefix", prefix.key]
+        else:
+            system = _normalize(system_prompt)
+        raw = json.dumps([model, system, normalized], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for a key, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            
+            # Mark as most recently used
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """Store a response, evicting the least recently used entries beyond max_size."""
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self) -> None:
+        """Remove every cached response."""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get the cache's size and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+class CachingProvider(LLMProvider):
+    """Provider wrapper that serves repeated requests from a ResponseCache.
+    
+    The time-to-live of each response comes from the calling agent's
+    GenerationConfig.cache_ttl. Provider errors are never cached. Identical
+    requests that miss the cache while one is already in flight wait for it
+    and share its response instead of calling the provider again.
+    """
+    
+    def __init__(self, provider: LLMProvider, cache: Optional[ResponseCache] = None,
+                 single_flight: Optional[SingleFlight] = None):
+        super().__init__(provider.model)
+        self.provider = provider
+        self.cache = cache or ResponseCache()
+        self.single_flight = single_flight or SingleFlight()
+    
+    def initialize(self) -> None:
+        """Initialize the wrapped provider."""
+        self.provider.initialize()
+    
+    def readiness(self) -> Dict[str, Any]:
+        """Report the wrapped provider's readiness."""
+        return self.provider.readiness()
+    
+    def prepare_prefix(self, system_prompt: str) -> PromptPrefix:
+        """Let the wrapped provider prepare the prefix."""
+        return self.provider.prepare_prefix(system_prompt)
+    
+    def stop_sequences(self, generation_config: GenerationConfig) -> List[str]:
+        """The wrapped provider's stop sequences."""
+        return self.provider.stop_sequences(generation_config)
+    
+    def api_calls(self, requests: List[GenerationRequest]) -> List[List[int]]:
+        """Split the batch the way the wrapped provider does."""
+        return self.provider.api_calls(requests)
+    
+    def register_metrics(self, registry: MetricsRegistry = REGISTRY) -> None:
+        """Expose the cache's and the call coalescing's counters, read when metrics are scraped."""
+        registry.collector('travel_agent_response_cache_lookups', 'LLM response cache lookups by result',
+                           lambda: [({'result': 'hit'}, self.cache.stats()['hits']),
+                                    ({'result': 'miss'}, self.cache.stats()['misses'])], type='counter')
+        registry.collector('travel_agent_response_cache_entries', 'Responses held in the LLM response cache',
+                           lambda: [({}, self.cache.stats()['size'])])
+        registry.collector('travel_agent_coalesced_calls', 'LLM calls that joined an identical call already in flight',
+                           lambda: [({}, self.single_flight.stats()['coalesced'])], type='counter')
+    
+    def generate_response(self, messages: List[Dict[str, str]], system_prompt: str,
+                          generation_config: Optional[GenerationConfig] = None) -> str:
+        """Return a cached response if there is one, otherwise ask the wrapped provider (once per in-flight key)."""
+        key = self.cache.make_key(self.model, system_prompt, messages, _prefix(generation_config))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        
+        def fetch() -> str:
+            response_text = self.provider.generate_response(messages, system_prompt, generation_config)
+            self.cache.set(key, response_text, generation_config.cache_ttl if generation_config else None)
+            return response_text
+        
+        return self.single_flight.do(key, fetch)
+    
+    def generate_responses(self, requests: List[GenerationRequest]) -> List[Union[str, ProviderError]]:
+        """Serve cached responses and send only the misses on to the wrapped provider, as one batch.
+        
+        Misses already in flight (from another batch or a single request) are
+        waited for instead of being sent again.
+        """
+        keys = [
+            self.cache.make_key(self.model, request.system_prompt, request.messages, _prefix(request.generation_config))
+            for request in requests
+        ]
+        results: List[Union[str, ProviderError, None]] = [self.cache.get(key) for key in keys]
+        misses = [index for index, result in enumerate(results) if result is None]
+        if not misses:
+            return results
+        
+        def fetch(led: List[int]) -> List[Union[str, ProviderError]]:
+            indices = [misses[position] for position in led]
+            fetched = self.provider.generate_responses([requests[index] for index in indices])
+            for index, result in zip(indices, fetched):
+                if not isinstance(result, ProviderError):
+                    config = requests[index].generation_config
+                    self.cache.set(keys[index], result, config.cache_ttl if config else None)
+            return fetched
+        
+        futures = self.single_flight.do_many([keys[index] for index in misses], fetch)
+        for index, future in zip(misses, futures):
+            error = future.exception()
+            if error is not None and not isinstance(error, ProviderError):
+                raise error
+            results[index] = error if error is not None else future.result()
+        return results
+    
+    async def agenerate_response(self, messages: List[Dict[str, str]], system_prompt: str,
+                                 generation_config: Optional[GenerationConfig] = None) -> str:
+        """Async counterpart of `generate_response`."""
+        key = self.cache.make_key(self.model, system_prompt, messages, _prefix(generation_config))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        
+        async def fetch() -> str:
+            response_text = await self.provider.agenerate_response(messages, system_prompt, generation_config)
+            self.cache.set(key, response_text, generation_config.cache_ttl if generation_config else None)
+            return response_text
+        
+        return await self.single_flight.ado(key, fetch)
+    
+    def stream_response(self, messages: List[Dict[str, str]], system_prompt: str,
+                        generation_config: Optional[GenerationConfig] = None) -> Iterator[str]:
+        """Stream a cached response as one chunk, or stream from the wrapped provider and cache the result."""
+        key = self.cache.make_key(self.model, system_prompt, messages, _prefix(generation_config))
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        
+        chunks = []
+        for chunk in self.provider.stream_response(messages, system_prompt, generation_config):
+            chunks.append(chunk)
+            yield chunk
+        
+        # Only reached when the stream ran to completion
+        stop = self.stop_sequences(generation_config or GenerationConfig())
+        response_text = strip_stop_sequences("".join(chunks), stop)
+        self.cache.set(key, response_text, generation_config.cache_ttl if generation_config else None)
+
+_WHITESPACE = re.compile(r"\s+")
+
+def _prefix(generation_config: Optional[GenerationConfig]) -> Optional[PromptPrefix]:
+    """The prepared system prompt prefix a request carries, if any."""
+    return generation_config.prompt_prefix if generation_config else None
+
+def _normalize(text: str) -> str:
+    """Normalize text for cache keys: collapse whitespace and ignore case."""
+    return _WHITESPACE.sub(" ", text).strip().casefold()
\ No newline at end of file
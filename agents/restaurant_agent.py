@@ -1,5 +1,5 @@
 from agents.specialized_agent import SpecializedAgent
-from agents.llm_provider import LLMProvider
+from agents.llm_provider import LLMProvider, GenerationConfig
 
 class RestaurantAgent(SpecializedAgent):
     """An agent that specializes in finding the best restaurants in a location."""
@@ -7,6 +7,7 @@ class RestaurantAgent(SpecializedAgent):
     def __init__(self, name: str = "RestaurantExpert", llm_provider: LLMProvider = None):
         super().__init__(name, llm_provider)
         self.system_prompt = f"You are {name}, a restaurant specialist AI assistant."
+        self.generation_config = GenerationConfig(max_new_tokens=450, cache_ttl=86400)
         
     def initialize(self) -> None:
         """Initialize the Restaurant agent."""
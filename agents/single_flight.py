@@ -0,0 +1,143 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Sequence, Tuple
+
+@dataclass(slots=True)
+class _AsyncCall:
+    """An async call in flight and the number of callers waiting for it."""
+    task: asyncio.Task
+    waiters: int = 0
+
+class SingleFlight:
+    """Coalesces identical concurrent calls into one.
+    
+    The first caller for a key runs the call; callers arriving with the same
+    key while it is in flight wait for it and receive the same result or
+    exception. Nothing is kept once the call finishes, so this only saves
+    duplicate work that overlaps in time (a cache handles the rest).
+    """
+    
+    def __init__(self):
+        self._calls: Dict[Hashable, Future] = {}
+        self._async_calls: Dict[Tuple[int, Hashable], _AsyncCall] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+    
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run `fn`, or wait for the identical call already in flight, and return its result."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        
+        if not leader:
+            return future.result()
+        
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+    
+    def do_many(self, keys: Sequence[Hashable], fn: Callable[[List[int]], List[Any]]) -> List[Future]:
+        """Batch counterpart of `do`: run the calls no identical one is in flight for as one batch.
+        
+        `fn` gets the positions of the keys this batch leads (the first of any
+        repeated key) and returns one result per position; a result that is an
+        exception counts as that call raising it. Returns a finished future per
+        key, holding its result or the result of the call it joined.
+        """
+        futures: List[Future] = []
+        led: List[int] = []
+        with self._lock:
+            for index, key in enumerate(keys):
+                future = self._calls.get(key)
+                if future is None:
+                    future = Future()
+                    self._calls[key] = future
+                    self.calls += 1
+                    led.append(index)
+                else:
+                    self.coalesced += 1
+                futures.append(future)
+        
+        try:
+            results = fn(led) if led else []
+        except BaseException as e:
+            for index in led:
+                futures[index].set_exception(e)
+            raise
+        else:
+            for index, result in zip(led, results):
+                if isinstance(result, BaseException):
+                    futures[index].set_exception(result)
+                else:
+                    futures[index].set_result(result)
+        finally:
+            with self._lock:
+                for index in led:
+                    del self._calls[keys[index]]
+        
+        # Wait for the calls this batch joined
+        for future in futures:
+            future.exception()
+        return futures
+    
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async counterpart of `do`; calls are coalesced within the running event loop.
+        
+        The call runs as its own task, so the caller that started it being
+        cancelled does not cancel it for the others; it is only cancelled once
+        every caller waiting for it has been.
+        """
+        loop = asyncio.get_running_loop()
+        loop_key = (id(loop), key)
+        with self._lock:
+            call = self._async_calls.get(loop_key)
+            if call is None:
+                call = _AsyncCall(loop.create_task(self._arun(loop_key, fn)))
+                self._async_calls[loop_key] = call
+                self.calls += 1
+            else:
+                self.coalesced += 1
+            call.waiters += 1
+        
+        try:
+            # Shield the shared call so one caller being cancelled does not cancel it for the others
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Every caller was cancelled, so nobody needs the result any more
+                call.task.cancel()
+    
+    async def _arun(self, loop_key: Tuple[int, Hashable], fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run a coalesced async call, forgetting it once it finishes."""
+        try:
+            return await fn()
+        finally:
+            with self._lock:
+                del self._async_calls[loop_key]
+    
+    def stats(self) -> Dict[str, int]:
+        """Get the number of upstream calls made and of calls that joined one in flight."""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls) + len(self._async_calls)
+            }
\ No newline at end of file
@@ -1,6 +1,19 @@
-from typing import Dict, Any, List
+from typing import Callable, Dict, Generator, Hashable, List, Optional, Tuple
 from core.base import Agent, Message
-from agents.llm_provider import LLMProvider
+from core.history import MessageHistory
+from agents.llm_provider import (
+    LLMProvider, GenerationConfig, GenerationRequest, PromptPrefix, ProviderError, run_concurrently,
+    strip_stop_sequences
+)
+from agents.context_builder import ContextBuilder, estimate_tokens
+from agents.rate_limiter import INTERACTIVE, request_priority
+from core.metrics import REGISTRY
+
+TOKENS = REGISTRY.counter(
+    "travel_agent_tokens",
+    "Estimated prompt and completion tokens by agent",
+    ("agent", "kind")
+)
 
 class SpecializedAgent(Agent):
     """Base class for specialized agents that use LLM providers for domain-specific tasks."""
@@ -10,7 +23,10 @@ class SpecializedAgent(Agent):
         self.llm_provider = llm_provider
         self.system_prompt = f"You are {name}, a specialized AI assistant."
         self.specialization = ""
-        
+        self.generation_config = GenerationConfig()
+        self.context_builder = ContextBuilder()
+        self.prompt_prefix: Optional[PromptPrefix] = None
+    
     def initialize(self) -> None:
         """Initialize the agent with any necessary setup."""
         self.llm_provider.initialize()
@@ -18,6 +34,18 @@ class SpecializedAgent(Agent):
     def set_specialization(self, specialization: str) -> None:
         """Set the agent's specialization to guide its responses."""
         self.specialization = specialization
+        self.prepare_prompt_prefix()
+    
+    def prepare_prompt_prefix(self) -> None:
+        """Have the provider prepare the full system prompt once; requests then carry the prepared prefix.
+        
+        Runs when the specialization is set during `initialize`, and again before
+        a request if the system prompt has changed since.
+        """
+        system_prompt = self.get_full_system_prompt()
+        if self.prompt_prefix is None or self.prompt_prefix.system_prompt != system_prompt:
+            self.prompt_prefix = self.llm_provider.prepare_prefix(system_prompt)
+        self.generation_config.prompt_prefix = self.prompt_prefix
     
     def get_full_system_prompt(self) -> str:
         """Get the full system prompt with specialization."""
@@ -26,36 +54,142 @@ class SpecializedAgent(Agent):
             full_prompt += f"\n\n{self.specialization}"
         return full_prompt
     
-    def process_message(self, message: Message) -> Message:
+    def process_message(self, message: Message, history: Optional[MessageHistory] = None) -> Message:
         """Process an incoming message and return a response using the LLM provider."""
-        # Add the incoming message to history
-        self.add_to_history(message)
+        # Get full system prompt
+        system_prompt = self.get_full_system_prompt()
         
-        # Convert message history to format expected by LLM provider
-        messages = []
+        messages, prompt_tokens = self._prepare_messages(message, system_prompt, history)
         
-        for msg in self.message_history[-5:]:  # Limit to last 5 messages
-            role = "assistant" if msg.sender == self.name else "user"
-            messages.append({"role": role, "content": msg.content})
+        # Get response from LLM provider, at the priority the message asks for
+        try:
+            with request_priority(message.metadata.get("priority", INTERACTIVE)):
+                response_text = self.llm_provider.generate_response(messages, system_prompt, self.generation_config)
+        except ProviderError as e:
+            return self._finish_response(str(e), history, prompt_tokens, error=e)
         
-        # Ensure the current message is included
-        if len(messages) < 1 or messages[-1]["content"] != message.content:
-            messages.append({"role": "user", "content": message.content})
+        return self._finish_response(response_text, history, prompt_tokens)
+    
+    async def aprocess_message(self, message: Message, history: Optional[MessageHistory] = None) -> Message:
+        """Asynchronously process an incoming message using the LLM provider's async API."""
+        # Get full system prompt
+        system_prompt = self.get_full_system_prompt()
         
+        messages, prompt_tokens = self._prepare_messages(message, system_prompt, history)
+        
+        # Get response from LLM provider without blocking the event loop
+        try:
+            with request_priority(message.metadata.get("priority", INTERACTIVE)):
+                response_text = await self.llm_provider.agenerate_response(messages, system_prompt, self.generation_config)
+        except ProviderError as e:
+            return self._finish_response(str(e), history, prompt_tokens, error=e)
+        
+        return self._finish_response(response_text, history, prompt_tokens)
+    
+    def stream_message(self, message: Message, history: Optional[MessageHistory] = None) -> Generator[str, None, Message]:
+        """Process an incoming message, passing the LLM provider's text chunks through as they arrive."""
         # Get full system prompt
         system_prompt = self.get_full_system_prompt()
         
-        # Get response from LLM provider
-        response_text = self.llm_provider.generate_response(messages, system_prompt)
+        messages, prompt_tokens = self._prepare_messages(message, system_prompt, history)
+        
+        # Stream the response from the LLM provider, keeping the chunks for history
+        chunks = []
+        try:
+            for chunk in self.llm_provider.stream_response(messages, system_prompt, self.generation_config):
+                chunks.append(chunk)
+                yield chunk
+        except ProviderError as e:
+            yield str(e)
+            return self._finish_response(str(e), history, prompt_tokens, error=e)
+        
+        # Streamed text still ends with the stop sequence generation ended on
+        response_text = strip_stop_sequences("".join(chunks), self.llm_provider.stop_sequences(self.generation_config))
+        return self._finish_response(response_text, history, prompt_tokens)
+    
+    def batch_key(self) -> Optional[Hashable]:
+        """Agents on the same LLM provider can be answered with batched provider calls."""
+        return self.llm_provider
+    
+    def process_batch(self, requests: List[Tuple[Agent, Message, Optional[MessageHistory]]],
+                      on_response: Optional[Callable[[int, Message], None]] = None) -> List[Message]:
+        """Process messages for several agents sharing this agent's LLM provider.
+        
+        Only requests the provider really sends as one API call (see
+        `LLMProvider.api_calls`) are answered together; the calls run
+        concurrently and each response is reported as soon as its call returns.
+        """
+        prepared = []
+        for agent, message, history in requests:
+            system_prompt = agent.get_full_system_prompt()
+            messages, prompt_tokens = agent._prepare_messages(message, system_prompt, history)
+            prepared.append((GenerationRequest(messages, system_prompt, agent.generation_config), prompt_tokens))
+        generation_requests = [request for request, _ in prepared]
+        responses: List[Optional[Message]] = [None] * len(requests)
+        
+        def send(positions: List[int]) -> None:
+            try:
+                results = self.llm_provider.generate_responses([generation_requests[i] for i in positions])
+            except ProviderError as e:
+                # The incoming messages are in history already, so each still gets a reply
+                results = [e] * len(positions)
+            for position, result in zip(positions, results):
+                agent, _, history = requests[position]
+                prompt_tokens = prepared[position][1]
+                if isinstance(result, ProviderError):
+                    responses[position] = agent._finish_response(str(result), history, prompt_tokens, error=result)
+                else:
+                    responses[position] = agent._finish_response(result, history, prompt_tokens)
+                if on_response is not None:
+                    on_response(position, responses[position])
+        
+        # The batch goes out at the most urgent priority among its messages
+        priority = min(message.metadata.get("priority", INTERACTIVE) for _, message, _ in requests)
+        with request_priority(priority):
+            calls = self.llm_provider.api_calls(generation_requests)
+            run_concurrently([lambda positions=positions: send(positions) for positions in calls])
+        return responses
+    
+    def _prepare_messages(self, message: Message, system_prompt: str,
+                          history: Optional[MessageHistory]) -> Tuple[List[Dict[str, str]], int]:
+        """Record the incoming message and pack the conversation into the context token budget.
+        
+        Returns the message list for the LLM provider and its estimated prompt token count.
+        """
+        history = history if history is not None else self.message_history
+        self.prepare_prompt_prefix()
+        
+        # Earlier turns, oldest first, without the incoming message
+        previous = history.recent(self.context_builder.max_messages)
+        
+        # Add the incoming message to history
+        self.add_to_history(message, history)
+        
+        return self.context_builder.build(previous, message, system_prompt, self.name)
+    
+    def _finish_response(self, response_text: str, history: Optional[MessageHistory], prompt_tokens: int,
+                         error: Optional[ProviderError] = None) -> Message:
+        """Wrap the LLM output (or the provider's error message) in a response message and record it in history."""
+        metadata = {
+            "provider": self.llm_provider.__class__.__name__,
+            "model": self.llm_provider.model,
+            "prompt_tokens": prompt_tokens
+        }
+        if error is not None:
+            metadata["error"] = "provider"
+            metadata["status_code"] = error.status_code
+        else:
+            TOKENS.inc(prompt_tokens, agent=self.name, kind="prompt")
+            TOKENS.inc(estimate_tokens(response_text), agent=self.name, kind="completion")
         
         # Create response message
         response_message = Message(
             content=response_text,
             sender=self.name,
-            metadata={"provider": self.llm_provider.__class__.__name__, "model": self.llm_provider.model}
+            metadata=metadata
         )
         
         # Add response to history
-        self.add_to_history(response_message)
+        self.add_to_history(response_message, history)
         
-        return response_message 
\ No newline at end of file
+        return response_message
\ No newline at end of file
@@ -1,5 +1,5 @@
 from agents.specialized_agent import SpecializedAgent
-from agents.llm_provider import LLMProvider
+from agents.llm_provider import LLMProvider, GenerationConfig
 
 class WeatherAgent(SpecializedAgent):
     """An agent that specializes in providing weather information for locations."""
@@ -7,6 +7,8 @@ class WeatherAgent(SpecializedAgent):
     def __init__(self, name: str = "WeatherExpert", llm_provider: LLMProvider = None):
         super().__init__(name, llm_provider)
         self.system_prompt = f"You are {name}, a weather specialist AI assistant."
+        # The weather section is short, so cap it well below the default; it also goes stale quickly
+        self.generation_config = GenerationConfig(max_new_tokens=300, cache_ttl=1800)
         
     def initialize(self) -> None:
         """Initialize the Weather agent."""
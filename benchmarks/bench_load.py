@@ -0,0 +1,306 @@
+"""Load test of the request pipeline against the local mock inference server.
+
+Run with `python -m benchmarks.bench_load` for every scenario, or pick some, e.g.
+`python -m benchmarks.bench_load --scenario app-guide --concurrency 8 --requests 40`.
+Save results with `--json results.json`; with `--baseline results.json` the run fails
+when throughput or p95 latency got worse than the baseline by more than `--tolerance`.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from benchmarks.mock_server import add_server_arguments, server_from_arguments
+
+try:
+    import resource
+except ImportError:  # not available on Windows; peak RSS is then not reported
+    resource = None
+
+# Scenario: (entry point, share of travel guide queries among the requests)
+SCENARIOS = {
+    "app-agent": ("app", 0.0),
+    "app-guide": ("app", 1.0),
+    "app-mixed": ("app", 0.2),
+    "app-stream": ("app-stream", 0.2),
+    "coordinator-agent": ("coordinator", 0.0),
+    "coordinator-guide": ("coordinator", 1.0),
+}
+
+AGENT_QUESTIONS = [
+    "What's the weather like in {city} in spring?",
+    "Can you recommend a hotel near the old town of {city}?",
+    "Where can I eat good seafood for dinner in {city}?",
+    "Which museums should I visit in {city}?",
+    "Tell me something about the history of {city}",
+]
+
+SYLLABLES = ["ka", "lo", "ver", "mi", "sa", "dor", "ne", "ta", "ri", "bel", "mon", "qua", "zu", "pe"]
+
+class Workload:
+    """Generates the queries of a run: a mix of travel guides and single-agent questions.
+    
+    Cities are made up so every query misses the caches, except for a
+    `repeat_share` of queries that repeat an earlier one.
+    """
+    
+    def __init__(self, guide_share: float, repeat_share: float = 0.0, seed: int = 1):
+        self.guide_share = guide_share
+        self.repeat_share = repeat_share
+        self._random = random.Random(seed)
+        self._issued: List[Tuple[bool, str]] = []
+        self._lock = threading.Lock()
+    
+    def next(self) -> Tuple[bool, str]:
+        """Get the next query as (is travel guide, text)."""
+        with self._lock:
+            if self._issued and self._random.random() < self.repeat_share:
+                return self._random.choice(self._issued)
+            city = "".join(self._random.choice(SYLLABLES) for _ in range(3)).capitalize()
+            if self._random.random() < self.guide_share:
+                query = (True, f"I want to go to {city} on June {self._random.randint(1, 28)}")
+            else:
+                query = (False, self._random.choice(AGENT_QUESTIONS).format(city=city))
+            self._issued.append(query)
+            return query
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(q / 100 * len(sorted_values)) - 1))]
+
+def is_degraded(text: str) -> bool:
+    """Whether an answer is one of the pipeline's apologies rather than model output."""
+    return text.startswith(("Sorry", "I'm sorry", "I'm still warming up", "No information available"))
+
+def run_load(send: Callable[[], bool], requests: int, concurrency: int) -> Dict[str, Any]:
+    """Call `send` `requests` times from `concurrency` threads and summarize latency and throughput.
+    
+    `send` returns False for a degraded answer; an exception counts as an error.
+    """
+    latencies: List[float] = []
+    outcomes = {"ok": 0, "degraded": 0, "errors": 0}
+    lock = threading.Lock()
+    
+    def one() -> None:
+        started = time.perf_counter()
+        try:
+            outcome = "ok" if send() else "degraded"
+        except Exception:
+            outcome = "errors"
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            outcomes[outcome] += 1
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(requests):
+            executor.submit(one)
+    wall = time.perf_counter() - started
+    
+    latencies.sort()
+    return {
+        "requests": requests,
+        **outcomes,
+        "seconds": wall,
+        "throughput": requests / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+def app_sender(workload: Workload, stream: bool, wait_ready: bool) -> Callable[[], bool]:
+    """Create the Flask app and return a function posting one query to /ask (or /ask/stream)."""
+    from ui import create_app
+    app = create_app()
+    clients = threading.local()
+    
+    if wait_ready:
+        deadline = time.monotonic() + 30
+        while app.test_client().get("/ready").status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.05)
+    
+    def send() -> bool:
+        # Clients keep a session cookie; one per worker thread, like one browser per user
+        client = getattr(clients, "client", None)
+        if client is None:
+            client = clients.client = app.test_client()
+        _, text = workload.next()
+        if stream:
+            response = client.post("/ask/stream", data={"user_input": text})
+            body = response.get_data(as_text=True)
+            if response.status_code != 200 or "event: error" in body:
+                raise RuntimeError(f"/ask/stream failed with {response.status_code}")
+            done = body.rsplit("event: done\ndata: ", 1)[-1].split("\n", 1)[0]
+            return not is_degraded(json.loads(done)["response"])
+        response = client.post("/ask", data={"user_input": text})
+        if response.status_code != 200:
+            raise RuntimeError(f"/ask failed with {response.status_code}")
+        return not is_degraded(response.get_json()["response"])
+    
+    return send
+
+def coordinator_sender(workload: Workload) -> Callable[[], bool]:
+    """Build the provider stack and agents like main.py and return a function running one query on the Coordinator."""
+    from agents import (
+        HuggingFaceProvider, CachingProvider, ProviderPool, RateLimiter, RateLimitedProvider,
+        GeneralAgent, WeatherAgent, HotelAgent, RestaurantAgent, AttractionAgent
+    )
+    from agents.rate_limiter import BACKGROUND
+    from core.base import Message
+    from core.coordinator import Coordinator
+    from core.router import IntentRouter
+    from core.session import ConversationSession
+    
+    model_ids = [model_id.strip() for model_id in os.environ["HUGGINGFACE_MODELS"].split(",")]
+    limiter = RateLimiter(rate=float(os.environ["HUGGINGFACE_RATE_LIMIT"]),
+                          max_concurrency=int(os.environ["HUGGINGFACE_MAX_CONCURRENCY"]), max_queue=10000)
+    provider = CachingProvider(RateLimitedProvider(ProviderPool([HuggingFaceProvider(m) for m in model_ids]), limiter))
+    coordinator = Coordinator(default_timeout=130)
+    for agent_class, name in ((GeneralAgent, "Assistant"), (WeatherAgent, "WeatherExpert"), (HotelAgent, "HotelExpert"),
+                              (RestaurantAgent, "RestaurantExpert"), (AttractionAgent, "AttractionExpert")):
+        agent = agent_class(name, provider)
+        agent.initialize()
+        coordinator.add_agent(agent)
+    router = IntentRouter()
+    sessions = threading.local()
+    
+    def send() -> bool:
+        session = getattr(sessions, "session", None)
+        if session is None:
+            session = sessions.session = ConversationSession(threading.current_thread().name)
+        _, text = workload.next()
+        route = router.route(text)
+        if not route.is_travel_guide:
+            return not is_degraded(coordinator.process_message(Message(content=text, sender="User"), route.agent, session).content)
+        
+        # The guide pipeline: the four experts at once, then the compiled guide
+        questions = [
+            (f"What will the weather be like in {route.location} on {route.date}?", "WeatherExpert"),
+            (f"What are the 5 best hotels in {route.location}?", "HotelExpert"),
+            (f"What are the 5 best restaurants in {route.location}?", "RestaurantExpert"),
+            (f"What are the 5 best attractions in {route.location}?", "AttractionExpert"),
+        ]
+        responses = coordinator.process_messages_parallel(
+            [(Message(content=question, sender="User", metadata={"priority": BACKGROUND}), agent) for question, agent in questions],
+            session=session
+        )
+        sections = "\n\n".join(f"{agent}:\n{response.content}" for (_, agent), response in zip(questions, responses))
+        guide = coordinator.process_message(
+            Message(content=f"Create a travel guide for {route.location} on {route.date} from:\n\n{sections}", sender="User"),
+            "Assistant", session
+        )
+        return not any(is_degraded(response.content) for response in responses) and not is_degraded(guide.content)
+    
+    return send
+
+def run_scenario(name: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Run one scenario against a fresh mock server and pipeline and return its results."""
+    entry, guide_share = SCENARIOS[name]
+    workload = Workload(guide_share, args.repeat_share, args.seed)
+    server = server_from_arguments(args).start()
+    os.environ.update({
+        "HUGGINGFACE_API_URL": server.url,
+        "HUGGINGFACE_MODELS": args.models,
+        "HUGGINGFACE_RATE_LIMIT": str(args.rate),
+        "HUGGINGFACE_MAX_CONCURRENCY": str(args.api_concurrency),
+    })
+    if args.memory:
+        tracemalloc.start()
+    try:
+        if entry == "coordinator":
+            send = coordinator_sender(workload)
+        else:
+            send = app_sender(workload, stream=entry == "app-stream", wait_ready=not args.loading)
+        upstream_before = server.stats()["requests"]
+        result = run_load(send, args.requests, args.concurrency)
+        result["upstream"] = server.stats()["requests"] - upstream_before
+        if args.memory:
+            result["traced_peak_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        if args.memory:
+            tracemalloc.stop()
+        server.stop()
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10)
+    return result
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float) -> List[str]:
+    """List the scenarios whose throughput or p95 latency regressed beyond `tolerance` (a fraction)."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result["throughput"] < before["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {result['throughput']:.1f}/s, baseline {before['throughput']:.1f}/s")
+        if result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']:.0f} ms, baseline {before['p95_ms']:.0f} ms")
+    return regressions
+
+def print_results(results: Dict[str, Dict[str, Any]]) -> None:
+    print(f"{'scenario':<18} {'reqs':>5} {'ok':>5} {'degr':>5} {'err':>4} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'upstream':>8} {'rss MB':>7} {'traced MB':>9}")
+    for name, r in results.items():
+        traced = f"{r['traced_peak_mb']:.1f}" if "traced_peak_mb" in r else "-"
+        rss = f"{r['peak_rss_mb']:.0f}" if "peak_rss_mb" in r else "-"
+        print(f"{name:<18} {r['requests']:>5} {r['ok']:>5} {r['degraded']:>5} {r['errors']:>4} {r['throughput']:>8.1f} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['upstream']:>8} {rss:>7} {traced:>9}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the travel agent pipeline against a mock inference API.")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run; repeat for several (default: all)")
+    parser.add_argument("--requests", type=int, default=50, help="requests per scenario (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients (default: %(default)s)")
+    parser.add_argument("--repeat-share", type=float, default=0.0,
+                        help="share of queries repeating an earlier one, i.e. cache hits (default: 0)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the queries (default: %(default)s)")
+    parser.add_argument("--models", default="mock/model-a", help="comma-separated model ids (default: %(default)s)")
+    parser.add_argument("--rate", type=float, default=1000.0,
+                        help="rate limit towards the mock API, requests/s (default: %(default)s)")
+    parser.add_argument("--api-concurrency", type=int, default=16,
+                        help="concurrent requests allowed to the mock API (default: %(default)s)")
+    parser.add_argument("--memory", action="store_true",
+                        help="trace Python allocations for each scenario's peak (slows the run down)")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed regression against the baseline, as a fraction (default: %(default)s)")
+    add_server_arguments(parser)
+    args = parser.parse_args(argv)
+    
+    # The app writes its log and guide history to the working directory
+    workdir = tempfile.mkdtemp(prefix="travel-agent-bench-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        results = {name: run_scenario(name, args) for name in args.scenario or SCENARIOS}
+    finally:
+        os.chdir(cwd)
+    
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,42 @@
+"""Micro-benchmark of per-message routing cost.
+
+Run with `python -m benchmarks.bench_router`.
+"""
+import re
+import timeit
+from core.router import AGENT_KEYWORDS, IntentRouter, NaiveBayesIntentClassifier
+
+QUERIES = [
+    "I want to go to Paris on June 15",
+    "What's the weather like in Rome in March?",
+    "Can you recommend a hotel near the beach?",
+    "Where can I eat good seafood for dinner?",
+    "Which museums should I visit in Madrid?",
+    "Is it too hot to stay in a resort in August?",
+    "Tell me something about the history of Vienna",
+]
+
+def legacy_route(text: str) -> str:
+    """The previous routing: compile the travel pattern and scan every keyword list per message."""
+    travel_pattern = re.compile(r"(?:i want to|planning to|going to|travel to|visit) (?:go to|go in|visit) ([a-zA-Z\s]+) (?:on|at|in) ([a-zA-Z0-9\s,]+)", re.IGNORECASE)
+    if travel_pattern.search(text):
+        return "Assistant"
+    for agent, keywords in AGENT_KEYWORDS.items():
+        if any(keyword in text.lower() for keyword in keywords):
+            return agent
+    return "Assistant"
+
+def main(number: int = 20000) -> None:
+    routers = [
+        ("legacy", legacy_route),
+        ("router", IntentRouter().route),
+        ("router+nb", IntentRouter(classifier=NaiveBayesIntentClassifier.from_keywords()).route)
+    ]
+    
+    for name, route in routers:
+        seconds = timeit.timeit(lambda: [route(query) for query in QUERIES], number=number)
+        per_query = seconds / (number * len(QUERIES)) * 1e6
+        print(f"{name:>10}: {per_query:.2f} us/query")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
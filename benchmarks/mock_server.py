@@ -0,0 +1,231 @@
+"""Local stand-in for the Hugging Face inference API, for offline load tests.
+
+Run with `python -m benchmarks.mock_server --port 8080 --latency lognormal:0.8:0.5` and point
+the app at it with `HUGGINGFACE_API_URL=http://127.0.0.1:8080/models`.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+class LatencyModel:
+    """Random response latency in seconds, parsed from a spec.
+    
+    Specs: `fixed:SECONDS`, `uniform:LOW:HIGH` or `lognormal:MEDIAN:SIGMA`
+    (a long tail, like a shared inference API under load).
+    """
+    
+    def __init__(self, spec: str = "fixed:0.05"):
+        self.spec = spec
+        kind, *values = spec.split(":")
+        self.kind = kind
+        self.values = [float(value) for value in values]
+        if kind not in ("fixed", "uniform", "lognormal") or len(self.values) != (1 if kind == "fixed" else 2):
+            raise ValueError(f"Invalid latency spec '{spec}'")
+    
+    def sample(self) -> float:
+        """Draw one latency."""
+        if self.kind == "fixed":
+            return self.values[0]
+        if self.kind == "uniform":
+            return random.uniform(*self.values)
+        median, sigma = self.values
+        return median * random.lognormvariate(0.0, sigma)
+
+class MockInferenceServer:
+    """HTTP server answering like the Hugging Face text-generation API.
+    
+    Handles single and list inputs, the chat completions route of the
+    messages API format and streamed (server-sent event) replies.
+    A share of requests (`error_rate`) fails with `error_status`, and for
+    `loading_seconds` after start or `reload()` every request gets the
+    API's 503 "model is loading" reply with an estimated time.
+    """
+    
+    def __init__(self, latency: str = "fixed:0.05", error_rate: float = 0.0, error_status: int = 500,
+                 loading_seconds: float = 0.0, tokens: int = 40, token_delay: float = 0.0,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.latency = LatencyModel(latency)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.tokens = tokens
+        self.token_delay = token_delay
+        self.loading_seconds = loading_seconds
+        self._loading_until = 0.0
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.statuses: Dict[int, int] = {}
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.mock = self
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def url(self) -> str:
+        """Base URL to use as HUGGINGFACE_API_URL."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/models"
+    
+    def start(self) -> "MockInferenceServer":
+        """Serve requests on a background thread."""
+        self.reload()
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-inference", daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self) -> None:
+        """Stop serving and close the socket."""
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def reload(self) -> None:
+        """Act as if the model was just evicted: answer 503 "loading" for `loading_seconds`."""
+        self._loading_until = time.monotonic() + self.loading_seconds
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get the number of requests served and their status codes."""
+        with self._lock:
+            return {"requests": self.requests, "statuses": dict(self.statuses)}
+    
+    def __enter__(self) -> "MockInferenceServer":
+        return self.start()
+    
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+    
+    def _count(self, status: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+    
+    def _generate(self, prompt: str) -> str:
+        """A deterministic answer of `tokens` words that mentions the end of the prompt."""
+        # The last line of the prompt once chat template markers are removed is (the end of) the user's turn
+        lines = [line.strip() for line in _TEMPLATE_MARKERS.sub("\n", prompt).splitlines()]
+        lines = [line for line in lines if line and line != "Assistant:"]
+        topic = lines[-1].replace("User:", "", 1).strip()[:60] if lines else ""
+        words = ["Here", "is", "what", "I", "know", "about", topic or "that", "."]
+        words += ["More"] * max(0, self.tokens - len(words))
+        return " ".join(words)
+
+# Turn markers of the chat templates in agents/prompt_templates.py
+_TEMPLATE_MARKERS = re.compile(r"<\|[a-z_]+\|>(?:system|user|assistant)?|</?s>|\[/?INST\]")
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+    
+    def do_POST(self) -> None:
+        mock: MockInferenceServer = self.server.mock
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        inputs = body.get("inputs", "")
+        
+        if time.monotonic() < mock._loading_until:
+            estimated = round(mock._loading_until - time.monotonic(), 1)
+            return self._reply(503, {"error": f"Model {self.path.rsplit('/', 1)[-1]} is currently loading",
+                                     "estimated_time": estimated})
+        
+        time.sleep(mock.latency.sample())
+        if mock.error_rate and random.random() < mock.error_rate:
+            return self._reply(mock.error_status, {"error": "Mock inference error"})
+        
+        if self.path.endswith("/v1/chat/completions"):
+            return self._chat(mock, body)
+        if body.get("stream") and isinstance(inputs, str):
+            return self._stream(mock, mock._generate(inputs))
+        if isinstance(inputs, list):
+            return self._reply(200, [[{"generated_text": mock._generate(prompt)}] for prompt in inputs])
+        return self._reply(200, [{"generated_text": mock._generate(inputs)}])
+    
+    def _chat(self, mock: MockInferenceServer, body: Dict[str, Any]) -> None:
+        """Answer a chat completions request, streamed as OpenAI-style chunks up to [DONE] if asked to."""
+        messages = body.get("messages") or []
+        text = mock._generate(messages[-1].get("content", "") if messages else "")
+        if not body.get("stream"):
+            return self._reply(200, {"object": "chat.completion", "model": body.get("model"), "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}
+            ]})
+        
+        mock._count(200)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for index, token in enumerate(text.split(" ")):
+            event = {"object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": {"content": token if index == 0 else " " + token}}]}
+            self._chunk(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            if mock.token_delay:
+                time.sleep(mock.token_delay)
+        self._chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+    
+    def _reply(self, status: int, payload: Any) -> None:
+        self.server.mock._count(status)
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def _stream(self, mock: MockInferenceServer, text: str) -> None:
+        """Send the text token by token as server-sent events, then the full text."""
+        mock._count(200)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        tokens = text.split(" ")
+        for index, token in enumerate(tokens):
+            event = {"token": {"text": token if index == 0 else " " + token, "special": False}, "generated_text": None}
+            if index == len(tokens) - 1:
+                event["generated_text"] = text
+            self._chunk(f"data:{json.dumps(event)}\n\n".encode("utf-8"))
+            if mock.token_delay:
+                time.sleep(mock.token_delay)
+        self.wfile.write(b"0\r\n\r\n")
+    
+    def _chunk(self, data: bytes) -> None:
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the mock server's options to a command line parser."""
+    parser.add_argument("--latency", default="lognormal:0.05:0.5",
+                        help="latency spec: fixed:S, uniform:LOW:HIGH or lognormal:MEDIAN:SIGMA (default: %(default)s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests that fail (default: 0)")
+    parser.add_argument("--error-status", type=int, default=500, help="status code of failed requests (default: 500)")
+    parser.add_argument("--loading", type=float, default=0.0,
+                        help="seconds to answer 503 'model loading' after start (default: 0)")
+    parser.add_argument("--tokens", type=int, default=40, help="words per generated answer (default: 40)")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between streamed tokens (default: 0)")
+
+def server_from_arguments(args: argparse.Namespace, port: int = 0) -> MockInferenceServer:
+    """Create a mock server from parsed `add_server_arguments` options."""
+    return MockInferenceServer(latency=args.latency, error_rate=args.error_rate, error_status=args.error_status,
+                               loading_seconds=args.loading, tokens=args.tokens, token_delay=args.token_delay,
+                               port=port)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a mock Hugging Face inference API.")
+    parser.add_argument("--port", type=int, default=8080)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    
+    server = server_from_arguments(args, args.port).start()
+    print(f"Mock inference API on {server.url} (latency {args.latency}); Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,67 @@
+import logging
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Dict, List, Optional
+
+class BoundedQueueHandler(QueueHandler):
+    """Queue handler that hands records to a listener thread and drops them when the queue is full.
+    
+    Records are queued unformatted, so `%`-style arguments are formatted on
+    the listener thread; log arguments should therefore be values that do
+    not change afterwards (strings, numbers). Exception tracebacks are
+    rendered right away, since they refer to the caller's live frames.
+    """
+    
+    def __init__(self, max_queue: int = 10000):
+        super().__init__(queue.Queue(maxsize=max_queue))
+        self.max_queue = max_queue
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Keep the record as is, apart from rendering its exception details."""
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+    
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Queue a record, counting it as dropped when the listener is too far behind."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get the number of queued and dropped records."""
+        return {"queued": self.queue.qsize(), "max_queue": self.max_queue, "dropped": self.dropped}
+
+def configure_queue_logging(make_handlers: Callable[[], List[logging.Handler]], level: int = logging.INFO,
+                            max_queue: int = 10000) -> Optional[QueueListener]:
+    """Send the root logger's records through a bounded queue to handlers on a listener thread.
+    
+    Like `logging.basicConfig`, this does nothing (and returns None) when the
+    root logger already has handlers. Otherwise it creates the handlers with
+    `make_handlers`, so files are only opened when they will be written to,
+    and returns the started listener; call its `stop()` at shutdown to write
+    out the queued records.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return None
+    
+    handler = BoundedQueueHandler(max_queue)
+    listener = QueueListener(handler.queue, *make_handlers(), respect_handler_level=True)
+    listener.start()
+    root.addHandler(handler)
+    root.setLevel(level)
+    return listener
+
+def queue_handler() -> Optional[BoundedQueueHandler]:
+    """Get the root logger's bounded queue handler, if queue logging is configured."""
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, BoundedQueueHandler):
+            return handler
+    return None
\ No newline at end of file
@@ -0,0 +1,127 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger('travel_agent')
+
+_STOP = object()
+
+class BackgroundWriter:
+    """Runs writes on a worker thread so callers never wait on disk.
+    
+    Items handed to `submit` are collected into batches of up to `max_batch`
+    and passed to `write_batch` on the worker thread; under load many items
+    share one write. A failed batch is logged and dropped.
+    
+    At most `max_queue` items wait at a time. When the worker falls that far
+    behind, `submit` waits up to `block_timeout` seconds for room and then
+    drops the item, so a slow disk slows callers down by a bounded amount and
+    never makes them hang. `stats` reports the queue depth, drops and waits.
+    """
+    
+    def __init__(self, write_batch: Callable[[List[Any]], None], name: str = "background-writer",
+                 max_batch: int = 100, max_queue: int = 10000, block_timeout: float = 0.1):
+        self.write_batch = write_batch
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self.block_timeout = block_timeout
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+        self.submitted = 0
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.dropped = 0
+        self.blocked = 0
+        self.max_depth = 0
+        self.write_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+    
+    def submit(self, item: Any) -> bool:
+        """Queue an item to be written; returns False if it was dropped because the queue stayed full."""
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._stats_lock:
+                self.blocked += 1
+            try:
+                self._queue.put(item, timeout=self.block_timeout)
+            except queue.Full:
+                with self._stats_lock:
+                    self.dropped += 1
+                logger.warning(f"Background writer {self._thread.name} is {self.max_queue} items behind; dropped an item")
+                return False
+        
+        with self._stats_lock:
+            self.submitted += 1
+            self.max_depth = max(self.max_depth, self._queue.qsize())
+        return True
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every item submitted so far has been written; returns False on timeout."""
+        if timeout is None:
+            self._queue.join()
+            return True
+        
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+    
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Write what is queued, then stop the worker thread."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get the queue depth and counters for written, dropped and blocked items."""
+        with self._stats_lock:
+            return {
+                "queued": self._queue.qsize(),
+                "max_queue": self.max_queue,
+                "max_depth": self.max_depth,
+                "submitted": self.submitted,
+                "written": self.written,
+                "batches": self.batches,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "blocked": self.blocked,
+                "write_seconds": self.write_seconds
+            }
+    
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            # Take whatever else is already waiting, up to a full batch
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            stop = any(item is _STOP for item in batch)
+            items = [item for item in batch if item is not _STOP]
+            started = time.perf_counter()
+            try:
+                if items:
+                    self.write_batch(items)
+                    with self._stats_lock:
+                        self.written += len(items)
+                        self.batches += 1
+            except Exception:
+                with self._stats_lock:
+                    self.failed += len(items)
+                logger.exception(f"Background write of {len(items)} items failed")
+            finally:
+                with self._stats_lock:
+                    self.write_seconds += time.perf_counter() - started
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
\ No newline at end of file
@@ -1,33 +1,82 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Generator, Hashable, List, Optional, Tuple
+from core.history import HistoryArchive, MessageHistory
 
+@dataclass(slots=True)
 class Message:
-    def __init__(self, content: str, sender: str, metadata: Dict[str, Any] = None):
-        self.content = content
-        self.sender = sender
-        self.metadata = metadata or {}
+    content: str
+    sender: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    
+    def __post_init__(self):
+        # Callers may pass metadata=None explicitly
+        if self.metadata is None:
+            self.metadata = {}
 
 class Agent(ABC):
     """Base abstract class for all agents in the system."""
     
-    def __init__(self, name: str):
+    def __init__(self, name: str, history_window: int = 50, archive: Optional[HistoryArchive] = None):
         self.name = name
-        self.message_history: List[Message] = []
+        self.message_history = MessageHistory(history_window, archive)
     
     @abstractmethod
-    def process_message(self, message: Message) -> Message:
-        """Process an incoming message and return a response."""
+    def process_message(self, message: Message, history: Optional[MessageHistory] = None) -> Message:
+        """Process an incoming message and return a response.
+        
+        `history` is the conversation to read from and record into; when omitted
+        the agent's own `message_history` is used.
+        """
         pass
     
+    async def aprocess_message(self, message: Message, history: Optional[MessageHistory] = None) -> Message:
+        """Asynchronously process an incoming message and return a response."""
+        return await asyncio.to_thread(self.process_message, message, history)
+    
+    def stream_message(self, message: Message, history: Optional[MessageHistory] = None) -> Generator[str, None, Message]:
+        """Process an incoming message, yielding the response text as it is produced.
+        
+        The generator's return value is the complete response message. Agents that
+        cannot stream yield the whole response as a single chunk.
+        """
+        response = self.process_message(message, history)
+        yield response.content
+        return response
+    
+    def batch_key(self) -> Optional[Hashable]:
+        """Key shared by agents that can answer several messages in one go through `process_batch`.
+        
+        The default None means this agent's messages are always processed one by one.
+        """
+        return None
+    
+    def process_batch(self, requests: List[Tuple["Agent", Message, Optional[MessageHistory]]],
+                      on_response: Optional[Callable[[int, Message], None]] = None) -> List[Message]:
+        """Process (agent, message, history) requests for agents sharing this agent's batch key.
+        
+        Returns the responses in request order, and passes each one to
+        `on_response` with its position as soon as it is ready, so callers need
+        not wait for the whole batch. The default implementation processes them
+        one by one.
+        """
+        responses = []
+        for position, (agent, message, history) in enumerate(requests):
+            responses.append(agent.process_message(message, history))
+            if on_response is not None:
+                on_response(position, responses[-1])
+        return responses
+    
     @abstractmethod
     def initialize(self) -> None:
         """Initialize the agent with any necessary setup."""
         pass
     
-    def add_to_history(self, message: Message) -> None:
-        """Add a message to the agent's history."""
-        self.message_history.append(message)
+    def add_to_history(self, message: Message, history: Optional[MessageHistory] = None) -> None:
+        """Add a message to the given conversation history, or the agent's own history."""
+        (history if history is not None else self.message_history).append(message)
     
     def get_history(self) -> List[Message]:
-        """Get the agent's message history."""
-        return self.message_history 
\ No newline at end of file
+        """Get the messages in the agent's history window."""
+        return list(self.message_history) 
\ No newline at end of file
@@ -1,12 +1,72 @@
-from typing import Dict, List
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Generator, Hashable, Iterator, List, Optional, Tuple
+import asyncio
+import threading
+import time
 from core.base import Agent, Message
+from core.history import HistoryArchive, MessageHistory
+from core.metrics import REGISTRY, STAGE_SECONDS, span
+from core.semantic_cache import SemanticCache, SemanticLookup
+from core.session import ConversationSession
+
+TIMEOUTS = REGISTRY.counter(
+    "travel_agent_agent_timeouts",
+    "Agent calls that missed their deadline and got a placeholder response",
+    ("agent",)
+)
+
+class _AbandonableHistory:
+    """A conversation history as seen by an agent call the coordinator may give up on.
+    
+    Reads go straight to the history. Once the call is abandoned, its writes
+    are dropped, so an agent that missed its deadline and answers later does
+    not add its late reply to the conversation.
+    """
+    
+    def __init__(self, history: MessageHistory):
+        self.history = history
+        self._abandoned = False
+        self._lock = threading.Lock()
+    
+    def abandon(self) -> None:
+        """Drop every write from now on."""
+        with self._lock:
+            self._abandoned = True
+    
+    def append(self, message: Message) -> None:
+        """Record a message, unless the call was abandoned."""
+        with self._lock:
+            if not self._abandoned:
+                self.history.append(message)
+    
+    def recent(self, count: int) -> List[Message]:
+        """Get the last `count` messages, oldest first."""
+        return self.history.recent(count)
+    
+    def __len__(self) -> int:
+        return len(self.history)
+    
+    def __iter__(self) -> Iterator[Message]:
+        return iter(self.history)
 
 class Coordinator:
-    """Manages communication between multiple agents."""
+    """Manages communication between multiple agents.
+    
+    With a semantic cache, questions to the agents it caches that start a
+    conversation with the agent are answered from earlier answers to similar
+    questions when there is one. Follow-up questions always reach the agent,
+    since their answer depends on the conversation so far.
+    """
     
-    def __init__(self):
+    def __init__(self, max_workers: int = 8, default_timeout: Optional[float] = None,
+                 history_window: int = 200, archive: Optional[HistoryArchive] = None,
+                 semantic_cache: Optional[SemanticCache] = None):
         self.agents: Dict[str, Agent] = {}
-        self.history: List[Message] = []
+        self.history = MessageHistory(history_window, archive)
+        self.max_workers = max_workers
+        self.default_timeout = default_timeout
+        self.semantic_cache = semantic_cache
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="coordinator")
     
     def add_agent(self, agent: Agent) -> None:
         """Add an agent to the coordinator."""
@@ -21,23 +81,326 @@ class Coordinator:
         """Get an agent by name."""
         return self.agents.get(agent_name)
     
-    def process_message(self, message: Message, target_agent: str) -> Message:
-        """Process a message using the specified agent."""
+    def process_message(self, message: Message, target_agent: str,
+                        session: Optional[ConversationSession] = None) -> Message:
+        """Process a message using the specified agent.
+        
+        With a session, the conversation is read from and recorded into that session's
+        state instead of the coordinator's and agents' own histories.
+        """
         if target_agent not in self.agents:
             raise ValueError(f"Agent '{target_agent}' not found")
         
         # Add message to history
-        self.history.append(message)
+        self._history(session).append(message)
         
-        # Process message with target agent
-        agent = self.agents[target_agent]
-        response = agent.process_message(message)
+        # Process message with target agent, unless a similar question was answered before
+        lookup = self._lookup(message, target_agent, session)
+        if lookup is not None and lookup.hit:
+            response = self._cached_response(lookup, message, session)
+        else:
+            agent = self.agents[target_agent]
+            with span("agent", target_agent):
+                response = agent.process_message(message, self._agent_history(session, target_agent))
+            self._remember(lookup, response)
         
         # Add response to history
-        self.history.append(response)
+        self._history(session).append(response)
         
         return response
     
+    def stream_message(self, message: Message, target_agent: str,
+                       session: Optional[ConversationSession] = None) -> Generator[str, None, Message]:
+        """Process a message using the specified agent, yielding the response text as it is produced.
+        
+        The generator's return value is the complete response message.
+        """
+        if target_agent not in self.agents:
+            raise ValueError(f"Agent '{target_agent}' not found")
+        
+        # Add message to history
+        self._history(session).append(message)
+        
+        # Stream the response from the target agent; a cached answer comes in one piece
+        lookup = self._lookup(message, target_agent, session)
+        if lookup is not None and lookup.hit:
+            response = self._cached_response(lookup, message, session)
+            yield response.content
+        else:
+            with span("agent", target_agent):
+                response = yield from self.agents[target_agent].stream_message(
+                    message, self._agent_history(session, target_agent)
+                )
+            self._remember(lookup, response)
+        
+        # Add response to history
+        self._history(session).append(response)
+        
+        return response
+    
+    def process_messages_parallel(self, requests: List[Tuple[Message, str]], timeouts: Dict[str, float] = None,
+                                  session: Optional[ConversationSession] = None) -> List[Message]:
+        """Process independent messages on several agents at the same time.
+        
+        Each request is a (message, target_agent) pair. Responses are returned in the
+        same order as the requests. An agent that misses its deadline (from `timeouts`,
+        falling back to `default_timeout`) gets a placeholder response instead, so one
+        slow agent cannot hold up the others. Requests for agents with the same batch
+        key (e.g. the same LLM provider) are handed to them as a batch, so requests
+        the provider can send as one API call go out together; every request still
+        has its own deadline and is delivered as soon as it is answered.
+        """
+        responses: List[Optional[Message]] = [None] * len(requests)
+        for index, response in self._iter_parallel(requests, timeouts, session):
+            responses[index] = response
+        
+        # Record history in request order so it reads the same as sequential calls
+        for (message, _), response in zip(requests, responses):
+            self._history(session).append(message)
+            self._history(session).append(response)
+        
+        return responses
+    
+    def iter_messages_parallel(self, requests: List[Tuple[Message, str]], timeouts: Dict[str, float] = None,
+                               session: Optional[ConversationSession] = None) -> Iterator[Tuple[int, Message]]:
+        """Like `process_messages_parallel`, but yield (request index, response) pairs as agents finish."""
+        for index, response in self._iter_parallel(requests, timeouts, session):
+            self._history(session).append(requests[index][0])
+            self._history(session).append(response)
+            yield index, response
+    
+    def _iter_parallel(self, requests: List[Tuple[Message, str]], timeouts: Dict[str, float],
+                       session: Optional[ConversationSession]) -> Iterator[Tuple[int, Message]]:
+        """Dispatch requests on the worker pool and yield (index, response) pairs in completion order."""
+        for _, target_agent in requests:
+            if target_agent not in self.agents:
+                raise ValueError(f"Agent '{target_agent}' not found")
+        
+        timeouts = timeouts or {}
+        started = time.monotonic()
+        
+        # Questions answered before are served from the semantic cache once the rest are dispatched
+        lookups: Dict[int, SemanticLookup] = {}
+        for index, (message, target_agent) in enumerate(requests):
+            lookup = self._lookup(message, target_agent, session)
+            if lookup is not None:
+                lookups[index] = lookup
+        live = [index for index in range(len(requests)) if index not in lookups or not lookups[index].hit]
+        
+        # Agents record the exchange in their history themselves, through a view that is
+        # closed when they miss their deadline, since a running call cannot be stopped
+        histories: Dict[int, _AbandonableHistory] = {}
+        for index in live:
+            target_agent = requests[index][1]
+            history = self._agent_history(session, target_agent)
+            histories[index] = _AbandonableHistory(
+                history if history is not None else self.agents[target_agent].message_history
+            )
+        
+        # One future and deadline per request; for a batch, the batch task completes each
+        # request's future as soon as the provider call its request went out in returns
+        pending: Dict[Future, int] = {}
+        deadlines: Dict[Future, Optional[float]] = {}
+        tasks: Dict[int, Future] = {}
+        for indices in self._batches(requests, live):
+            target_agent = requests[indices[0]][1]
+            if len(indices) == 1:
+                message = requests[indices[0]][0]
+                task = self._executor.submit(
+                    self.agents[target_agent].process_message, message, histories[indices[0]]
+                )
+                futures = [task]
+            else:
+                # Agents sharing a batch key answer together, e.g. with batched LLM calls
+                batch = [
+                    (self.agents[requests[index][1]], requests[index][0], histories[index])
+                    for index in indices
+                ]
+                futures = [Future() for _ in indices]
+                task = self._executor.submit(self._run_batch, self.agents[target_agent], batch, futures)
+            for index, future in zip(indices, futures):
+                pending[future] = index
+                tasks[index] = task
+                timeout = timeouts.get(requests[index][1], self.default_timeout)
+                deadlines[future] = None if timeout is None else started + timeout
+        
+        for index, lookup in lookups.items():
+            if lookup.hit:
+                yield index, self._cached_response(lookup, requests[index][0], session)
+        
+        while pending:
+            # Wait until the next response arrives or the nearest deadline passes
+            live_deadlines = [deadlines[future] for future in pending if deadlines[future] is not None]
+            wait_time = max(0.0, min(live_deadlines) - time.monotonic()) if live_deadlines else None
+            done, _ = wait(pending, timeout=wait_time, return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                index = pending.pop(future)
+                response = future.result()
+                STAGE_SECONDS.observe(time.monotonic() - started, stage="agent", agent=requests[index][1])
+                self._remember(lookups.get(index), response)
+                yield index, response
+            
+            # Give up on agents that missed their deadline
+            now = time.monotonic()
+            for future in [f for f in pending if deadlines[f] is not None and deadlines[f] <= now]:
+                index = pending.pop(future)
+                histories[index].abandon()
+                # Drop the task unless batch-mates still wait on it (a running task is not stopped anyway)
+                if not any(tasks[other] is tasks[index] for other in pending.values()):
+                    tasks[index].cancel()
+                target_agent = requests[index][1]
+                yield index, self._timeout_response(target_agent, timeouts.get(target_agent, self.default_timeout))
+    
+    @staticmethod
+    def _run_batch(agent: Agent, batch: List[Tuple[Agent, Message, Optional[MessageHistory]]],
+                   futures: List[Future]) -> None:
+        """Run a batch on a worker thread, completing each request's future as soon as its response is ready."""
+        def deliver(position: int, response: Message) -> None:
+            futures[position].set_result(response)
+        
+        try:
+            responses = agent.process_batch(batch, deliver)
+        except BaseException as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        # Agents whose process_batch does not report responses as they go
+        for future, response in zip(futures, responses):
+            if not future.done():
+                future.set_result(response)
+    
+    def _batches(self, requests: List[Tuple[Message, str]], indices: List[int]) -> List[List[int]]:
+        """Group the given request indices by their agents' batch key; agents without one get a group each."""
+        groups: Dict[Hashable, List[int]] = {}
+        batches: List[List[int]] = []
+        for index in indices:
+            target_agent = requests[index][1]
+            key = self.agents[target_agent].batch_key()
+            if key is None:
+                batches.append([index])
+            elif key in groups:
+                groups[key].append(index)
+            else:
+                groups[key] = [index]
+                batches.append(groups[key])
+        return batches
+    
+    def _history(self, session: Optional[ConversationSession]) -> MessageHistory:
+        """Get the coordinator-level history for a session, or the coordinator's own history."""
+        return session.history if session is not None else self.history
+    
+    def _agent_history(self, session: Optional[ConversationSession], agent_name: str) -> Optional[MessageHistory]:
+        """Get an agent's history for a session; None lets the agent use its own history."""
+        return session.agent_history(agent_name) if session is not None else None
+    
+    def _lookup(self, message: Message, target_agent: str,
+                session: Optional[ConversationSession]) -> Optional[SemanticLookup]:
+        """Look a question up in the semantic cache; None when the agent is not cached or it is a follow-up."""
+        if self.semantic_cache is None or not self.semantic_cache.caches(target_agent):
+            return None
+        history = self._agent_history(session, target_agent)
+        if len(history if history is not None else self.agents[target_agent].message_history):
+            return None
+        with span("semantic_cache", target_agent):
+            return self.semantic_cache.lookup(target_agent, message.content)
+    
+    def _cached_response(self, lookup: SemanticLookup, message: Message,
+                         session: Optional[ConversationSession]) -> Message:
+        """Answer with the cached response, recording the exchange in the agent's history as if it had answered."""
+        response = Message(
+            content=lookup.response,
+            sender=lookup.agent,
+            metadata={**lookup.metadata, "semantic_cache": {"similarity": round(lookup.similarity, 3),
+                                                            "query": lookup.matched_query}}
+        )
+        agent = self.agents[lookup.agent]
+        agent.add_to_history(message, self._agent_history(session, lookup.agent))
+        agent.add_to_history(response, self._agent_history(session, lookup.agent))
+        return response
+    
+    def _remember(self, lookup: Optional[SemanticLookup], response: Message) -> None:
+        """Cache an agent's answer to a looked-up question; errors and timeouts are not cached."""
+        if lookup is not None and not response.metadata.get("error"):
+            self.semantic_cache.store(lookup, response.content, response.metadata)
+    
+    def _timeout_response(self, target_agent: str, timeout: float) -> Message:
+        """Build the placeholder response for an agent that missed its deadline."""
+        TIMEOUTS.inc(agent=target_agent)
+        return Message(
+            content=f"Sorry, {target_agent} did not respond within {timeout:g} seconds.",
+            sender=target_agent,
+            metadata={"error": "timeout"}
+        )
+    
+    async def aprocess_message(self, message: Message, target_agent: str,
+                               session: Optional[ConversationSession] = None) -> Message:
+        """Asynchronously process a message using the specified agent."""
+        if target_agent not in self.agents:
+            raise ValueError(f"Agent '{target_agent}' not found")
+        
+        # Add message to history
+        self._history(session).append(message)
+        
+        # Process message with target agent, unless a similar question was answered before
+        lookup = self._lookup(message, target_agent, session)
+        if lookup is not None and lookup.hit:
+            response = self._cached_response(lookup, message, session)
+        else:
+            with span("agent", target_agent):
+                response = await self.agents[target_agent].aprocess_message(
+                    message, self._agent_history(session, target_agent)
+                )
+            self._remember(lookup, response)
+        
+        # Add response to history
+        self._history(session).append(response)
+        
+        return response
+    
+    async def aprocess_messages_parallel(self, requests: List[Tuple[Message, str]], timeouts: Dict[str, float] = None,
+                                         session: Optional[ConversationSession] = None) -> List[Message]:
+        """Async counterpart of `process_messages_parallel`, running the agents as concurrent tasks."""
+        for _, target_agent in requests:
+            if target_agent not in self.agents:
+                raise ValueError(f"Agent '{target_agent}' not found")
+        
+        timeouts = timeouts or {}
+        
+        async def run(message: Message, target_agent: str) -> Message:
+            lookup = self._lookup(message, target_agent, session)
+            if lookup is not None and lookup.hit:
+                return self._cached_response(lookup, message, session)
+            
+            # As in the threaded path: an agent running its call on a thread keeps going after
+            # its deadline, so its history view is closed when it misses it
+            agent = self.agents[target_agent]
+            history = self._agent_history(session, target_agent)
+            history = _AbandonableHistory(history if history is not None else agent.message_history)
+            timeout = timeouts.get(target_agent, self.default_timeout)
+            try:
+                with span("agent", target_agent):
+                    response = await asyncio.wait_for(agent.aprocess_message(message, history), timeout)
+            except asyncio.TimeoutError:
+                history.abandon()
+                return self._timeout_response(target_agent, timeout)
+            self._remember(lookup, response)
+            return response
+        
+        responses = await asyncio.gather(*(run(message, target_agent) for message, target_agent in requests))
+        
+        # Record history in request order so it reads the same as sequential calls
+        for (message, _), response in zip(requests, responses):
+            self._history(session).append(message)
+            self._history(session).append(response)
+        
+        return list(responses)
+    
+    def shutdown(self) -> None:
+        """Release the worker pool without waiting for abandoned requests."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+    
     def get_history(self) -> List[Message]:
-        """Get the full message history."""
-        return self.history 
\ No newline at end of file
+        """Get the messages in the coordinator's history window."""
+        return list(self.history)
\ No newline at end of file
@@ -0,0 +1,118 @@
+import re
+import threading
+import time
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger('travel_agent')
+
+MONTHS = ["january", "february", "march", "april", "may", "june", "july",
+          "august", "september", "october", "november", "december"]
+
+# Full month names and their exact abbreviations ("Jun", "Sept"), so "decent" or "Mayfair" are not months
+_MONTH_NAMES = {name: month for month in MONTHS for name in (month, month[:3])}
+_MONTH_NAMES["sept"] = "september"
+_MONTH_PATTERN = re.compile(r"\b(" + "|".join(sorted(_MONTH_NAMES, key=len, reverse=True)) + r")\b", re.IGNORECASE)
+_NUMERIC_DATE_PATTERN = re.compile(r"\b\d{4}-(\d{1,2})-\d{1,2}\b")
+_WHITESPACE = re.compile(r"\s+")
+
+class GuideCache:
+    """Caches whole travel guides per (location, date bucket) with stale-while-revalidate.
+    
+    A guide younger than `ttl` is served as is. An older guide is still served,
+    up to `stale_ttl`, while a background worker rebuilds it; after that the
+    caller has to rebuild it on the request thread like a miss.
+    """
+    
+    def __init__(self, ttl: float = 6 * 3600, stale_ttl: float = 7 * 86400, max_size: int = 128,
+                 refresh_workers: int = 2):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Any, float]]" = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="guide-refresh")
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(location: str, date_str: str) -> Tuple[str, str]:
+        """Build a cache key from the normalized location and the month of the travel date."""
+        return _WHITESPACE.sub(" ", location).strip().casefold(), date_bucket(date_str)
+    
+    def get(self, key: Tuple[str, str], refresh: Callable[[], Any]) -> Tuple[Optional[Any], str]:
+        """Look up a guide, returning it with its status: "fresh", "stale" or "miss".
+        
+        On a stale hit `refresh` is run in the background; it is expected to build
+        the guide again and `put` it back. On a miss the guide is None.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                guide, created = entry
+                age = now - created
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return guide, "fresh"
+                if age < self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        self._executor.submit(self._refresh, key, refresh)
+                    return guide, "stale"
+                del self._entries[key]
+            self.misses += 1
+            return None, "miss"
+    
+    def put(self, key: Tuple[str, str], guide: Any) -> None:
+        """Store a freshly built guide, evicting the least recently used beyond max_size."""
+        with self._lock:
+            self._entries[key] = (guide, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def _refresh(self, key: Tuple[str, str], refresh: Callable[[], Any]) -> None:
+        """Rebuild a stale guide in the background, keeping the stale copy if that fails."""
+        try:
+            refresh()
+        except Exception:
+            logger.exception(f"Background refresh of travel guide {key} failed")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get the cache's size and hit counters."""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "refreshing": len(self._refreshing)
+            }
+    
+    def shutdown(self) -> None:
+        """Stop the background refresh workers."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+def date_bucket(date_str: str) -> str:
+    """Reduce a free-form travel date to its month, which is what the weather section depends on."""
+    match = _MONTH_PATTERN.search(date_str)
+    if match:
+        return _MONTH_NAMES[match.group(1).lower()]
+    
+    match = _NUMERIC_DATE_PATTERN.search(date_str)
+    if match and 1 <= int(match.group(1)) <= 12:
+        return MONTHS[int(match.group(1)) - 1]
+    
+    # Unrecognized date: fall back to the normalized text itself
+    return _WHITESPACE.sub(" ", date_str).strip().casefold()
\ No newline at end of file
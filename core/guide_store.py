@@ -0,0 +1,281 @@
+import glob
+import json
+import os
+import re
+import sqlite3
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+from core.background_writer import BackgroundWriter
+from core.metrics import span
+
+_WHITESPACE = re.compile(r"\s+")
+_SEARCH_TERM = re.compile(r"[^\W_]+")
+
+class GuideStore(ABC):
+    """Storage for the history of generated travel guides."""
+    
+    @abstractmethod
+    def add(self, entry: Dict[str, Any]) -> None:
+        """Store a guide's history entry (timestamp, location, date, responses)."""
+        pass
+    
+    @abstractmethod
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Get the latest guides, newest first."""
+        pass
+    
+    @abstractmethod
+    def find(self, location: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+             limit: int = 20) -> List[Dict[str, Any]]:
+        """Get guides for a location and/or an ISO timestamp range, newest first."""
+        pass
+    
+    @abstractmethod
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Full-text search over the guides' location, date and expert responses, best matches first."""
+        pass
+    
+    def close(self) -> None:
+        """Write anything still pending and release resources."""
+        pass
+
+class SqliteGuideStore(GuideStore):
+    """Guide history in a SQLite database in WAL mode, indexed by timestamp and location.
+    
+    `add` only queues the entry; a background writer inserts queued entries in
+    batches, one transaction each, so requests never wait on the disk. Reads
+    give the writer up to `read_wait` seconds to catch up, then return what
+    has been written so far, so a backed-up writer never stalls them.
+    
+    An FTS5 index over the location, travel date, expert responses and final
+    guide is kept up to date by a trigger in the same transaction as each
+    insert. A database from before the index existed is indexed when opened.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS guides (
+            id INTEGER PRIMARY KEY,
+            timestamp TEXT NOT NULL,
+            location TEXT NOT NULL,
+            travel_date TEXT,
+            user_query TEXT,
+            entry TEXT NOT NULL
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS guides_timestamp ON guides (timestamp, location);
+        CREATE INDEX IF NOT EXISTS guides_location ON guides (location, timestamp);
+        CREATE VIRTUAL TABLE IF NOT EXISTS guides_fts USING fts5(
+            location, travel_date, weather, hotels, restaurants, attractions, guide,
+            tokenize = "unicode61 remove_diacritics 2", prefix = "2 3"
+        );
+        CREATE TRIGGER IF NOT EXISTS guides_fts_insert AFTER INSERT ON guides BEGIN
+            INSERT INTO guides_fts (rowid, location, travel_date, weather, hotels, restaurants, attractions, guide)
+            VALUES (new.id, json_extract(new.entry, '$.location'), new.travel_date,
+                    json_extract(new.entry, '$.weather_response'), json_extract(new.entry, '$.hotel_response'),
+                    json_extract(new.entry, '$.restaurant_response'), json_extract(new.entry, '$.attraction_response'),
+                    json_extract(new.entry, '$.final_response'));
+        END;
+        CREATE TRIGGER IF NOT EXISTS guides_fts_delete AFTER DELETE ON guides BEGIN
+            DELETE FROM guides_fts WHERE rowid = old.id;
+        END;
+    """
+    
+    # Column weights for ranking: a match in the location counts most, one in the compiled guide least
+    SEARCH_WEIGHTS = (10.0, 4.0, 1.0, 1.0, 1.0, 1.0, 0.5)
+    
+    # Re-adding a guide (same timestamp and location) is a no-op, which keeps migrations repeatable
+    _INSERT = ("INSERT OR IGNORE INTO guides (timestamp, location, travel_date, user_query, entry) "
+               "VALUES (?, ?, ?, ?, ?)")
+    
+    def __init__(self, path: str = os.path.join("history", "travel_guides.db"), max_batch: int = 100,
+                 read_wait: float = 0.1):
+        self.path = path
+        self.read_wait = read_wait
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        connection = self._connect()
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            indexed = connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'guides_fts'"
+            ).fetchone() is not None
+            connection.executescript(self.SCHEMA)
+            if not indexed:
+                self._build_search_index(connection)
+        finally:
+            connection.close()
+        
+        self._writer_connection: Optional[sqlite3.Connection] = None
+        self._writer = BackgroundWriter(self._write_batch, name="guide-store-writer", max_batch=max_batch)
+    
+    def add(self, entry: Dict[str, Any]) -> None:
+        """Queue a guide's history entry for the background writer."""
+        self._writer.submit(entry)
+    
+    def add_many(self, entries: List[Dict[str, Any]]) -> int:
+        """Insert entries right away, skipping ones already stored; returns how many were new."""
+        connection = self._connect()
+        try:
+            with connection:
+                # Count rows rather than changes, which include the search index updates
+                before = connection.execute("SELECT count(*) FROM guides").fetchone()[0]
+                connection.executemany(self._INSERT, [self._row(entry) for entry in entries])
+                return connection.execute("SELECT count(*) FROM guides").fetchone()[0] - before
+        finally:
+            connection.close()
+    
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Get the latest guides, newest first."""
+        return self._query("SELECT entry FROM guides ORDER BY timestamp DESC LIMIT ?", (limit,))
+    
+    def find(self, location: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+             limit: int = 20) -> List[Dict[str, Any]]:
+        """Get guides for a location (case and spacing ignored) and/or an ISO timestamp range, newest first."""
+        conditions, parameters = [], []
+        if location is not None:
+            conditions.append("location = ?")
+            parameters.append(normalize_location(location))
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            parameters.append(since)
+        if until is not None:
+            conditions.append("timestamp < ?")
+            parameters.append(until)
+        
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        return self._query(f"SELECT entry FROM guides {where}ORDER BY timestamp DESC LIMIT ?", (*parameters, limit))
+    
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Find guides containing every word of the query (the last one as a prefix), best matches first.
+        
+        Case and accents are ignored and punctuation is dropped, so free text
+        like "Lisbon, June?" is a valid query. Each result holds the guide's
+        id, timestamp, location, date, user query, relevance score (higher is
+        better) and a snippet around the best match.
+        """
+        match = search_expression(query)
+        if not match:
+            return []
+        
+        weights = ", ".join(str(weight) for weight in self.SEARCH_WEIGHTS)
+        self._writer.flush(self.read_wait)
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                "SELECT g.id, g.timestamp, json_extract(g.entry, '$.location'), g.travel_date, g.user_query, "
+                f"bm25(guides_fts, {weights}), snippet(guides_fts, -1, '[', ']', '...', 12) "
+                "FROM guides_fts JOIN guides g ON g.id = guides_fts.rowid "
+                f"WHERE guides_fts MATCH ? ORDER BY bm25(guides_fts, {weights}) LIMIT ?",
+                (match, limit)
+            ).fetchall()
+        finally:
+            connection.close()
+        
+        # bm25() is lower for better matches; flip it so scores read naturally
+        return [
+            {"id": guide_id, "timestamp": timestamp, "location": location, "date": travel_date,
+             "user_query": user_query, "score": round(-rank, 4), "snippet": snippet}
+            for guide_id, timestamp, location, travel_date, user_query, rank, snippet in rows
+        ]
+    
+    def rebuild_search_index(self) -> int:
+        """Index every stored guide again from scratch; returns how many guides were indexed."""
+        self.flush()
+        connection = self._connect()
+        try:
+            return self._build_search_index(connection)
+        finally:
+            connection.close()
+    
+    def flush(self) -> None:
+        """Wait until every queued entry has been written."""
+        self._writer.flush()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get the background writer's queue depth and counters."""
+        return self._writer.stats()
+    
+    def close(self) -> None:
+        """Write the queued entries and stop the background writer."""
+        self._writer.close()
+        if self._writer_connection is not None:
+            self._writer_connection.close()
+            self._writer_connection = None
+    
+    def _write_batch(self, entries: List[Dict[str, Any]]) -> None:
+        """Insert a batch of entries in one transaction (runs on the writer thread)."""
+        if self._writer_connection is None:
+            self._writer_connection = self._connect()
+        with span("persistence"), self._writer_connection:
+            self._writer_connection.executemany(self._INSERT, [self._row(entry) for entry in entries])
+    
+    @staticmethod
+    def _build_search_index(connection: sqlite3.Connection) -> int:
+        """Fill the full-text index from the guides table in one transaction."""
+        with connection:
+            connection.execute("DELETE FROM guides_fts")
+            connection.execute(
+                "INSERT INTO guides_fts (rowid, location, travel_date, weather, hotels, restaurants, attractions, guide) "
+                "SELECT id, json_extract(entry, '$.location'), travel_date, json_extract(entry, '$.weather_response'), "
+                "json_extract(entry, '$.hotel_response'), json_extract(entry, '$.restaurant_response'), "
+                "json_extract(entry, '$.attraction_response'), json_extract(entry, '$.final_response') FROM guides"
+            )
+            return connection.execute("SELECT count(*) FROM guides_fts").fetchone()[0]
+    
+    def _query(self, sql: str, parameters: tuple) -> List[Dict[str, Any]]:
+        """Run a read query, briefly waiting for pending writes, returning the decoded entries."""
+        self._writer.flush(self.read_wait)
+        connection = self._connect()
+        try:
+            return [json.loads(entry) for (entry,) in connection.execute(sql, parameters)]
+        finally:
+            connection.close()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection to the database."""
+        # WAL lets readers work alongside the writer; wait rather than fail on a busy database.
+        # Connections are never shared between live threads, but the writer's is closed by close()
+        connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+    
+    @staticmethod
+    def _row(entry: Dict[str, Any]) -> tuple:
+        """Turn a history entry into a row for the guides table."""
+        return (
+            entry["timestamp"],
+            normalize_location(entry.get("location") or ""),
+            entry.get("date"),
+            entry.get("user_query"),
+            json.dumps(entry, ensure_ascii=False)
+        )
+
+def normalize_location(location: str) -> str:
+    """Normalize a location for lookups: collapse whitespace and ignore case."""
+    return _WHITESPACE.sub(" ", location).strip().casefold()
+
+def search_expression(query: str) -> str:
+    """Turn free text into an FTS5 query matching all of its words, the last one also as a prefix."""
+    terms = [f'"{term}"' for term in _SEARCH_TERM.findall(query)]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+def migrate_json_files(store: SqliteGuideStore, directory: str = "history", remove: bool = False) -> int:
+    """Import the legacy per-guide `travel_guide_*.json` files; returns how many guides were new.
+    
+    Importing is idempotent: guides already in the store are skipped. With
+    `remove`, each file is deleted once its guide is in the store.
+    """
+    paths = sorted(glob.glob(os.path.join(directory, "travel_guide_*.json")))
+    entries = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            entries.append(json.load(f))
+    
+    added = store.add_many(entries) if entries else 0
+    if remove:
+        for path in paths:
+            os.remove(path)
+    return added
\ No newline at end of file
@@ -0,0 +1,76 @@
+import json
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import asdict
+from datetime import datetime
+from typing import TYPE_CHECKING, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    from core.base import Message
+
+class HistoryArchive(ABC):
+    """Storage for messages that have been pushed out of a bounded history window."""
+    
+    @abstractmethod
+    def archive(self, message: "Message") -> None:
+        """Store a message evicted from the history window."""
+        pass
+
+class JsonlHistoryArchive(HistoryArchive):
+    """Archive that appends evicted messages to a JSON Lines file."""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+    
+    def archive(self, message: "Message") -> None:
+        """Append the message as one JSON line."""
+        record = asdict(message)
+        record["archived_at"] = datetime.now().isoformat()
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+class MessageHistory:
+    """Ring buffer of the most recent messages.
+    
+    Holds at most `max_size` messages; the oldest message is handed to the
+    optional archive when a new one pushes it out, so memory stays flat no
+    matter how long the conversation runs.
+    """
+    
+    def __init__(self, max_size: int = 50, archive: Optional[HistoryArchive] = None):
+        if max_size < 1:
+            raise ValueError("MessageHistory needs room for at least one message")
+        self.max_size = max_size
+        self.archive = archive
+        self._messages: deque = deque(maxlen=max_size)
+        self._lock = threading.Lock()
+    
+    def append(self, message: "Message") -> None:
+        """Add a message, spilling the oldest one to the archive when the window is full."""
+        with self._lock:
+            evicted = self._messages[0] if len(self._messages) == self.max_size else None
+            self._messages.append(message)
+        
+        if evicted is not None and self.archive is not None:
+            self.archive.archive(evicted)
+    
+    def recent(self, count: int) -> List["Message"]:
+        """Get the last `count` messages, oldest first."""
+        with self._lock:
+            start = max(0, len(self._messages) - count)
+            return [self._messages[i] for i in range(start, len(self._messages))]
+    
+    def clear(self) -> None:
+        """Drop every message in the window (archived messages are kept)."""
+        with self._lock:
+            self._messages.clear()
+    
+    def __len__(self) -> int:
+        return len(self._messages)
+    
+    def __iter__(self) -> Iterator["Message"]:
+        with self._lock:
+            return iter(list(self._messages))
\ No newline at end of file
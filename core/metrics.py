@@ -0,0 +1,212 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from a cache hit up to a cold model load
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# One rendered sample: (metric name suffix, labels, value)
+Sample = Tuple[str, Dict[str, str], float]
+
+class Counter:
+    """Monotonic counter with a fixed set of label names."""
+    
+    type = "counter"
+    
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        """Add `amount` to the series for the given label values."""
+        key = _label_values(self.labels, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def value(self, **labels: object) -> float:
+        """Get the current value of one series."""
+        with self._lock:
+            return self._values.get(_label_values(self.labels, labels), 0.0)
+    
+    def samples(self) -> List[Sample]:
+        """Get every series as (suffix, labels, value) samples."""
+        with self._lock:
+            return [("_total", dict(zip(self.labels, key)), value) for key, value in self._values.items()]
+
+class Histogram:
+    """Cumulative-bucket histogram with a fixed set of label names, as Prometheus expects."""
+    
+    type = "histogram"
+    
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per series: [count per bucket (the last one is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float, **labels: object) -> None:
+        """Record one observation in the series for the given label values."""
+        key = _label_values(self.labels, labels)
+        index = _bucket_index(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+    
+    @contextmanager
+    def time(self, **labels: object) -> Iterator[None]:
+        """Observe how long the enclosed block takes, including when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+    
+    def percentile(self, q: float, **labels: object) -> Optional[float]:
+        """Estimate the q-th percentile (0-100) of one series from its buckets, or None without data."""
+        with self._lock:
+            series = self._series.get(_label_values(self.labels, labels))
+            counts = list(series[0]) if series else None
+        if not counts or not sum(counts):
+            return None
+        
+        # Interpolate linearly within the bucket holding the rank, like histogram_quantile()
+        rank = q / 100 * sum(counts)
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+    
+    def samples(self) -> List[Sample]:
+        """Get every series as _bucket, _sum and _count samples."""
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        
+        samples = []
+        for key, counts, total in series:
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                samples.append(("_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, cumulative))
+        return samples
+
+class MetricsRegistry:
+    """Holds the service's metrics and renders them in the Prometheus text format.
+    
+    Counters and histograms are updated where the work happens. Gauges are
+    read at scrape time from collectors, callables returning (labels, value)
+    pairs, which suits the components that already keep their own `stats()`.
+    """
+    
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._collectors: Dict[str, Tuple[str, str, Callable[[], Iterable[Tuple[Dict[str, str], float]]]]] = {}
+        self._lock = threading.Lock()
+    
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        """Get the counter with this name, creating it on first use."""
+        return self._get_or_create(name, lambda: Counter(name, help, labels))
+    
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Get the histogram with this name, creating it on first use."""
+        return self._get_or_create(name, lambda: Histogram(name, help, labels, buckets))
+    
+    def collector(self, name: str, help: str, collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]],
+                  type: str = "gauge") -> None:
+        """Register (or replace) a metric whose samples `collect` returns at scrape time."""
+        with self._lock:
+            self._collectors[name] = (help, type, collect)
+    
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.items())
+        
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, labels, value in metric.samples():
+                lines.append(_format_sample(metric.name + suffix, labels, value))
+        
+        for name, (help, type, collect) in collectors:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {type}")
+            # Counters follow the convention of a _total suffix on the samples, as Counter does
+            sample_name = name + "_total" if type == "counter" else name
+            for labels, value in collect():
+                lines.append(_format_sample(sample_name, labels, value))
+        return "\n".join(lines) + "\n"
+    
+    def _get_or_create(self, name: str, create: Callable[[], object]):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = create()
+            return metric
+
+# The process-wide registry served on /metrics
+REGISTRY = MetricsRegistry()
+
+# Time spent in each stage of handling a request
+STAGE_SECONDS = REGISTRY.histogram(
+    "travel_agent_stage_duration_seconds",
+    "Time spent in each request stage (routing, agent, cleanup, persistence)",
+    ("stage", "agent")
+)
+
+@contextmanager
+def span(stage: str, agent: str = "") -> Iterator[None]:
+    """Time the enclosed block as one stage of a request."""
+    with STAGE_SECONDS.time(stage=stage, agent=agent):
+        yield
+
+def _label_values(names: Tuple[str, ...], labels: Dict[str, object]) -> Tuple[str, ...]:
+    """Order label values by the metric's label names; missing labels are empty."""
+    return tuple(str(labels.get(name, "")) for name in names)
+
+def _bucket_index(buckets: Tuple[float, ...], value: float) -> int:
+    """Index of the first bucket whose upper bound holds the value (len(buckets) for +Inf)."""
+    for index, bound in enumerate(buckets):
+        if value <= bound:
+            return index
+    return len(buckets)
+
+def _format_sample(name: str, labels: Dict[str, str], value: float) -> str:
+    """Format one sample line, escaping label values."""
+    if not labels:
+        return f"{name} {_format_value(value)}"
+    escaped = ",".join(f'{key}="{_escape(str(label))}"' for key, label in labels.items())
+    return f"{name}{{{escaped}}} {_format_value(value)}"
+
+def _escape(label: str) -> str:
+    """Escape a label value for the text format."""
+    return label.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    """Format a sample value the way Prometheus writes it."""
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
\ No newline at end of file
@@ -0,0 +1,184 @@
+import math
+import re
+import string
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Travel intent: "I want to go to/in [location] on [date]"
+TRAVEL_PATTERN = re.compile(
+    r"(?:i want to|planning to|going to|travel to|visit) (?:go to|go in|visit) ([a-zA-Z\s]+) (?:on|at|in) ([a-zA-Z0-9\s,]+)",
+    re.IGNORECASE
+)
+
+# Keywords per specialist, in priority order for queries that mention several topics
+AGENT_KEYWORDS: Dict[str, List[str]] = {
+    "WeatherExpert": ["weather", "temperature", "forecast", "rain", "sunny", "climate", "humid", "cold", "hot"],
+    "HotelExpert": ["hotel", "motel", "accommodation", "stay", "room", "suite", "lodge", "resort"],
+    "RestaurantExpert": ["restaurant", "food", "eat", "dining", "cuisine", "meal", "breakfast", "lunch", "dinner"],
+    "AttractionExpert": ["attraction", "visit", "sightseeing", "tour", "museum", "landmark", "monument", "park", "gallery"]
+}
+
+_WORD = re.compile(r"[a-z]+")
+_SUFFIXES = ("s", "es", "ing")
+# Shortest word start looked up as a keyword stem; no keyword is shorter
+_MIN_STEM = 3
+_PUNCTUATION = string.punctuation + "\u2019\u201c\u201d"
+
+def keyword_forms(word: str) -> Tuple[str, ...]:
+    """A keyword with its plural and -ing forms ("gallery" -> "galleries", "lodge" -> "lodging")."""
+    forms = (word,) + tuple(word + suffix for suffix in _SUFFIXES)
+    if word.endswith("y"):
+        forms += (word[:-1] + "ies",)
+    elif word.endswith("e"):
+        forms += (word[:-1] + "ing",)
+    return forms
+
+@dataclass(slots=True)
+class Route:
+    """Where a user message should go, plus the destination and date of a travel-guide request."""
+    agent: str
+    location: Optional[str] = None
+    date: Optional[str] = None
+    
+    @property
+    def is_travel_guide(self) -> bool:
+        """Whether the message asked for a full travel guide."""
+        return self.location is not None
+
+class NaiveBayesIntentClassifier:
+    """Tiny multinomial naive Bayes over words, used to break ties between specialists."""
+    
+    def __init__(self):
+        self.word_counts: Dict[str, Counter] = defaultdict(Counter)
+        self.totals: Counter = Counter()
+        self.vocabulary = set()
+        self._log_probs: Optional[Dict[str, Tuple[Dict[str, float], float]]] = None
+    
+    @classmethod
+    def from_keywords(cls, keywords: Dict[str, List[str]] = AGENT_KEYWORDS,
+                      examples: Iterable[Tuple[str, str]] = ()) -> "NaiveBayesIntentClassifier":
+        """Train a classifier on the routing keywords plus optional (text, agent) examples."""
+        classifier = cls()
+        for agent, words in keywords.items():
+            classifier.fit([(" ".join(words), agent)])
+        classifier.fit(examples)
+        return classifier
+    
+    def fit(self, examples: Iterable[Tuple[str, str]]) -> None:
+        """Add (text, agent) training examples."""
+        for text, agent in examples:
+            words = _WORD.findall(text.lower())
+            self.word_counts[agent].update(words)
+            self.totals[agent] += len(words)
+            self.vocabulary.update(words)
+        self._log_probs = None
+    
+    def predict(self, text: str, candidates: Sequence[str]) -> str:
+        """Pick the most likely agent among the candidates (the first one on an exact tie)."""
+        words = _WORD.findall(text.lower())
+        log_probs = self._log_probs or self._compute_log_probs()
+        
+        def score(agent: str) -> float:
+            known, unseen = log_probs.get(agent, ({}, 0.0))
+            return sum(known.get(word, unseen) for word in words)
+        
+        return max(candidates, key=score)
+    
+    def _compute_log_probs(self) -> Dict[str, Tuple[Dict[str, float], float]]:
+        """Precompute per-agent word log-probabilities, with Laplace smoothing for unseen words."""
+        vocabulary_size = len(self.vocabulary) or 1
+        log_probs = {}
+        for agent, counts in self.word_counts.items():
+            denominator = self.totals[agent] + vocabulary_size
+            known = {word: math.log((count + 1) / denominator) for word, count in counts.items()}
+            log_probs[agent] = (known, math.log(1 / denominator))
+        self._log_probs = log_probs
+        return log_probs
+
+class IntentRouter:
+    """Routes a user message to an agent in a single pass.
+    
+    Travel-guide requests are detected with one precompiled pattern, which only
+    runs when the message contains one of the pattern's required phrases. Topic
+    keywords for all specialists, including their plural and -ing forms, live in
+    one lookup table, so matching is a single pass over the message's words.
+    Keywords are stems as well: a word starting with one ("rainy", "humidity",
+    "tourist") matches the longest keyword it starts with, so "hotels" goes to
+    the hotel expert rather than matching "hot". Words only containing a
+    keyword elsewhere ("great") do not match. Keyword forms are indexed by their
+    first letters, so only words sharing a start with some keyword are checked
+    as stems.
+    When a message mentions several topics, the optional classifier decides,
+    falling back to keyword priority order.
+    """
+    
+    def __init__(self, keywords: Dict[str, List[str]] = AGENT_KEYWORDS, default_agent: str = "Assistant",
+                 classifier: Optional[NaiveBayesIntentClassifier] = None):
+        self.default_agent = default_agent
+        self.classifier = classifier
+        self.priority = list(keywords)
+        
+        # Every accepted form of a keyword -> (agent, keyword); the first agent listing a word wins
+        self._keywords: Dict[str, Tuple[str, str]] = {}
+        for agent, words in keywords.items():
+            for word in words:
+                word = word.lower()
+                for form in keyword_forms(word):
+                    self._keywords.setdefault(form, (agent, word))
+        
+        # First _MIN_STEM letters -> keyword forms starting with them, longest first
+        self._stems: Dict[str, List[Tuple[str, Tuple[str, str]]]] = defaultdict(list)
+        for form in sorted(self._keywords, key=len, reverse=True):
+            self._stems[form[:_MIN_STEM]].append((form, self._keywords[form]))
+        self._stems = dict(self._stems)
+    
+    def route(self, text: str, default_agent: Optional[str] = None) -> Route:
+        """Decide which agent should handle a message."""
+        default_agent = default_agent or self.default_agent
+        lowered = text.lower()
+        
+        # The travel pattern needs "go to", "go in" or "visit", so skip the regex when none is present
+        if "go " in lowered or "visit" in lowered:
+            match = TRAVEL_PATTERN.search(text)
+            if match:
+                return Route(default_agent, match.group(1).strip(), match.group(2).strip())
+        
+        # Only words starting like some keyword form are looked up as stems
+        keywords, stems = self._keywords, self._stems
+        matched: List[str] = []
+        for word in lowered.split():
+            word = word.strip(_PUNCTUATION)
+            entry = keywords.get(word)
+            if entry is None and word[:_MIN_STEM] in stems:
+                entry = self._match(word)
+            if entry is not None and entry[0] not in matched:
+                matched.append(entry[0])
+        
+        if not matched:
+            return Route(default_agent)
+        if len(matched) == 1:
+            return Route(matched[0])
+        
+        # Ambiguous: several topics mentioned
+        if self.classifier is not None:
+            return Route(self.classifier.predict(self._normalize(lowered), matched))
+        return Route(min(matched, key=self.priority.index))
+    
+    def _match(self, word: str) -> Optional[Tuple[str, str]]:
+        """Look up a word as a keyword form, or else by the longest keyword it starts with."""
+        entry = self._keywords.get(word)
+        if entry is not None:
+            return entry
+        for form, entry in self._stems.get(word[:_MIN_STEM], ()):
+            if word.startswith(form):
+                return entry
+        return None
+    
+    def _normalize(self, lowered: str) -> str:
+        """Replace keyword forms with the keyword itself so the classifier sees its training vocabulary."""
+        words = []
+        for word in _WORD.findall(lowered):
+            entry = self._match(word)
+            words.append(entry[1] if entry is not None else word)
+        return " ".join(words)
\ No newline at end of file
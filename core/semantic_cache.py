@@ -0,0 +1,385 @@
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from core.router import keyword_forms
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; without it the index scores entries in pure Python
+    np = None
+
+# A sparse unit vector: dimension -> value
+Vector = Dict[int, float]
+
+_WORD = re.compile(r"[^\W_]+")
+
+# Words that do not change what a travel question asks for; "best" or "top" hotels are just hotels
+STOP_WORDS = frozenset("""
+a about an and any are as at be best book can could do does find for from get give good great i in is it know
+like list me my need nice of on or our please popular recommend recommended should show some tell that the there
+to top want what whats where which who will with would you your
+""".split())
+
+# Words whose difference changes the answer however similar the rest of two questions is
+_MONTHS = {
+    name: str(number)
+    for number, names in enumerate([
+        ("january", "jan"), ("february", "feb"), ("march", "mar"), ("april", "apr"), ("may",), ("june", "jun"),
+        ("july", "jul"), ("august", "aug"), ("september", "sep", "sept"), ("october", "oct"),
+        ("november", "nov"), ("december", "dec")
+    ], start=1)
+    for name in names
+}
+DATE_WORDS = frozenset("""
+today tonight tomorrow yesterday weekend week month year morning afternoon evening night
+monday tuesday wednesday thursday friday saturday sunday
+""".split())
+NEGATIONS = frozenset("no non not without never nor don dont isnt nothing none".split())
+_ORDINAL = re.compile(r"(\d+)(?:st|nd|rd|th)?")
+
+def literal_term(word: str) -> Optional[str]:
+    """The literal term a (casefolded) word stands for, if it is a number, date or negation."""
+    number = _ORDINAL.fullmatch(word)
+    if number:
+        return "#" + str(int(number.group(1)))
+    if word in _MONTHS:
+        return "month:" + _MONTHS[word]
+    if word in DATE_WORDS:
+        return "date:" + word
+    if word in NEGATIONS:
+        return "not"
+    return None
+
+def literal_terms(text: str) -> Tuple[str, ...]:
+    """The numbers, dates and negations in a text, which a cached answer's query has to share exactly.
+    
+    Embeddings weigh "June 3" and "June 4", or "vegetarian" and
+    "non-vegetarian", as nearly the same; these terms keep such questions
+    apart. Numbers (and ordinals) compare by value, months by number, and
+    every negation word counts as the same term.
+    """
+    terms = {literal_term(word) for word in _WORD.findall(text.casefold())}
+    terms.discard(None)
+    return tuple(sorted(terms))
+
+class HashedNgramEmbedder:
+    """Embeds short queries as unit vectors of hashed word and character trigram features.
+    
+    Stop words, and the topic words of the agent a query goes to, are left out:
+    within one agent's cache "hotels in Paris" and "where to stay in Paris?" are
+    the same question, so what is left (places, cuisines, price ranges) decides
+    how similar two queries are. `SemanticCache` also leaves out numbers, dates
+    and negations, which it matches exactly instead (see `literal_terms`). Character trigrams make plurals and small
+    spelling differences count as near matches. Features are hashed with
+    CRC-32, so vectors are the same in every process.
+    """
+    
+    def __init__(self, dimensions: int = 1024, char_weight: float = 0.5, stop_words: Iterable[str] = STOP_WORDS):
+        self.dimensions = dimensions
+        self.char_weight = char_weight
+        self.stop_words = frozenset(stop_words)
+    
+    def embed(self, text: str, ignore_words: Iterable[str] = (), ignore_literals: bool = False) -> Vector:
+        """Embed a text, leaving `ignore_words` (and with `ignore_literals`, every literal term) out like stop words."""
+        ignored = self.stop_words.union(ignore_words)
+        vector: Vector = {}
+        for word in _WORD.findall(text.casefold()):
+            if word in ignored or ignore_literals and literal_term(word) is not None:
+                continue
+            self._add(vector, "w:" + word, 1.0)
+            marked = f"<{word}>"
+            for start in range(len(marked) - 2):
+                self._add(vector, "c:" + marked[start:start + 3], self.char_weight)
+        
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        return {index: value / norm for index, value in vector.items()} if norm else {}
+    
+    def _add(self, vector: Vector, feature: str, weight: float) -> None:
+        # The hash's top bit picks the sign, so colliding features tend to cancel out instead of adding up
+        hashed = zlib.crc32(feature.encode("utf-8"))
+        index = hashed % self.dimensions
+        vector[index] = vector.get(index, 0.0) + (weight if hashed & 0x80000000 else -weight)
+
+def topic_forms(words: Iterable[str]) -> frozenset:
+    """Topic words with the plural and -ing forms the router accepts for them."""
+    return frozenset(form for word in words for form in keyword_forms(word.lower()))
+
+def cosine(a: Vector, b: Vector) -> float:
+    """Cosine similarity of two sparse unit vectors."""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(index, 0.0) for index, value in a.items())
+
+class VectorIndex:
+    """Exact nearest-neighbour search by cosine similarity over unit vectors.
+    
+    With numpy the vectors are rows of one matrix, so a search is a single
+    matrix-vector product; the matrix grows by doubling and removals move the
+    last row into the gap. Without numpy every vector is scored in Python.
+    A brute-force scan stays well under a millisecond at the few thousand
+    entries an agent's cache holds.
+    """
+    
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+        self._keys: List[Any] = []
+        self._rows: Dict[Any, int] = {}
+        self._vectors: List[Vector] = []
+        self._matrix = np.zeros((16, dimensions), dtype=np.float32) if np is not None else None
+    
+    def add(self, key: Any, vector: Vector) -> None:
+        """Add (or replace) the vector stored under a key."""
+        if key in self._rows:
+            self.remove(key)
+        row = len(self._keys)
+        self._keys.append(key)
+        self._rows[key] = row
+        if self._matrix is None:
+            self._vectors.append(vector)
+            return
+        
+        if row == len(self._matrix):
+            self._matrix = np.concatenate([self._matrix, np.zeros_like(self._matrix)])
+        self._matrix[row] = 0.0
+        if vector:
+            self._matrix[row, list(vector)] = list(vector.values())
+    
+    def remove(self, key: Any) -> None:
+        """Remove a key's vector, if present."""
+        row = self._rows.pop(key, None)
+        if row is None:
+            return
+        last = len(self._keys) - 1
+        if row != last:
+            moved = self._keys[last]
+            self._keys[row] = moved
+            self._rows[moved] = row
+            if self._matrix is None:
+                self._vectors[row] = self._vectors[last]
+            else:
+                self._matrix[row] = self._matrix[last]
+        self._keys.pop()
+        if self._matrix is None:
+            self._vectors.pop()
+    
+    def nearest(self, vector: Vector) -> Optional[Tuple[Any, float]]:
+        """Get the key of the most similar vector and its similarity, or None when the index is empty."""
+        if not self._keys or not vector:
+            return None
+        if self._matrix is None:
+            scores = [cosine(vector, stored) for stored in self._vectors]
+            row = max(range(len(scores)), key=scores.__getitem__)
+            return self._keys[row], scores[row]
+        
+        # Only the query's non-zero dimensions contribute, so score against those columns alone
+        columns = list(vector)
+        scores = self._matrix[:len(self._keys), columns] @ np.fromiter(vector.values(), np.float32, len(columns))
+        row = int(scores.argmax())
+        return self._keys[row], float(scores[row])
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+
+@dataclass
+class SemanticLookup:
+    """The outcome of looking a query up, to hand back to `SemanticCache.store` with the live answer on a miss.
+    
+    `response` is set on a hit. A hit picked for verification leaves it unset
+    and keeps the answer in `cached_response` instead, so the agent answers
+    anyway and `store` compares the two answers.
+    """
+    agent: str
+    query: str
+    vector: Vector = field(repr=False)
+    terms: Tuple[str, ...] = ()
+    response: Optional[str] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    similarity: float = 0.0
+    matched_query: Optional[str] = None
+    cached_response: Optional[str] = field(default=None, repr=False)
+    
+    @property
+    def hit(self) -> bool:
+        """Whether the cached answer should be served."""
+        return self.response is not None
+
+@dataclass
+class _Entry:
+    query: str
+    terms: Tuple[str, ...]
+    response: str
+    metadata: Dict[str, Any]
+    expires: float
+    hits: int = 0
+
+class _AgentCache:
+    """One agent's entries, indexes, settings and counters.
+    
+    Entries are indexed by their literal terms, so a query is only compared
+    with earlier queries that have exactly the same numbers, dates and negations.
+    """
+    
+    def __init__(self, dimensions: int, threshold: float, ttl: float, topic_words: frozenset):
+        self.dimensions = dimensions
+        self.threshold = threshold
+        self.ttl = ttl
+        self.topic_words = topic_words
+        self.entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self.indexes: Dict[Tuple[str, ...], VectorIndex] = {}
+        self.hits = 0
+        self.misses = 0
+        self.verified = 0
+        self.false_hits = 0
+        self.evictions = 0
+    
+    def index(self, terms: Tuple[str, ...]) -> VectorIndex:
+        """The index of entries with these literal terms, created on first use."""
+        index = self.indexes.get(terms)
+        if index is None:
+            index = self.indexes[terms] = VectorIndex(self.dimensions)
+        return index
+
+class SemanticCache:
+    """Serves a specialist's earlier answer to a question phrased differently but asking the same thing.
+    
+    Each configured agent has its own entries and similarity threshold, since
+    a weather answer goes stale sooner and confusing two places costs more for
+    some agents than others. Queries are embedded with a `HashedNgramEmbedder`,
+    and a lookup is a hit when the nearest earlier query of the same agent
+    with the same `literal_terms` is at least `threshold` similar. Entries expire after the agent's TTL and the
+    least recently used ones are evicted beyond `max_entries` per agent.
+    
+    A share of hits (`verify_rate`) is answered by the agent anyway; when the
+    fresh answer is less than `answer_threshold` similar to the cached one, the
+    hit counts as a false hit, and the new query gets an entry of its own.
+    """
+    
+    def __init__(self, default_threshold: float = 0.75, default_ttl: float = 3600, max_entries: int = 1024,
+                 verify_rate: float = 0.05, answer_threshold: float = 0.6,
+                 embedder: Optional[HashedNgramEmbedder] = None):
+        self.default_threshold = default_threshold
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.verify_rate = verify_rate
+        self.answer_threshold = answer_threshold
+        self.embedder = embedder or HashedNgramEmbedder()
+        self._agents: Dict[str, _AgentCache] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+    
+    def configure(self, agent: str, threshold: Optional[float] = None, ttl: Optional[float] = None,
+                  topic_words: Iterable[str] = ()) -> None:
+        """Cache an agent's answers, with its own similarity threshold, TTL and topic words to disregard."""
+        with self._lock:
+            self._agents[agent] = _AgentCache(
+                self.embedder.dimensions,
+                self.default_threshold if threshold is None else threshold,
+                self.default_ttl if ttl is None else ttl,
+                topic_forms(topic_words)
+            )
+    
+    def caches(self, agent: str) -> bool:
+        """Whether the agent's answers are cached."""
+        return agent in self._agents
+    
+    def lookup(self, agent: str, query: str) -> SemanticLookup:
+        """Find the cached answer to the most similar earlier query, if it is similar enough."""
+        cache = self._agents[agent]
+        lookup = SemanticLookup(agent, query, self.embedder.embed(query, cache.topic_words, ignore_literals=True),
+                                literal_terms(query))
+        now = time.monotonic()
+        with self._lock:
+            while True:
+                index = cache.indexes.get(lookup.terms)
+                nearest = index.nearest(lookup.vector) if index is not None else None
+                if nearest is None or nearest[1] < cache.threshold:
+                    cache.misses += 1
+                    return lookup
+                entry_id, similarity = nearest
+                entry = cache.entries[entry_id]
+                if entry.expires > now:
+                    break
+                # Drop the expired entry and look again
+                self._remove(cache, entry_id)
+            
+            cache.entries.move_to_end(entry_id)
+            cache.hits += 1
+            entry.hits += 1
+            lookup.similarity = similarity
+            lookup.matched_query = entry.query
+            if self.verify_rate and random.random() < self.verify_rate:
+                lookup.cached_response = entry.response
+            else:
+                lookup.response = entry.response
+                lookup.metadata = dict(entry.metadata)
+            return lookup
+    
+    def store(self, lookup: SemanticLookup, response: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Cache the agent's answer to a query that missed, or check a verified hit against it."""
+        cache = self._agents[lookup.agent]
+        if lookup.cached_response is not None:
+            similarity = cosine(self.embedder.embed(lookup.cached_response), self.embedder.embed(response))
+            with self._lock:
+                cache.verified += 1
+                if similarity >= self.answer_threshold:
+                    return
+                cache.false_hits += 1
+        
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            cache.entries[entry_id] = _Entry(lookup.query, lookup.terms, response, dict(metadata or {}),
+                                             time.monotonic() + cache.ttl)
+            cache.index(lookup.terms).add(entry_id, lookup.vector)
+            while len(cache.entries) > self.max_entries:
+                self._remove(cache, next(iter(cache.entries)))
+                cache.evictions += 1
+    
+    def clear(self) -> None:
+        """Remove every cached answer, keeping the agents' settings and counters."""
+        with self._lock:
+            for cache in self._agents.values():
+                cache.entries.clear()
+                cache.indexes.clear()
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get each agent's entry count, hit rate and false hits among verified hits."""
+        with self._lock:
+            stats = {}
+            for agent, cache in self._agents.items():
+                lookups = cache.hits + cache.misses
+                stats[agent] = {
+                    "size": len(cache.entries),
+                    "threshold": cache.threshold,
+                    "hits": cache.hits,
+                    "misses": cache.misses,
+                    "hit_rate": cache.hits / lookups if lookups else 0.0,
+                    "verified": cache.verified,
+                    "false_hits": cache.false_hits,
+                    "false_hit_rate": cache.false_hits / cache.verified if cache.verified else 0.0,
+                    "evictions": cache.evictions
+                }
+            return stats
+    
+    def _remove(self, cache: _AgentCache, entry_id: int) -> None:
+        """Drop an entry and its vector; called with the lock held."""
+        entry = cache.entries.pop(entry_id)
+        index = cache.indexes[entry.terms]
+        index.remove(entry_id)
+        if not len(index):
+            del cache.indexes[entry.terms]
+
+def parse_thresholds(spec: str) -> Dict[str, float]:
+    """Parse per-agent thresholds like "WeatherExpert=0.9,HotelExpert=0.8"."""
+    thresholds = {}
+    for item in spec.split(","):
+        if "=" in item:
+            agent, value = item.split("=", 1)
+            thresholds[agent.strip()] = float(value)
+    return thresholds
\ No newline at end of file
@@ -0,0 +1,95 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from core.history import HistoryArchive, MessageHistory
+
+class ConversationSession:
+    """Conversation state for one user: the coordinator-level history plus one history per agent."""
+    
+    def __init__(self, session_id: str, history_window: int = 50, archive: Optional[HistoryArchive] = None):
+        self.session_id = session_id
+        self.history_window = history_window
+        self.archive = archive
+        self.history = MessageHistory(history_window, archive)
+        self.created_at = time.monotonic()
+        self.last_access = self.created_at
+        self._agent_histories: Dict[str, MessageHistory] = {}
+        self._lock = threading.Lock()
+    
+    def agent_history(self, agent_name: str) -> MessageHistory:
+        """Get this session's history with an agent, creating it on first use."""
+        with self._lock:
+            history = self._agent_histories.get(agent_name)
+            if history is None:
+                history = MessageHistory(self.history_window, self.archive)
+                self._agent_histories[agent_name] = history
+            return history
+    
+    def touch(self) -> None:
+        """Record that the session was just used."""
+        self.last_access = time.monotonic()
+
+class SessionManager:
+    """Thread-safe registry of conversation sessions with LRU and idle-timeout eviction."""
+    
+    def __init__(self, max_sessions: int = 1000, idle_timeout: float = 1800, history_window: int = 50,
+                 archive: Optional[HistoryArchive] = None):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.history_window = history_window
+        self.archive = archive
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+    
+    def get_or_create(self, session_id: Optional[str] = None) -> ConversationSession:
+        """Get a live session by id, or start a new one.
+        
+        Unknown or expired ids get a new server-generated id rather than being
+        adopted, so clients cannot choose their own session ids.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+            
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None:
+                session = ConversationSession(uuid.uuid4().hex, self.history_window, self.archive)
+                self._sessions[session.session_id] = session
+                
+                # Drop the least recently used sessions beyond the limit
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evictions += 1
+            
+            session.touch()
+            self._sessions.move_to_end(session.session_id)
+            return session
+    
+    def remove(self, session_id: str) -> None:
+        """End a session."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+    
+    def _evict_expired(self, now: float) -> None:
+        """Drop idle sessions; the least recently used ones are at the front."""
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access < self.idle_timeout:
+                break
+            del self._sessions[session_id]
+            self.evictions += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get the number of live sessions and evictions so far."""
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "evictions": self.evictions
+            }
+    
+    def __len__(self) -> int:
+        return len(self._sessions)
\ No newline at end of file
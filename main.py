@@ -1,19 +1,32 @@
 from agents import (
-    HuggingFaceProvider,
+    HuggingFaceProvider, LlamaCppProvider, CachingProvider, ProviderPool, RateLimiter, RateLimitedProvider,
     GeneralAgent, WeatherAgent, HotelAgent, RestaurantAgent, AttractionAgent
 )
+from agents.rate_limiter import BACKGROUND
 from core.base import Message
 from core.coordinator import Coordinator
+from core.router import AGENT_KEYWORDS, IntentRouter, NaiveBayesIntentClassifier
+from core.semantic_cache import SemanticCache, parse_thresholds
 import os
-import re
-from datetime import datetime
 from dotenv import load_dotenv
 
+# Comma-separated model ids to spread requests over; override with HUGGINGFACE_MODELS
+DEFAULT_MODELS = "HuggingFaceH4/zephyr-7b-beta"
+
+def guide_section(response):
+    """The text of an expert's answer to compile into a guide, leaving provider errors out."""
+    if response.metadata.get("error"):
+        return "No information available."
+    return response.content
+
 def main():
     load_dotenv()
     
-    # Create coordinator
-    coordinator = Coordinator()
+    # Create coordinator; specialist calls get a little longer than the provider's 120 s HTTP timeout.
+    # Questions to the specialists similar enough to one answered before are served from the semantic cache
+    semantic_cache = SemanticCache(default_threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.75")),
+                                   verify_rate=float(os.getenv("SEMANTIC_CACHE_VERIFY_RATE", "0.05")))
+    coordinator = Coordinator(default_timeout=130, semantic_cache=semantic_cache)
     
     # Check available API key
     huggingface_key = os.getenv("HUGGINGFACE_API_KEY")
@@ -22,21 +35,29 @@ def main():
     print("Available APIs:")
     print(f"- Hugging Face: {'✓ (API key provided)' if huggingface_key else '✓ (free tier)'}")
     
-    # Create LLM provider
-    primary_provider = HuggingFaceProvider("HuggingFaceH4/zephyr-7b-beta")
-    print("Using HuggingFace as primary provider")
+    # Create LLM provider: a pool over one or more models, failing over between them
+    model_ids = [model_id.strip() for model_id in os.getenv("HUGGINGFACE_MODELS", DEFAULT_MODELS).split(",") if model_id.strip()]
+    # Requests pass the rate limiter before reaching the pool; identical ones are coalesced before that
+    pool = ProviderPool([HuggingFaceProvider(model_id) for model_id in model_ids])
+    limiter = RateLimiter(rate=float(os.getenv("HUGGINGFACE_RATE_LIMIT", "1.0")),
+                          max_concurrency=int(os.getenv("HUGGINGFACE_MAX_CONCURRENCY", "4")))
+    primary_provider = CachingProvider(RateLimitedProvider(pool, limiter))
+    print(f"Using HuggingFace as primary provider ({', '.join(model_ids)})")
     
-    # Initialize provider for possible use
-    providers = {
-        "huggingface": HuggingFaceProvider("HuggingFaceH4/zephyr-7b-beta")
-    }
+    # Optionally answer the specialists with a local model on the CPU: offline, no rate limits or cold starts
+    specialist_provider = primary_provider
+    local_model_path = os.getenv("LOCAL_MODEL_PATH")
+    if local_model_path:
+        specialist_provider = CachingProvider(
+            LlamaCppProvider(local_model_path, n_threads=int(os.getenv("LOCAL_MODEL_THREADS", "0")) or None)
+        )
     
-    # Create specialized agents using the primary provider
+    # Create specialized agents using the primary provider (the specialists use the local model if configured)
     general_assistant = GeneralAgent("Assistant", primary_provider)
-    weather_assistant = WeatherAgent("WeatherExpert", primary_provider)
-    hotel_assistant = HotelAgent("HotelExpert", primary_provider)
-    restaurant_assistant = RestaurantAgent("RestaurantExpert", primary_provider)
-    attraction_assistant = AttractionAgent("AttractionExpert", primary_provider)
+    weather_assistant = WeatherAgent("WeatherExpert", specialist_provider)
+    hotel_assistant = HotelAgent("HotelExpert", specialist_provider)
+    restaurant_assistant = RestaurantAgent("RestaurantExpert", specialist_provider)
+    attraction_assistant = AttractionAgent("AttractionExpert", specialist_provider)
     
     # Initialize agents
     general_assistant.initialize()
@@ -45,6 +66,13 @@ def main():
     restaurant_assistant.initialize()
     attraction_assistant.initialize()
     
+    # Cache the specialists' answers for as long as their responses are cached, each with its own threshold
+    thresholds = parse_thresholds(os.getenv("SEMANTIC_CACHE_THRESHOLDS", ""))
+    for specialist in (weather_assistant, hotel_assistant, restaurant_assistant, attraction_assistant):
+        semantic_cache.configure(specialist.name, threshold=thresholds.get(specialist.name),
+                                 ttl=specialist.generation_config.cache_ttl,
+                                 topic_words=AGENT_KEYWORDS.get(specialist.name, ()))
+    
     # Add agents to coordinator
     coordinator.add_agent(general_assistant)
     coordinator.add_agent(weather_assistant)
@@ -60,6 +88,9 @@ def main():
     
     current_agent = "Assistant"  # Default agent
     
+    # Compiled once; the classifier settles queries that mention several topics
+    router = IntentRouter(classifier=NaiveBayesIntentClassifier.from_keywords())
+    
     while True:
         # Get user input
         user_input = input("You: ").strip()
@@ -91,54 +122,49 @@ def main():
             sender="User"
         )
         
-        # Check for travel intent pattern: "I want to go to/in [location] on [date]"
-        travel_pattern = re.compile(r"(?:i want to|planning to|going to|travel to|visit) (?:go to|go in|visit) ([a-zA-Z\s]+) (?:on|at|in) ([a-zA-Z0-9\s,]+)", re.IGNORECASE)
-        match = travel_pattern.search(user_input)
+        # Route in one pass: travel intent ("I want to go to/in [location] on [date]") or topic keywords
+        route = router.route(user_input)
         
-        if match:
+        if route.is_travel_guide:
             # Extract location and date
-            location = match.group(1).strip()
-            date_str = match.group(2).strip()
+            location = route.location
+            date_str = route.date
             
             print(f"Detected travel intent for {location} on {date_str}")
             print("Building comprehensive travel guide...")
             
             # Collect information from all specialized agents
             try:
-                # 1. Get weather information
-                weather_query = f"What will the weather be like in {location} on {date_str}?"
-                weather_message = Message(content=weather_query, sender="User")
-                weather_response = coordinator.process_message(weather_message, "WeatherExpert")
-                
-                # 2. Get hotel information
-                hotel_query = f"What are the 5 best hotels in {location}?"
-                hotel_message = Message(content=hotel_query, sender="User")
-                hotel_response = coordinator.process_message(hotel_message, "HotelExpert")
+                # 1-4. Ask the weather, hotel, restaurant and attraction experts at the same time,
+                # queued behind interactive questions when the API is busy
+                specialist_requests = [
+                    (Message(content=f"What will the weather be like in {location} on {date_str}?", sender="User", metadata={"priority": BACKGROUND}), "WeatherExpert"),
+                    (Message(content=f"What are the 5 best hotels in {location}?", sender="User", metadata={"priority": BACKGROUND}), "HotelExpert"),
+                    (Message(content=f"What are the 5 best restaurants in {location}?", sender="User", metadata={"priority": BACKGROUND}), "RestaurantExpert"),
+                    (Message(content=f"What are the 5 best attractions in {location}?", sender="User", metadata={"priority": BACKGROUND}), "AttractionExpert")
+                ]
+                specialist_responses = coordinator.process_messages_parallel(specialist_requests)
+                weather_response, hotel_response, restaurant_response, attraction_response = specialist_responses
                 
-                # 3. Get restaurant information
-                restaurant_query = f"What are the 5 best restaurants in {location}?"
-                restaurant_message = Message(content=restaurant_query, sender="User")
-                restaurant_response = coordinator.process_message(restaurant_message, "RestaurantExpert")
-                
-                # 4. Get attraction information
-                attraction_query = f"What are the 5 best attractions in {location}?"
-                attraction_message = Message(content=attraction_query, sender="User")
-                attraction_response = coordinator.process_message(attraction_message, "AttractionExpert")
+                if all(response.metadata.get("error") for response in specialist_responses):
+                    # Nothing to compile (e.g. the model is still loading): show the provider's explanation
+                    print(f"Assistant: {weather_response.content}")
+                    continue
                 
                 # 5. Compile comprehensive guide
                 guide_prompt = f"""Create a comprehensive travel guide for {location} on {date_str} using the following information:
                 
                 WEATHER:
-                {weather_response.content}
+                {guide_section(weather_response)}
                 
                 HOTELS:
-                {hotel_response.content}
+                {guide_section(hotel_response)}
                 
                 RESTAURANTS:
-                {restaurant_response.content}
+                {guide_section(restaurant_response)}
                 
                 ATTRACTIONS:
-                {attraction_response.content}
+                {guide_section(attraction_response)}
                 
                 Format the guide in a clear, organized way with sections for weather, accommodation, dining, and sightseeing.
                 Add a brief introduction and conclusion.
@@ -164,20 +190,9 @@ def main():
         else:
             # Determine which agent to use based on content
             target_agent = current_agent
-            weather_keywords = ["weather", "temperature", "forecast", "rain", "sunny", "climate", "humid", "cold", "hot"]
-            hotel_keywords = ["hotel", "motel", "accommodation", "stay", "room", "suite", "lodge", "resort"]
-            restaurant_keywords = ["restaurant", "food", "eat", "dining", "cuisine", "meal", "breakfast", "lunch", "dinner"]
-            attraction_keywords = ["attraction", "visit", "sightseeing", "tour", "museum", "landmark", "monument", "park", "gallery"]
             
             if current_agent == "Assistant":
-                if any(keyword in user_input.lower() for keyword in weather_keywords):
-                    target_agent = "WeatherExpert"
-                elif any(keyword in user_input.lower() for keyword in hotel_keywords):
-                    target_agent = "HotelExpert"
-                elif any(keyword in user_input.lower() for keyword in restaurant_keywords):
-                    target_agent = "RestaurantExpert"
-                elif any(keyword in user_input.lower() for keyword in attraction_keywords):
-                    target_agent = "AttractionExpert"
+                target_agent = route.agent
                 
                 if target_agent != "Assistant":
                     print(f"Routing to {target_agent} based on query content...")
@@ -0,0 +1,31 @@
+"""Import the per-guide JSON files in history/ into the SQLite guide store.
+
+Usage: python migrate_history.py [--history-dir history] [--db history/travel_guides.db] [--remove] [--reindex]
+
+Imported guides are added to the store's search index as they are inserted;
+--reindex rebuilds the whole index afterwards.
+"""
+import argparse
+import os
+from core.guide_store import SqliteGuideStore, migrate_json_files
+
+def main():
+    parser = argparse.ArgumentParser(description="Import history/travel_guide_*.json files into the guide store.")
+    parser.add_argument("--history-dir", default="history", help="directory holding the JSON files")
+    parser.add_argument("--db", default=os.path.join("history", "travel_guides.db"), help="guide store database")
+    parser.add_argument("--remove", action="store_true", help="delete each JSON file once it is imported")
+    parser.add_argument("--reindex", action="store_true", help="rebuild the search index over all stored guides")
+    args = parser.parse_args()
+    
+    store = SqliteGuideStore(args.db)
+    try:
+        added = migrate_json_files(store, args.history_dir, remove=args.remove)
+        indexed = store.rebuild_search_index() if args.reindex else None
+    finally:
+        store.close()
+    print(f"Imported {added} new guides into {args.db}")
+    if indexed is not None:
+        print(f"Indexed {indexed} guides for search")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,43 @@
+from agents.context_builder import ContextBuilder
+from core.base import Message
+
+# One token per character keeps the budgets easy to follow
+builder_args = {"count_tokens": len}
+
+def turns(*contents: str):
+    """Alternate user and agent messages, oldest first."""
+    return [Message(content, "user" if index % 2 == 0 else "Agent") for index, content in enumerate(contents)]
+
+def test_current_message_is_always_sent_shortened_to_the_budget():
+    builder = ContextBuilder(max_prompt_tokens=20, **builder_args)
+    
+    packed, used = builder.build(turns("earlier question"), Message("x" * 50, "user"), "system", "Agent")
+    assert len(packed) == 1
+    assert packed[0]["content"].endswith(ContextBuilder.TRUNCATION_MARKER)
+    assert used == len("system") + len(packed[0]["content"]) <= 20
+
+def test_long_earlier_turns_are_shortened_keeping_their_beginning():
+    builder = ContextBuilder(max_prompt_tokens=1000, max_message_tokens=12, **builder_args)
+    
+    packed, _ = builder.build(turns("a long earlier question"), Message("now", "user"), "", "Agent")
+    assert packed[0]["content"] == "a long" + ContextBuilder.TRUNCATION_MARKER
+    assert len(packed[0]["content"]) <= 12
+    assert packed[1] == {"role": "user", "content": "now"}
+
+def test_oldest_turns_are_dropped_once_the_budget_is_used():
+    builder = ContextBuilder(max_prompt_tokens=25, max_messages=10, **builder_args)
+    
+    history = turns("question 1", "answer 1", "question 2", "answer 2")
+    packed, used = builder.build(history, Message("q3", "user"), "", "Agent")
+    assert packed == [
+        {"role": "user", "content": "question 2"},
+        {"role": "assistant", "content": "answer 2"},
+        {"role": "user", "content": "q3"}
+    ]
+    assert used == 20
+
+def test_earlier_turns_are_limited_to_max_messages():
+    builder = ContextBuilder(max_prompt_tokens=1000, max_messages=3, **builder_args)
+    
+    packed, _ = builder.build(turns("q1", "a1", "q2", "a2"), Message("q3", "user"), "", "Agent")
+    assert [message["content"] for message in packed] == ["q2", "a2", "q3"]
\ No newline at end of file
@@ -0,0 +1,146 @@
+import asyncio
+import threading
+import time
+import pytest
+from agents.llm_provider import LLMProvider
+from agents.specialized_agent import SpecializedAgent
+from core.base import Agent, Message
+from core.coordinator import Coordinator
+from core.session import ConversationSession
+
+class SleepyProvider(LLMProvider):
+    """Answers "<agent> reply" after the delay configured for the agent whose system prompt it gets."""
+    
+    def __init__(self, delays, batched=False):
+        super().__init__("sleepy")
+        self.delays = delays
+        self.batched = batched
+        self.calls = []
+        self._lock = threading.Lock()
+    
+    def initialize(self) -> None:
+        pass
+    
+    def generate_response(self, messages, system_prompt, generation_config=None) -> str:
+        agent = self._agent(system_prompt)
+        with self._lock:
+            self.calls.append([agent])
+        time.sleep(self.delays[agent])
+        return f"{agent} reply"
+    
+    def generate_responses(self, requests):
+        if not self.batched:
+            return super().generate_responses(requests)
+        agents = [self._agent(request.system_prompt) for request in requests]
+        with self._lock:
+            self.calls.append(agents)
+        time.sleep(max(self.delays[agent] for agent in agents))
+        return [f"{agent} reply" for agent in agents]
+    
+    def api_calls(self, requests):
+        if not self.batched:
+            return super().api_calls(requests)
+        return [list(range(len(requests)))]
+    
+    def _agent(self, system_prompt: str) -> str:
+        return next(agent for agent in self.delays if f"You are {agent}," in system_prompt)
+
+class SleepyAgent(Agent):
+    """Records the question, sleeps, then records its reply; its async calls run on a thread."""
+    
+    def __init__(self, name, delay):
+        super().__init__(name)
+        self.delay = delay
+    
+    def initialize(self) -> None:
+        pass
+    
+    def process_message(self, message, history=None) -> Message:
+        self.add_to_history(message, history)
+        time.sleep(self.delay)
+        response = Message(f"{self.name} reply", self.name)
+        self.add_to_history(response, history)
+        return response
+
+def make_coordinator(provider: LLMProvider, *names: str, default_timeout: float = 5.0) -> Coordinator:
+    coordinator = Coordinator(default_timeout=default_timeout)
+    for name in names:
+        coordinator.add_agent(SpecializedAgent(name, provider))
+    return coordinator
+
+def ask_all(coordinator: Coordinator, names, timeouts=None, session=None):
+    """Run one question per agent; returns {agent: (seconds until delivered, response)}."""
+    started = time.monotonic()
+    requests = [(Message(f"question for {name}", "user"), name) for name in names]
+    return {
+        requests[index][1]: (time.monotonic() - started, response)
+        for index, response in coordinator.iter_messages_parallel(requests, timeouts, session)
+    }
+
+def test_timed_out_agent_does_not_record_its_late_reply():
+    provider = SleepyProvider({"Fast": 0.0})
+    coordinator = Coordinator(default_timeout=0.2)
+    coordinator.add_agent(SpecializedAgent("Slow", SleepyProvider({"Slow": 0.5})))
+    coordinator.add_agent(SpecializedAgent("Fast", provider))
+    session = ConversationSession("test")
+    
+    responses = coordinator.process_messages_parallel(
+        [(Message("slow question", "user"), "Slow"), (Message("fast question", "user"), "Fast")], session=session
+    )
+    assert responses[0].metadata["error"] == "timeout"
+    assert responses[1].content == "Fast reply"
+    
+    # Let the slow agent finish after its deadline
+    time.sleep(0.5)
+    assert [message.content for message in session.agent_history("Slow")] == ["slow question"]
+    assert [message.content for message in session.agent_history("Fast")] == ["fast question", "Fast reply"]
+
+@pytest.mark.parametrize("run_async", [False, True])
+def test_timed_out_threaded_agent_does_not_record_its_late_reply(run_async):
+    coordinator = Coordinator(default_timeout=0.2)
+    coordinator.add_agent(SleepyAgent("Slow", 0.5))
+    coordinator.add_agent(SleepyAgent("Fast", 0.0))
+    session = ConversationSession("test")
+    requests = [(Message("slow question", "user"), "Slow"), (Message("fast question", "user"), "Fast")]
+    
+    if run_async:
+        responses = asyncio.run(coordinator.aprocess_messages_parallel(requests, session=session))
+    else:
+        responses = coordinator.process_messages_parallel(requests, session=session)
+    assert responses[0].metadata["error"] == "timeout"
+    assert responses[1].content == "Fast reply"
+    
+    time.sleep(0.5)
+    assert [message.content for message in session.agent_history("Slow")] == ["slow question"]
+    assert [message.content for message in session.agent_history("Fast")] == ["fast question", "Fast reply"]
+
+def test_agents_sharing_a_provider_are_delivered_as_they_finish():
+    provider = SleepyProvider({"Fast": 0.1, "Slow": 1.0})
+    coordinator = make_coordinator(provider, "Fast", "Slow")
+    
+    results = ask_all(coordinator, ["Fast", "Slow"], {"Fast": 0.5, "Slow": 10})
+    elapsed, response = results["Fast"]
+    assert response.content == "Fast reply"
+    assert elapsed < 0.5
+    assert results["Slow"][1].content == "Slow reply"
+
+def test_agents_sharing_a_provider_have_their_own_deadlines():
+    provider = SleepyProvider({"Fast": 0.1, "Slow": 2.0})
+    coordinator = make_coordinator(provider, "Fast", "Slow")
+    session = ConversationSession("test")
+    
+    results = ask_all(coordinator, ["Fast", "Slow"], {"Fast": 0.5, "Slow": 0.3}, session)
+    assert results["Fast"][1].content == "Fast reply"
+    assert results["Slow"][1].metadata["error"] == "timeout"
+    assert results["Slow"][0] < 1.0
+    
+    time.sleep(2.0)
+    assert [message.content for message in session.agent_history("Slow")] == ["question for Slow"]
+
+def test_requests_sent_as_one_api_call_are_answered_together():
+    provider = SleepyProvider({"Hotel": 0.1, "Food": 0.1}, batched=True)
+    coordinator = make_coordinator(provider, "Hotel", "Food")
+    
+    results = ask_all(coordinator, ["Hotel", "Food"])
+    assert provider.calls == [["Hotel", "Food"]]
+    assert [results[name][1].content for name in ("Hotel", "Food")] == ["Hotel reply", "Food reply"]
\ No newline at end of file
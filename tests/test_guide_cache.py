@@ -0,0 +1,16 @@
+import pytest
+from core.guide_cache import date_bucket
+
+@pytest.mark.parametrize("date_str, bucket", [
+    ("June 3", "june"),
+    ("3 Jun 2025", "june"),
+    ("Sept. 4", "september"),
+    ("2025-06-03", "june"),
+    ("Mayfair in May", "may"),
+    # Words that only start like a month are not months
+    ("a decent weekend", "a decent weekend"),
+    ("Mayfair  weekend", "mayfair weekend"),
+    ("Marching season", "marching season"),
+])
+def test_date_bucket(date_str, bucket):
+    assert date_bucket(date_str) == bucket
\ No newline at end of file
@@ -0,0 +1,31 @@
+import threading
+import time
+from core.guide_store import SqliteGuideStore
+
+def guide(location: str, timestamp: str) -> dict:
+    return {"timestamp": timestamp, "location": location, "date": "June 15", "user_query": f"go to {location}",
+            "weather_response": "Sunny", "final_response": f"A guide to {location}"}
+
+def test_reads_do_not_wait_for_a_backed_up_writer(tmp_path, monkeypatch):
+    release = threading.Event()
+    write_batch = SqliteGuideStore._write_batch
+    
+    def slow_write_batch(self, entries):
+        release.wait()
+        write_batch(self, entries)
+    
+    monkeypatch.setattr(SqliteGuideStore, "_write_batch", slow_write_batch)
+    store = SqliteGuideStore(str(tmp_path / "guides.db"), read_wait=0.05)
+    store.add_many([guide("Lisbon", "2026-06-01T10:00:00")])
+    store.add(guide("Paris", "2026-06-02T10:00:00"))
+    
+    started = time.monotonic()
+    assert [entry["location"] for entry in store.recent()] == ["Lisbon"]
+    assert [result["location"] for result in store.search("lisbon")] == ["Lisbon"]
+    assert time.monotonic() - started < 1.0
+    
+    release.set()
+    store.flush()
+    assert [entry["location"] for entry in store.recent()] == ["Paris", "Lisbon"]
+    assert [entry["location"] for entry in store.find(location=" PARIS ")] == ["Paris"]
+    store.close()
\ No newline at end of file
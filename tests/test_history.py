@@ -0,0 +1,58 @@
+import json
+import pytest
+from core.base import Message
+from core.history import HistoryArchive, JsonlHistoryArchive, MessageHistory
+
+class ListArchive(HistoryArchive):
+    def __init__(self):
+        self.messages = []
+    
+    def archive(self, message: Message) -> None:
+        self.messages.append(message)
+
+def fill(history: MessageHistory, count: int) -> None:
+    for number in range(1, count + 1):
+        history.append(Message(f"message {number}", "user"))
+
+def contents(messages) -> list:
+    return [message.content for message in messages]
+
+def test_window_keeps_the_newest_messages_and_archives_the_rest_oldest_first():
+    archive = ListArchive()
+    history = MessageHistory(3, archive)
+    fill(history, 5)
+    
+    assert contents(history) == ["message 3", "message 4", "message 5"]
+    assert contents(archive.messages) == ["message 1", "message 2"]
+    assert contents(history.recent(2)) == ["message 4", "message 5"]
+    assert contents(history.recent(10)) == ["message 3", "message 4", "message 5"]
+
+def test_nothing_is_archived_until_the_window_is_full():
+    archive = ListArchive()
+    history = MessageHistory(3, archive)
+    fill(history, 3)
+    
+    assert len(history) == 3
+    assert archive.messages == []
+
+def test_clear_empties_the_window_without_archiving():
+    archive = ListArchive()
+    history = MessageHistory(2, archive)
+    fill(history, 3)
+    history.clear()
+    
+    assert len(history) == 0
+    assert contents(archive.messages) == ["message 1"]
+
+def test_jsonl_archive_appends_evicted_messages_in_order(tmp_path):
+    path = tmp_path / "archive.jsonl"
+    history = MessageHistory(1, JsonlHistoryArchive(str(path)))
+    fill(history, 3)
+    
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [record["content"] for record in records] == ["message 1", "message 2"]
+    assert all(record["sender"] == "user" and "archived_at" in record for record in records)
+
+def test_window_must_hold_a_message():
+    with pytest.raises(ValueError):
+        MessageHistory(0)
\ No newline at end of file
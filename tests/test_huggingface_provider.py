@@ -0,0 +1,102 @@
+import json
+import threading
+import pytest
+from agents.huggingface_provider import HuggingFaceProvider
+from agents.llm_provider import GenerationConfig, GenerationRequest, ProviderError
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.text = json.dumps(body)
+        self.content = self.text.encode()
+    
+    def close(self) -> None:
+        pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+class FakeSession:
+    """Stands in for the pooled requests session, answering each POST through `reply(payload)`."""
+    
+    def __init__(self, reply):
+        self.reply = reply
+        self.payloads = []
+        self._lock = threading.Lock()
+    
+    def post(self, url, json=None, timeout=None, stream=False):
+        with self._lock:
+            self.payloads.append(json)
+        return FakeResponse(*self.reply(json))
+    
+    def close(self) -> None:
+        pass
+
+def make_provider(reply, **kwargs) -> HuggingFaceProvider:
+    kwargs.setdefault("max_backoff", 0.05)
+    provider = HuggingFaceProvider("HuggingFaceH4/zephyr-7b-beta", warm_up=False, **kwargs)
+    provider._session = FakeSession(reply)
+    return provider
+
+def ask(provider: HuggingFaceProvider) -> str:
+    return provider.generate_response([{"role": "user", "content": "hi"}], "You are helpful.")
+
+def requests_for(*questions: str):
+    config = GenerationConfig()
+    return [GenerationRequest([{"role": "user", "content": question}], "You are helpful.", config)
+            for question in questions]
+
+def test_cold_start_503_is_retried_until_the_model_answers():
+    replies = iter([(503, {"error": "loading", "estimated_time": 0.01}), (200, [{"generated_text": "Hello!"}])])
+    provider = make_provider(lambda payload: next(replies))
+    assert provider.readiness()["status"] == "cold"
+    
+    assert ask(provider) == "Hello!"
+    assert len(provider._session.payloads) == 2
+    assert provider.readiness() == {"model": provider.model, "ready": True, "status": "ready"}
+
+def test_model_loading_longer_than_the_caller_waits_reports_its_estimate():
+    provider = make_provider(lambda payload: (503, {"error": "loading", "estimated_time": 30}),
+                             cold_start_timeout=0.1, max_backoff=20.0)
+    
+    with pytest.raises(ProviderError) as raised:
+        ask(provider)
+    assert (raised.value.status_code, raised.value.retry_after) == (503, 30)
+    assert len(provider._session.payloads) == 1
+    
+    readiness = provider.readiness()
+    assert (readiness["ready"], readiness["status"]) == (False, "loading")
+    assert 25 < readiness["estimated_time"] <= 30
+
+def answer_single_inputs(status_for_lists):
+    """Reply to a list input with `status_for_lists`, and to a single prompt by echoing its last line."""
+    def reply(payload):
+        if isinstance(payload["inputs"], list):
+            return status_for_lists, {"error": "Input should be a valid string"}
+        question = payload["inputs"].split("<|user|>")[-1].split("</s>")[0].strip()
+        return 200, [{"generated_text": f"re: {question}"}]
+    return reply
+
+@pytest.mark.parametrize("status", [400, 422])
+def test_rejected_list_input_falls_back_to_one_request_per_prompt(status):
+    provider = make_provider(answer_single_inputs(status))
+    requests = requests_for("one", "two")
+    assert provider.api_calls(requests) == [[0, 1]]
+    
+    assert provider.generate_responses(requests) == ["re: one", "re: two"]
+    assert [isinstance(payload["inputs"], list) for payload in provider._session.payloads] == [True, False, False]
+    
+    # The model does not take list inputs, so later batches go out one request each
+    assert not provider.batching
+    assert provider.api_calls(requests) == [[0], [1]]
+
+def test_other_batch_errors_are_returned_for_every_prompt():
+    provider = make_provider(answer_single_inputs(500))
+    
+    results = provider.generate_responses(requests_for("one", "two"))
+    assert [(type(result), result.status_code) for result in results] == [(ProviderError, 500)] * 2
+    assert len(provider._session.payloads) == 1
+    assert provider.batching
\ No newline at end of file
@@ -0,0 +1,70 @@
+import time
+import pytest
+from agents.llm_provider import LLMProvider, ProviderError
+from agents.provider_pool import ProviderPool
+
+class ScriptedProvider(LLMProvider):
+    """Fails with the scripted errors first (one per call), then answers with its model name."""
+    
+    def __init__(self, model, errors=()):
+        super().__init__(model)
+        self.errors = list(errors)
+        self.calls = 0
+    
+    def initialize(self) -> None:
+        pass
+    
+    def generate_response(self, messages, system_prompt, generation_config=None) -> str:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return f"{self.model} reply"
+
+def ask(pool: ProviderPool) -> str:
+    return pool.generate_response([{"role": "user", "content": "hi"}], "")
+
+def circuits(pool: ProviderPool) -> dict:
+    return {backend["model"]: backend["circuit"] for backend in pool.stats()}
+
+def test_failed_request_fails_over_to_the_next_backend():
+    first = ScriptedProvider("first", [ProviderError("down", 500)])
+    second = ScriptedProvider("second")
+    pool = ProviderPool([first, second])
+    
+    assert ask(pool) == "second reply"
+    assert (first.calls, second.calls) == (1, 1)
+    assert circuits(pool) == {"first": "closed", "second": "closed"}
+
+def test_circuit_opens_after_repeated_failures_and_closes_after_cooldown():
+    first = ScriptedProvider("first", [ProviderError("down", 500)] * 2)
+    second = ScriptedProvider("second")
+    pool = ProviderPool([first, second], failure_threshold=2, cooldown=0.2)
+    
+    assert [ask(pool), ask(pool)] == ["second reply", "second reply"]
+    assert circuits(pool) == {"first": "open", "second": "closed"}
+    
+    # While open, the backend gets no traffic
+    assert ask(pool) == "second reply"
+    assert first.calls == 2
+    
+    # After the cooldown it is tried again, and a success closes the circuit
+    time.sleep(0.25)
+    assert ask(pool) == "first reply"
+    assert circuits(pool) == {"first": "closed", "second": "closed"}
+
+def test_loading_model_is_taken_out_of_rotation_at_once():
+    first = ScriptedProvider("first", [ProviderError("loading", 503, retry_after=60)])
+    second = ScriptedProvider("second")
+    pool = ProviderPool([first, second], failure_threshold=3)
+    
+    assert ask(pool) == "second reply"
+    assert circuits(pool)["first"] == "open"
+
+def test_error_is_raised_only_when_every_backend_failed():
+    first = ScriptedProvider("first", [ProviderError("first down", 500)])
+    second = ScriptedProvider("second", [ProviderError("second down", 502)])
+    pool = ProviderPool([first, second])
+    
+    with pytest.raises(ProviderError, match="second down"):
+        ask(pool)
+    assert [backend["outstanding"] for backend in pool.stats()] == [0, 0]
\ No newline at end of file
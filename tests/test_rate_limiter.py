@@ -0,0 +1,79 @@
+import threading
+import time
+import pytest
+from agents.llm_provider import ProviderBusyError
+from agents.rate_limiter import BACKGROUND, INTERACTIVE, RateLimiter
+
+def make_limiter(**kwargs) -> RateLimiter:
+    """A limiter with one slot and enough tokens that only the concurrency cap makes callers wait."""
+    kwargs.setdefault("queue_timeout", 5.0)
+    return RateLimiter(rate=1000.0, burst=100, max_concurrency=1, **kwargs)
+
+def wait_for_queued(limiter: RateLimiter, count: int) -> None:
+    deadline = time.monotonic() + 2.0
+    while limiter.stats()["queued"] < count:
+        assert time.monotonic() < deadline, "waiters never queued"
+        time.sleep(0.005)
+
+def start_waiter(limiter: RateLimiter, priority: int, name: str, admitted: list, errors: list) -> threading.Thread:
+    """Start a thread that waits for a slot, records its name once admitted and gives the slot back."""
+    def run():
+        try:
+            with limiter.slot(priority):
+                admitted.append(name)
+        except ProviderBusyError as e:
+            errors.append((name, e))
+    
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+def test_interactive_requests_are_admitted_before_background_ones():
+    limiter = make_limiter()
+    admitted, errors = [], []
+    limiter.acquire(INTERACTIVE)
+    
+    threads = [start_waiter(limiter, BACKGROUND, "background", admitted, errors)]
+    wait_for_queued(limiter, 1)
+    threads.append(start_waiter(limiter, INTERACTIVE, "interactive", admitted, errors))
+    wait_for_queued(limiter, 2)
+    
+    limiter.release()
+    for thread in threads:
+        thread.join(2.0)
+    assert admitted == ["interactive", "background"]
+    assert errors == []
+    assert limiter.stats()["active"] == 0
+
+def test_full_queue_sheds_the_lowest_priority_waiter():
+    limiter = make_limiter(max_queue=1)
+    admitted, errors = [], []
+    limiter.acquire(INTERACTIVE)
+    
+    threads = [start_waiter(limiter, BACKGROUND, "background", admitted, errors)]
+    wait_for_queued(limiter, 1)
+    threads.append(start_waiter(limiter, INTERACTIVE, "interactive", admitted, errors))
+    threads[0].join(2.0)
+    assert [name for name, _ in errors] == ["background"]
+    
+    limiter.release()
+    threads[1].join(2.0)
+    assert admitted == ["interactive"]
+    assert limiter.stats()["shed"] == 1
+
+def test_waiter_gives_up_after_the_queue_timeout():
+    limiter = make_limiter(queue_timeout=0.1)
+    limiter.acquire(INTERACTIVE)
+    
+    started = time.monotonic()
+    with pytest.raises(ProviderBusyError):
+        limiter.acquire(INTERACTIVE)
+    assert 0.1 <= time.monotonic() - started < 1.0
+    
+    stats = limiter.stats()
+    assert (stats["timed_out"], stats["queued"], stats["active"]) == (1, 0, 1)
+    
+    # The slot is still usable once given back
+    limiter.release()
+    with limiter.slot(INTERACTIVE):
+        assert limiter.stats()["active"] == 1
\ No newline at end of file
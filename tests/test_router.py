@@ -0,0 +1,43 @@
+import pytest
+from core.router import IntentRouter, NaiveBayesIntentClassifier
+
+ROUTES = [
+    # Keywords and their plural and -ing forms
+    ("What's the weather in Paris?", "WeatherExpert"),
+    ("Any hotels near the station?", "HotelExpert"),
+    ("Where can I eat in Rome?", "RestaurantExpert"),
+    ("Good restaurants in Lisbon", "RestaurantExpert"),
+    ("Is sightseeing worth it in Prague?", "AttractionExpert"),
+    ("Which galleries should I see in Florence?", "AttractionExpert"),
+    # Keywords as stems of longer words
+    ("Will it be rainy in Oslo?", "WeatherExpert"),
+    ("What's the humidity in Bangkok?", "WeatherExpert"),
+    ("Is it hotter in Seville than in Madrid?", "WeatherExpert"),
+    ("Any tourist spots in Kyoto?", "AttractionExpert"),
+    ("Is there a good eatery in Naples?", "RestaurantExpert"),
+    ("Where can I find lodging in Bergen?", "HotelExpert"),
+    # The longest keyword a word starts with wins
+    ("hotels in Paris", "HotelExpert"),
+    ("Hotel recommendations for Berlin", "HotelExpert"),
+    # Keywords inside other words do not count
+    ("That sounds great, thanks!", "Assistant"),
+    ("Can you repeat that?", "Assistant"),
+    ("What is the capital of Australia?", "Assistant"),
+]
+
+@pytest.mark.parametrize("text, agent", ROUTES)
+def test_routes(text, agent):
+    assert IntentRouter().route(text).agent == agent
+
+@pytest.mark.parametrize("text, agent", ROUTES)
+def test_routes_with_classifier(text, agent):
+    router = IntentRouter(classifier=NaiveBayesIntentClassifier.from_keywords())
+    assert router.route(text).agent == agent
+
+def test_travel_guide_request():
+    route = IntentRouter().route("I want to go to Paris on June 3")
+    assert route.is_travel_guide
+    assert (route.agent, route.location, route.date) == ("Assistant", "Paris", "June 3")
+
+def test_several_topics_fall_back_to_priority_order():
+    assert IntentRouter().route("hotel and weather in Rome").agent == "WeatherExpert"
\ No newline at end of file
@@ -0,0 +1,59 @@
+import pytest
+from core.router import AGENT_KEYWORDS
+from core.semantic_cache import SemanticCache, literal_terms
+
+def make_cache(agent: str) -> SemanticCache:
+    cache = SemanticCache(verify_rate=0.0)
+    cache.configure(agent, topic_words=AGENT_KEYWORDS.get(agent, ()))
+    return cache
+
+def answer(cache: SemanticCache, agent: str, query: str, response: str) -> None:
+    lookup = cache.lookup(agent, query)
+    assert not lookup.hit
+    cache.store(lookup, response)
+
+@pytest.mark.parametrize("agent, cached, query", [
+    ("WeatherExpert", "What will the weather be like in Paris on June 3?",
+     "What will the weather be like in Paris on June 4?"),
+    ("WeatherExpert", "What will the weather be like in Paris on 2025-06-03?",
+     "What will the weather be like in Paris on 2025-06-04?"),
+    ("WeatherExpert", "What will the weather be like in Paris on June 3?",
+     "What will the weather be like in Paris on July 3?"),
+    ("WeatherExpert", "What will the weather be like in Paris today?",
+     "What will the weather be like in Paris tomorrow?"),
+    ("RestaurantExpert", "vegetarian restaurants in Rome", "non-vegetarian restaurants in Rome"),
+    ("RestaurantExpert", "restaurants in Rome with meat dishes", "restaurants in Rome without meat dishes"),
+    ("HotelExpert", "hotels in Paris for 2 people", "hotels in Paris for 4 people"),
+])
+def test_different_numbers_dates_or_negations_miss(agent, cached, query):
+    cache = make_cache(agent)
+    answer(cache, agent, cached, "cached answer")
+    assert not cache.lookup(agent, query).hit
+
+@pytest.mark.parametrize("agent, cached, query", [
+    ("HotelExpert", "hotels in Paris", "Where should I stay in Paris?"),
+    ("WeatherExpert", "What will the weather be like in Paris on June 3?",
+     "weather in Paris on June 3rd"),
+    ("RestaurantExpert", "non-vegetarian restaurants in Rome", "Recommend non-vegetarian restaurants in Rome"),
+])
+def test_rephrased_questions_hit(agent, cached, query):
+    cache = make_cache(agent)
+    answer(cache, agent, cached, "cached answer")
+    lookup = cache.lookup(agent, query)
+    assert lookup.hit
+    assert lookup.response == "cached answer"
+
+def test_literal_terms():
+    assert literal_terms("Weather in Paris on June 3rd") == ("#3", "month:6")
+    assert literal_terms("Weather in Paris on 2025-06-03") == ("#2025", "#3", "#6")
+    assert literal_terms("non-vegetarian places, not too pricey") == ("not",)
+    assert literal_terms("hotels in Paris") == ()
+
+def test_expired_and_evicted_entries_leave_their_index():
+    cache = SemanticCache(verify_rate=0.0, max_entries=1)
+    cache.configure("HotelExpert", ttl=60)
+    answer(cache, "HotelExpert", "hotels in Paris for 2 people", "first")
+    answer(cache, "HotelExpert", "hotels in Rome", "second")
+    assert not cache.lookup("HotelExpert", "hotels in Paris for 2 people").hit
+    assert cache.lookup("HotelExpert", "hotels in Rome").response == "second"
+    assert cache.stats()["HotelExpert"]["evictions"] == 1
\ No newline at end of file
@@ -0,0 +1,61 @@
+import asyncio
+import pytest
+from agents.single_flight import SingleFlight
+
+def test_waiter_gets_result_when_leader_is_cancelled():
+    single_flight = SingleFlight()
+    started = []
+    
+    async def fetch():
+        started.append(True)
+        await asyncio.sleep(0.1)
+        return "answer"
+    
+    async def main():
+        leader = asyncio.ensure_future(single_flight.ado("key", fetch))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(single_flight.ado("key", fetch))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+    
+    assert asyncio.run(main()) == "answer"
+    assert started == [True]
+    assert single_flight.stats() == {"calls": 1, "coalesced": 1, "in_flight": 0}
+
+def test_call_is_cancelled_once_every_caller_is():
+    single_flight = SingleFlight()
+    finished = []
+    
+    async def fetch():
+        await asyncio.sleep(0.1)
+        finished.append(True)
+        return "answer"
+    
+    async def main():
+        callers = [asyncio.ensure_future(single_flight.ado("key", fetch)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0.15)
+    
+    asyncio.run(main())
+    assert finished == []
+    assert single_flight.stats()["in_flight"] == 0
+
+def test_callers_share_the_exception():
+    single_flight = SingleFlight()
+    
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+    
+    async def main():
+        return await asyncio.gather(*[single_flight.ado("key", fetch) for _ in range(3)], return_exceptions=True)
+    
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert single_flight.stats() == {"calls": 1, "coalesced": 2, "in_flight": 0}
\ No newline at end of file
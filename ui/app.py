@@ -1,37 +1,102 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, g, render_template, request, jsonify, stream_with_context
 import os
-import re
+import atexit
 import logging
+import time
 from datetime import datetime
 import json
 from agents import (
-    HuggingFaceProvider,
+    HuggingFaceProvider, LlamaCppProvider, CachingProvider, ProviderPool, RateLimiter, RateLimitedProvider,
     GeneralAgent, WeatherAgent, HotelAgent, RestaurantAgent, AttractionAgent
 )
+from agents.rate_limiter import BACKGROUND
 from core.base import Message
 from core.coordinator import Coordinator
+from core.guide_cache import GuideCache
+from core.async_logging import configure_queue_logging, queue_handler
+from core.guide_store import SqliteGuideStore
+from core.metrics import REGISTRY, span
+from core.router import AGENT_KEYWORDS, IntentRouter, NaiveBayesIntentClassifier
+from core.semantic_cache import SemanticCache, parse_thresholds
+from core.session import ConversationSession, SessionManager
 from dotenv import load_dotenv
 
+SESSION_COOKIE = 'travel_agent_session'
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    'travel_agent_http_request_duration_seconds',
+    'Time to answer HTTP requests, by endpoint and status (streams: until the last event)',
+    ('endpoint', 'status')
+)
+
+# Comma-separated model ids to spread requests over; override with HUGGINGFACE_MODELS
+DEFAULT_MODELS = "HuggingFaceH4/zephyr-7b-beta"
+
+def as_token_events(chunks):
+    """Turn a stream of text chunks into ("token", ...) events, passing the stream's return value through"""
+    while True:
+        try:
+            chunk = next(chunks)
+        except StopIteration as done:
+            return done.value
+        yield "token", {"text": chunk}
+
+def drain(events):
+    """Run an event generator to completion and return its return value"""
+    while True:
+        try:
+            next(events)
+        except StopIteration as done:
+            return done.value
+
+def guide_section(response):
+    """The text of an expert's answer to compile into a guide, leaving provider errors out"""
+    if response.metadata.get("error"):
+        return "No information available."
+    return response.content
+
+def format_sse(event, data):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def as_sse(events):
+    """Format each (event, data) pair as a Server-Sent Events message, passing the generator's return value through"""
+    while True:
+        try:
+            event, data = next(events)
+        except StopIteration as done:
+            return done.value
+        yield format_sse(event, data)
+
 def create_app():
     """Create and configure the Flask application"""
     
-    # Setup logging
-    logging.basicConfig(
-        filename='travel_agent.log',
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    # Setup logging; records are formatted and written to the file by a listener thread
+    def log_handlers():
+        """Open the log file, only once queue logging is actually being set up"""
+        file_handler = logging.FileHandler('travel_agent.log')
+        file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        return [file_handler]
+    
+    # LOG_LEVEL=DEBUG also logs the prompts sent to the models and the API's replies
+    log_level = getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
+    log_listener = configure_queue_logging(log_handlers, level=log_level)
+    if log_listener is not None:
+        atexit.register(log_listener.stop)
     logger = logging.getLogger('travel_agent')
-
+    
     # Create Flask app
     app = Flask(__name__, template_folder=os.path.join(os.path.dirname(__file__), 'templates'))
-
+    
     # Initialize the travel agent system
     def initialize_agents():
         load_dotenv()
         
-        # Create coordinator
-        coordinator = Coordinator()
+        # Create coordinator; specialist calls get a little longer than the provider's 120 s HTTP timeout.
+        # Questions to the specialists similar enough to one answered before are served from the semantic cache
+        semantic_cache = SemanticCache(default_threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.75")),
+                                       verify_rate=float(os.getenv("SEMANTIC_CACHE_VERIFY_RATE", "0.05")))
+        coordinator = Coordinator(default_timeout=130, semantic_cache=semantic_cache)
         
         # Check available API key
         huggingface_key = os.getenv("HUGGINGFACE_API_KEY")
@@ -39,16 +104,33 @@ def create_app():
         # Log API info
         logger.info(f"Hugging Face API: {'✓ (API key provided)' if huggingface_key else '✓ (free tier)'}")
         
-        # Create LLM provider
-        primary_provider = HuggingFaceProvider("HuggingFaceH4/zephyr-7b-beta")
-        logger.info("Using HuggingFace as primary provider")
+        # Create LLM provider: a pool over one or more models, failing over between them
+        model_ids = [model_id.strip() for model_id in os.getenv("HUGGINGFACE_MODELS", DEFAULT_MODELS).split(",") if model_id.strip()]
+        # Requests pass the rate limiter before reaching the pool; identical ones are coalesced before that
+        pool = ProviderPool([HuggingFaceProvider(model_id) for model_id in model_ids])
+        limiter = RateLimiter(rate=float(os.getenv("HUGGINGFACE_RATE_LIMIT", "1.0")),
+                              max_concurrency=int(os.getenv("HUGGINGFACE_MAX_CONCURRENCY", "4")))
+        primary_provider = CachingProvider(RateLimitedProvider(pool, limiter))
+        # Each layer exposes its own counters on /metrics
+        pool.register_metrics()
+        limiter.register_metrics()
+        primary_provider.register_metrics()
+        logger.info(f"Using HuggingFace as primary provider ({', '.join(model_ids)})")
+        
+        # Optionally answer the specialists with a local model on the CPU: offline, no rate limits or cold starts
+        specialist_provider = primary_provider
+        local_model_path = os.getenv("LOCAL_MODEL_PATH")
+        if local_model_path:
+            specialist_provider = CachingProvider(
+                LlamaCppProvider(local_model_path, n_threads=int(os.getenv("LOCAL_MODEL_THREADS", "0")) or None)
+            )
         
-        # Create specialized agents using the primary provider
+        # Create specialized agents using the primary provider (the specialists use the local model if configured)
         general_assistant = GeneralAgent("Assistant", primary_provider)
-        weather_assistant = WeatherAgent("WeatherExpert", primary_provider)
-        hotel_assistant = HotelAgent("HotelExpert", primary_provider)
-        restaurant_assistant = RestaurantAgent("RestaurantExpert", primary_provider)
-        attraction_assistant = AttractionAgent("AttractionExpert", primary_provider)
+        weather_assistant = WeatherAgent("WeatherExpert", specialist_provider)
+        hotel_assistant = HotelAgent("HotelExpert", specialist_provider)
+        restaurant_assistant = RestaurantAgent("RestaurantExpert", specialist_provider)
+        attraction_assistant = AttractionAgent("AttractionExpert", specialist_provider)
         
         # Initialize agents
         general_assistant.initialize()
@@ -57,6 +139,13 @@ def create_app():
         restaurant_assistant.initialize()
         attraction_assistant.initialize()
         
+        # Cache the specialists' answers for as long as their responses are cached, each with its own threshold
+        thresholds = parse_thresholds(os.getenv("SEMANTIC_CACHE_THRESHOLDS", ""))
+        for specialist in (weather_assistant, hotel_assistant, restaurant_assistant, attraction_assistant):
+            semantic_cache.configure(specialist.name, threshold=thresholds.get(specialist.name),
+                                     ttl=specialist.generation_config.cache_ttl,
+                                     topic_words=AGENT_KEYWORDS.get(specialist.name, ()))
+        
         # Add agents to coordinator
         coordinator.add_agent(general_assistant)
         coordinator.add_agent(weather_assistant)
@@ -64,15 +153,192 @@ def create_app():
         coordinator.add_agent(restaurant_assistant)
         coordinator.add_agent(attraction_assistant)
         
-        return coordinator
-
-    # Initialize agents when the app starts
-    coordinator = initialize_agents()
-
+        return coordinator, primary_provider
+    
+    # Initialize agents when the app starts; this also starts warming up the model
+    coordinator, primary_provider = initialize_agents()
+    
+    # Cache of whole travel guides per destination and month
+    guide_cache = GuideCache()
+    
+    # History of generated guides, written off the request thread
+    guide_store = SqliteGuideStore(os.path.join('history', 'travel_guides.db'))
+    atexit.register(guide_store.close)
+    
+    # Per-user conversation state; agents and the provider stay shared and stateless
+    sessions = SessionManager()
+    
+    # Compiled once; the classifier settles queries that mention several topics
+    router = IntentRouter(classifier=NaiveBayesIntentClassifier.from_keywords())
+    
+    def register_metrics():
+        """Expose the app's components' own counters on /metrics, read when it is scraped (the provider stack registers its own)"""
+        REGISTRY.collector('travel_agent_model_ready', 'Whether a model is loaded and answering (1) or not (0)',
+                           lambda: [({}, 1 if primary_provider.readiness()['ready'] else 0)])
+        REGISTRY.collector('travel_agent_guide_cache_lookups', 'Travel guide cache lookups by result',
+                           lambda: [({'result': result}, guide_cache.stats()[key])
+                                    for result, key in (('hit', 'hits'), ('stale_hit', 'stale_hits'), ('miss', 'misses'))],
+                           type='counter')
+        REGISTRY.collector('travel_agent_semantic_cache_lookups', 'Semantic cache lookups by agent and result',
+                           lambda: [({'agent': agent, 'result': result}, stats[key])
+                                    for agent, stats in coordinator.semantic_cache.stats().items()
+                                    for result, key in (('hit', 'hits'), ('miss', 'misses'))], type='counter')
+        REGISTRY.collector('travel_agent_semantic_cache_verified', 'Semantic cache hits checked against a live answer',
+                           lambda: [({'agent': agent}, stats['verified'])
+                                    for agent, stats in coordinator.semantic_cache.stats().items()], type='counter')
+        REGISTRY.collector('travel_agent_semantic_cache_false_hits', 'Checked semantic cache hits whose live answer differed',
+                           lambda: [({'agent': agent}, stats['false_hits'])
+                                    for agent, stats in coordinator.semantic_cache.stats().items()], type='counter')
+        REGISTRY.collector('travel_agent_semantic_cache_entries', 'Answers held in the semantic cache by agent',
+                           lambda: [({'agent': agent}, stats['size'])
+                                    for agent, stats in coordinator.semantic_cache.stats().items()])
+        REGISTRY.collector('travel_agent_guide_writer_queued', 'Guide history entries waiting to be written',
+                           lambda: [({}, guide_store.stats()['queued'])])
+        REGISTRY.collector('travel_agent_guide_writer_dropped', 'Guide history entries dropped because the writer fell behind',
+                           lambda: [({}, guide_store.stats()['dropped'])], type='counter')
+        REGISTRY.collector('travel_agent_log_records_dropped', 'Log records dropped because the log writer fell behind',
+                           lambda: [({}, queue_handler().stats()['dropped'])] if queue_handler() else [],
+                           type='counter')
+    
+    register_metrics()
+    
+    @app.before_request
+    def load_session():
+        g.request_started = time.perf_counter()
+        # Scrapes, probes and guide searches do not need a conversation
+        if request.endpoint not in ('metrics', 'ready', 'search'):
+            g.session = sessions.get_or_create(request.cookies.get(SESSION_COOKIE))
+    
+    @app.after_request
+    def save_session_cookie(response):
+        session = g.get('session')
+        if session is not None and request.cookies.get(SESSION_COOKIE) != session.session_id:
+            response.set_cookie(SESSION_COOKIE, session.session_id, max_age=int(sessions.idle_timeout),
+                                httponly=True, samesite='Lax')
+        # Streams are timed when their last event is sent
+        if not response.is_streamed:
+            REQUEST_SECONDS.observe(time.perf_counter() - g.request_started,
+                                    endpoint=request.endpoint or 'unknown', status=response.status_code)
+        return response
+    
+    def warming_up_message():
+        """The reply to give instead of building a guide while the model is still loading, or None"""
+        readiness = primary_provider.readiness()
+        if readiness["status"] != "loading":
+            return None
+        return (f"I'm still warming up. The model is being loaded and will be ready in approximately "
+                f"{readiness['estimated_time']:.0f} seconds. Please try again shortly.")
+    
+    def iter_travel_guide(user_input, location, date_str, session, stream_tokens=True):
+        """Build a travel guide, yielding ("section", ...) and ("token", ...) events as parts become ready.
+        
+        Returns the saved history entry when the guide is complete.
+        """
+        logger.info("Building comprehensive travel guide...")
+        
+        # Collect information from all specialized agents
+        # 1-4. Ask the weather, hotel, restaurant and attraction experts at the same time,
+        # queued behind interactive questions when the API is busy
+        specialist_requests = [
+            (Message(content=f"What will the weather be like in {location} on {date_str}?", sender="User", metadata={"priority": BACKGROUND}), "WeatherExpert"),
+            (Message(content=f"What are the 5 best hotels in {location}?", sender="User", metadata={"priority": BACKGROUND}), "HotelExpert"),
+            (Message(content=f"What are the 5 best restaurants in {location}?", sender="User", metadata={"priority": BACKGROUND}), "RestaurantExpert"),
+            (Message(content=f"What are the 5 best attractions in {location}?", sender="User", metadata={"priority": BACKGROUND}), "AttractionExpert")
+        ]
+        specialist_responses = [None] * len(specialist_requests)
+        for index, response in coordinator.iter_messages_parallel(specialist_requests, session=session):
+            specialist_responses[index] = response
+            logger.info("%s Response: %s", response.sender, response.content)
+            yield "section", {"agent": response.sender, "content": response.content}
+        weather_response, hotel_response, restaurant_response, attraction_response = specialist_responses
+        
+        if all(response.metadata.get("error") for response in specialist_responses):
+            # Nothing to compile: pass the provider's explanation on instead of asking it again
+            final_response = Message(content=weather_response.content, sender="Assistant", metadata={"error": "provider"})
+        else:
+            # 5. Compile comprehensive guide
+            guide_prompt = f"""Create a comprehensive travel guide for {location} on {date_str} using the following information:
+            
+            WEATHER:
+            {guide_section(weather_response)}
+            
+            HOTELS:
+            {guide_section(hotel_response)}
+            
+            RESTAURANTS:
+            {guide_section(restaurant_response)}
+            
+            ATTRACTIONS:
+            {guide_section(attraction_response)}
+            
+            Format the guide in a clear, organized way with sections for weather, accommodation, dining, and sightseeing.
+            Add a brief introduction and conclusion.
+            """
+            
+            guide_message = Message(content=guide_prompt, sender="User")
+            if stream_tokens:
+                final_response = yield from as_token_events(coordinator.stream_message(guide_message, "Assistant", session))
+            else:
+                final_response = coordinator.process_message(guide_message, "Assistant", session)
+        
+        # Log the final response
+        logger.info("Final Response: %s", final_response.content)
+        
+        # Save the travel guide to the guide history
+        history_entry = {
+            "timestamp": datetime.now().isoformat(),
+            "user_query": user_input,
+            "location": location,
+            "date": date_str,
+            "weather_response": weather_response.content,
+            "hotel_response": hotel_response.content,
+            "restaurant_response": restaurant_response.content,
+            "attraction_response": attraction_response.content,
+            "final_response": final_response.content
+        }
+        
+        # Queue the entry for the guide store; it is written in the background
+        guide_store.add(history_entry)
+        
+        # Only cache guides where every expert answered, so failures are retried next time
+        if not any(response.metadata.get("error") for response in
+                   (weather_response, hotel_response, restaurant_response, attraction_response, final_response)):
+            guide_cache.put(guide_cache.make_key(location, date_str), history_entry)
+        
+        return history_entry
+    
+    def build_travel_guide(user_input, location, date_str, session=None):
+        """Build a travel guide without streaming and return the saved history entry"""
+        # Background refreshes are not tied to any user, so they get a throwaway session
+        session = session or ConversationSession("guide-refresh")
+        return drain(iter_travel_guide(user_input, location, date_str, session, stream_tokens=False))
+    
     @app.route('/')
     def index():
         return render_template('index.html')
-
+    
+    @app.route('/ready')
+    def ready():
+        """Readiness probe: 200 once the model can answer, 503 while it is cold or loading"""
+        readiness = primary_provider.readiness()
+        return jsonify(readiness), 200 if readiness["ready"] else 503
+    
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus scrape endpoint: request stage latencies, provider calls, tokens, caches and queues"""
+        return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    
+    @app.route('/search')
+    def search():
+        """Search the generated guides by location, date or anything the experts said, best matches first"""
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'Missing search query (?q=...)'}), 400
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        with span("search"):
+            results = guide_store.search(query, limit)
+        return jsonify({'query': query, 'results': results})
+    
     @app.route('/ask', methods=['POST'])
     def ask():
         user_input = request.form.get('user_input', '').strip()
@@ -81,7 +347,7 @@ def create_app():
             return jsonify({'response': 'Please enter a query.'})
         
         # Log user query
-        logger.info(f"User Query: {user_input}")
+        logger.info("User Query: %s", user_input)
         
         # Create user message
         user_message = Message(
@@ -89,105 +355,43 @@ def create_app():
             sender="User"
         )
         
-        # Check for travel intent pattern: "I want to go to/in [location] on [date]"
-        travel_pattern = re.compile(r"(?:i want to|planning to|going to|travel to|visit) (?:go to|go in|visit) ([a-zA-Z\s]+) (?:on|at|in) ([a-zA-Z0-9\s,]+)", re.IGNORECASE)
-        match = travel_pattern.search(user_input)
+        # Route in one pass: travel intent ("I want to go to/in [location] on [date]") or topic keywords
+        with span("routing"):
+            route = router.route(user_input)
         
         try:
-            if match:
+            if route.is_travel_guide:
                 # Extract location and date
-                location = match.group(1).strip()
-                date_str = match.group(2).strip()
+                location = route.location
+                date_str = route.date
                 
                 logger.info(f"Detected travel intent for {location} on {date_str}")
-                logger.info("Building comprehensive travel guide...")
-                
-                # Collect information from all specialized agents
-                # 1. Get weather information
-                weather_query = f"What will the weather be like in {location} on {date_str}?"
-                weather_message = Message(content=weather_query, sender="User")
-                weather_response = coordinator.process_message(weather_message, "WeatherExpert")
-                logger.info(f"Weather Response: {weather_response.content}")
-                
-                # 2. Get hotel information
-                hotel_query = f"What are the 5 best hotels in {location}?"
-                hotel_message = Message(content=hotel_query, sender="User")
-                hotel_response = coordinator.process_message(hotel_message, "HotelExpert")
-                logger.info(f"Hotel Response: {hotel_response.content}")
-                
-                # 3. Get restaurant information
-                restaurant_query = f"What are the 5 best restaurants in {location}?"
-                restaurant_message = Message(content=restaurant_query, sender="User")
-                restaurant_response = coordinator.process_message(restaurant_message, "RestaurantExpert")
-                logger.info(f"Restaurant Response: {restaurant_response.content}")
-                
-                # 4. Get attraction information
-                attraction_query = f"What are the 5 best attractions in {location}?"
-                attraction_message = Message(content=attraction_query, sender="User")
-                attraction_response = coordinator.process_message(attraction_message, "AttractionExpert")
-                logger.info(f"Attraction Response: {attraction_response.content}")
-                
-                # 5. Compile comprehensive guide
-                guide_prompt = f"""Create a comprehensive travel guide for {location} on {date_str} using the following information:
-                
-                WEATHER:
-                {weather_response.content}
-                
-                HOTELS:
-                {hotel_response.content}
                 
-                RESTAURANTS:
-                {restaurant_response.content}
+                # Serve a cached guide for the same destination and month if there is one;
+                # stale guides are served while they are rebuilt in the background
+                cache_key = guide_cache.make_key(location, date_str)
+                history_entry, cache_status = guide_cache.get(
+                    cache_key, lambda: build_travel_guide(user_input, location, date_str)
+                )
                 
-                ATTRACTIONS:
-                {attraction_response.content}
-                
-                Format the guide in a clear, organized way with sections for weather, accommodation, dining, and sightseeing.
-                Add a brief introduction and conclusion.
-                """
-                
-                guide_message = Message(content=guide_prompt, sender="User")
-                final_response = coordinator.process_message(guide_message, "Assistant")
-                
-                # Log the final response
-                logger.info(f"Final Response: {final_response.content}")
-                
-                # Clean the response by removing system prompt text
-                cleaned_response = clean_response(final_response.content)
-                
-                # Save the travel guide to a JSON file for history
-                history_entry = {
-                    "timestamp": datetime.now().isoformat(),
-                    "user_query": user_input,
-                    "location": location,
-                    "date": date_str,
-                    "weather_response": weather_response.content,
-                    "hotel_response": hotel_response.content,
-                    "restaurant_response": restaurant_response.content,
-                    "attraction_response": attraction_response.content,
-                    "final_response": cleaned_response
-                }
-                
-                # Create history directory if it doesn't exist
-                os.makedirs('history', exist_ok=True)
-                
-                # Save to a JSON file with timestamp in the filename
-                filename = f"history/travel_guide_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-                with open(filename, 'w') as f:
-                    json.dump(history_entry, f, indent=2)
+                if history_entry is None:
+                    # Do not run the whole pipeline against a model that is known to be loading
+                    warming_up = warming_up_message()
+                    if warming_up:
+                        return jsonify({'response': warming_up})
+                    history_entry = build_travel_guide(user_input, location, date_str, g.session)
+                else:
+                    logger.info(f"Serving {cache_status} cached travel guide for {location} ({cache_key[1]})")
                 
                 # Return only the final response to the UI
-                return jsonify({'response': cleaned_response})
+                return jsonify({'response': history_entry['final_response']})
             else:
-                # For non-travel queries, just use the general assistant
-                logger.info(f"Processing with Assistant...")
-                response = coordinator.process_message(user_message, "Assistant")
-                logger.info(f"Assistant Response: {response.content}")
-                
-                # Clean the response
-                cleaned_response = clean_response(response.content)
+                # For non-travel queries, use the specialist the router picked (or the general assistant)
+                logger.info(f"Processing with {route.agent}...")
+                response = coordinator.process_message(user_message, route.agent, g.session)
+                logger.info("%s Response: %s", route.agent, response.content)
                 
-                return jsonify({'response': cleaned_response})
+                return jsonify({'response': response.content})
         except Exception as e:
             import traceback
             error_msg = str(e)
@@ -196,20 +400,71 @@ def create_app():
             logger.error(error_traceback)
             
             return jsonify({'response': f"I'm sorry, but I encountered an error processing your request. Please try again or rephrase your query."})
-
-    # Helper function to clean responses
-    def clean_response(response_text):
-        """Remove system prompts and instructions from the response"""
-        # Remove the system prompt
-        if "System: You are Assistant, a helpful AI assistant." in response_text:
-            response_text = response_text.split("System: You are Assistant, a helpful AI assistant.", 1)[1].strip()
-        
-        # Remove the detailed assistant instructions if present
-        if "You are a helpful general assistant and travel coordinator." in response_text:
-            parts = response_text.split("User:", 1)
-            if len(parts) > 1:
-                response_text = parts[1].strip()
-        
-        return response_text
-
+    
+    @app.route('/ask/stream', methods=['POST'])
+    def ask_stream():
+        """Stream the answer as Server-Sent Events: expert sections as they finish, then the guide token by token"""
+        user_input = request.form.get('user_input', '').strip()
+        session = g.session
+        started = g.request_started
+        
+        def generate():
+            try:
+                yield from generate_events()
+            finally:
+                REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint='ask_stream', status=200)
+        
+        def generate_events():
+            if not user_input:
+                yield format_sse("done", {'response': 'Please enter a query.'})
+                return
+            
+            # Log user query
+            logger.info("User Query (streaming): %s", user_input)
+            
+            # Route in one pass: travel intent ("I want to go to/in [location] on [date]") or topic keywords
+            with span("routing"):
+                route = router.route(user_input)
+            
+            try:
+                if route.is_travel_guide:
+                    # Extract location and date
+                    location = route.location
+                    date_str = route.date
+                    
+                    logger.info(f"Detected travel intent for {location} on {date_str}")
+                    
+                    # A cached guide is sent in one piece
+                    history_entry, cache_status = guide_cache.get(
+                        guide_cache.make_key(location, date_str),
+                        lambda: build_travel_guide(user_input, location, date_str)
+                    )
+                    
+                    if history_entry is None:
+                        # Do not run the whole pipeline against a model that is known to be loading
+                        warming_up = warming_up_message()
+                        if warming_up:
+                            yield format_sse("done", {'response': warming_up})
+                            return
+                        history_entry = yield from as_sse(iter_travel_guide(user_input, location, date_str, session))
+                    
+                    yield format_sse("done", {'response': history_entry['final_response']})
+                else:
+                    # For non-travel queries, stream the answer of the agent the router picked
+                    user_message = Message(content=user_input, sender="User")
+                    response = yield from as_sse(as_token_events(coordinator.stream_message(user_message, route.agent, session)))
+                    logger.info("%s Response: %s", route.agent, response.content)
+                    
+                    yield format_sse("done", {'response': response.content})
+            except Exception as e:
+                import traceback
+                logger.error(f"Error: {str(e)}")
+                logger.error(traceback.format_exc())
+                
+                yield format_sse("error", {'response': "I'm sorry, but I encountered an error processing your request. Please try again or rephrase your query."})
+        
+        # Disable proxy buffering so each event reaches the browser as soon as it is written
+        return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    
     return app 
\ No newline at end of file